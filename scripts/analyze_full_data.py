@@ -2,321 +2,397 @@
 """
 Comprehensive EDM analysis with the full dataset.
 Includes statistical tests for stronger evidence.
+
+Writes analysis_results.json next to the database, together with
+analysis_profile.json: time, CPU and memory per section (profiling.py).
+
+Each numbered section is cached (result_cache.py) under a key made of
+its code, the statistics code it calls and digests of the columns it
+reads; the summary is keyed by the section results it reports. A rerun
+prints and saves unchanged sections from the cache and only recomputes
+the ones whose code or input columns changed. While the database file is
+unchanged, the column digests are cached too and the posts are not even
+loaded.
+
+Usage:
+    python scripts/analyze_full_data.py [data/moltbook_combined.db]
+    python scripts/analyze_full_data.py --deep-profile    # adds cProfile/tracemalloc
+    python scripts/analyze_full_data.py --no-cache        # recompute every section
 """
 
+import argparse
+import contextlib
+import inspect
+import io
 import json
-import re
-from collections import defaultdict
-from datetime import datetime
+import os
+import sys
+from functools import cached_property
 from pathlib import Path
-import math
+
+import numpy as np
+
+import profiling
+import stats_kernel
+import time_buckets
+import timestamps
+from features import FEATURES_VERSION
+from post_columns import KNOWLEDGE_TYPES, load_posts
+from profiling import span
+from result_cache import MAX_BYTES, ResultCache, array_digest, content_key
+from stats_kernel import Metric, mean, std
+from time_buckets import PHASES, phase_of, phase_range
+from timestamps import NO_TIMESTAMP, SECONDS_PER_DAY, hour_of_day
 
 DATA_FILE = Path("data/moltbook_combined.db")
+CACHE_DIR = "analysis_cache"  # next to the database
+
+# Code every section depends on besides its own function
+LIBRARY_SOURCE = ''.join(inspect.getsource(module) for module in (stats_kernel, time_buckets, timestamps))
+
+
+class Posts:
+    """Loaded post columns, with the sorted metrics the sections share."""
+
+    def __init__(self, cols):
+        self.cols = cols
+        self.n = len(cols['upvotes'])
+        self.upvotes = cols['upvotes']
+        self.comments = cols['comment_count']
+
+    # One cached sort per metric, shared by every median, Gini and U test
+    @cached_property
+    def upvote_metric(self):
+        return Metric(self.upvotes)
+
+    @cached_property
+    def comment_metric(self):
+        return Metric(self.comments)
 
-# Load data
-with open(DATA_FILE) as f:
-    data = json.load(f)
-
-posts = data['posts']
-print(f"Loaded {len(posts)} unique posts")
-print(f"Fetched at: {data['fetched_at']}")
-print()
-
-# Helper functions
-def get_upvotes(post):
-    return post.get('upvotes', post.get('score', 0)) or 0
-
-def get_comments(post):
-    return post.get('commentCount', post.get('comment_count', 0)) or 0
-
-def get_title(post):
-    return post.get('title', '') or ''
-
-def get_body(post):
-    return post.get('body', post.get('content', '')) or ''
-
-def get_created(post):
-    ts = post.get('createdAt', post.get('created_at', post.get('timestamp')))
-    if ts:
-        try:
-            if isinstance(ts, (int, float)):
-                return datetime.fromtimestamp(ts)
-            return datetime.fromisoformat(ts.replace('Z', '+00:00'))
-        except:
-            pass
-    return None
-
-def is_question(title):
-    title_lower = title.lower()
-    return '?' in title or any(title_lower.startswith(w) for w in ['what ', 'why ', 'how ', 'is ', 'are ', 'do ', 'does ', 'can ', 'should ', 'would ', 'could ', 'anyone ', 'who ', 'where ', 'when '])
-
-def get_knowledge_type(title, body):
-    text = (title + ' ' + body).lower()
-    procedural_keywords = ['skill', 'build', 'built', 'how to', 'tutorial', 'guide', 'made', 'created', 'workflow', 'tool', 'script', 'code', 'implement', 'setup', 'configure']
-    conceptual_keywords = ['understand', 'theory', 'why', 'philosophy', 'consciousness', 'meaning', 'think', 'believe', 'concept', 'idea', 'question', 'wonder', 'curious']
-    
-    proc_count = sum(1 for k in procedural_keywords if k in text)
-    conc_count = sum(1 for k in conceptual_keywords if k in text)
-    
-    if proc_count > conc_count:
-        return 'procedural'
-    elif conc_count > proc_count:
-        return 'conceptual'
-    else:
-        return 'other'
-
-def gini_coefficient(values):
-    if not values or all(v == 0 for v in values):
-        return 0
-    sorted_values = sorted(values)
-    n = len(sorted_values)
-    total = sum(sorted_values)
-    if total == 0:
-        return 0
-    cumulative = 0
-    for i, v in enumerate(sorted_values):
-        cumulative += v
-    gini_sum = sum((2 * (i + 1) - n - 1) * v for i, v in enumerate(sorted_values))
-    return gini_sum / (n * total)
-
-def mean(values):
-    return sum(values) / len(values) if values else 0
-
-def median(values):
-    if not values:
-        return 0
-    sorted_v = sorted(values)
-    n = len(sorted_v)
-    if n % 2:
-        return sorted_v[n // 2]
-    return (sorted_v[n // 2 - 1] + sorted_v[n // 2]) / 2
-
-def std(values):
-    if len(values) < 2:
-        return 0
-    m = mean(values)
-    return math.sqrt(sum((v - m) ** 2 for v in values) / (len(values) - 1))
-
-def mann_whitney_u(group1, group2):
-    """Simple Mann-Whitney U test implementation."""
-    if not group1 or not group2:
-        return None, None
-    
-    # Combine and rank
-    combined = [(v, 0) for v in group1] + [(v, 1) for v in group2]
-    combined.sort(key=lambda x: x[0])
-    
-    # Assign ranks (handle ties by averaging)
-    ranks = []
-    i = 0
-    while i < len(combined):
-        j = i
-        while j < len(combined) and combined[j][0] == combined[i][0]:
-            j += 1
-        avg_rank = (i + j + 1) / 2
-        for k in range(i, j):
-            ranks.append((avg_rank, combined[k][1]))
-        i = j
-    
-    # Sum ranks for group 0
-    r1 = sum(r for r, g in ranks if g == 0)
-    n1, n2 = len(group1), len(group2)
-    
-    # U statistic
-    u1 = r1 - n1 * (n1 + 1) / 2
-    u2 = n1 * n2 - u1
-    u = min(u1, u2)
-    
-    # Effect size (rank-biserial correlation)
-    effect = 1 - (2 * u) / (n1 * n2)
-    
-    return u, effect
-
-print("=" * 70)
-print("COMPREHENSIVE EDM ANALYSIS")
-print("=" * 70)
 
 # 1. Basic Stats
-upvotes = [get_upvotes(p) for p in posts]
-comments = [get_comments(p) for p in posts]
-
-print("\n1. BASIC STATISTICS")
-print("-" * 40)
-print(f"Total posts: {len(posts)}")
-print(f"Total comments: {sum(comments):,}")
-print(f"Total upvotes: {sum(upvotes):,}")
-print(f"Mean comments: {mean(comments):.1f} (SD={std(comments):.1f})")
-print(f"Mean upvotes: {mean(upvotes):.1f} (SD={std(upvotes):.1f})")
-print(f"Median comments: {median(comments):.0f}")
-print(f"Median upvotes: {median(upvotes):.0f}")
+def basic_statistics(posts):
+    upvotes, comments = posts.upvotes, posts.comments
+    total_comments = int(comments.sum())
+    total_upvotes = int(upvotes.sum())
+
+    print("\n1. BASIC STATISTICS")
+    print("-" * 40)
+    print(f"Total posts: {posts.n}")
+    print(f"Total comments: {total_comments:,}")
+    print(f"Total upvotes: {total_upvotes:,}")
+    print(f"Mean comments: {mean(comments):.1f} (SD={std(comments):.1f})")
+    print(f"Mean upvotes: {mean(upvotes):.1f} (SD={std(upvotes):.1f})")
+    print(f"Median comments: {posts.comment_metric.median():.0f}")
+    print(f"Median upvotes: {posts.upvote_metric.median():.0f}")
+    return {'total_posts': posts.n, 'total_comments': total_comments, 'total_upvotes': total_upvotes}
 
 # 2. Questions vs Statements
-print("\n2. QUESTIONS vs STATEMENTS")
-print("-" * 40)
-
-questions = [(get_upvotes(p), get_comments(p)) for p in posts if is_question(get_title(p))]
-statements = [(get_upvotes(p), get_comments(p)) for p in posts if not is_question(get_title(p))]
-
-q_upvotes = [u for u, c in questions]
-q_comments = [c for u, c in questions]
-s_upvotes = [u for u, c in statements]
-s_comments = [c for u, c in statements]
-
-print(f"Questions: {len(questions)} posts")
-print(f"  Mean upvotes: {mean(q_upvotes):.1f} (SD={std(q_upvotes):.1f})")
-print(f"  Mean comments: {mean(q_comments):.1f} (SD={std(q_comments):.1f})")
-print(f"Statements: {len(statements)} posts")
-print(f"  Mean upvotes: {mean(s_upvotes):.1f} (SD={std(s_upvotes):.1f})")
-print(f"  Mean comments: {mean(s_comments):.1f} (SD={std(s_comments):.1f})")
-print(f"Ratio: {len(statements)/len(questions):.1f}:1 (statements:questions)")
-
-# Statistical test
-u, effect = mann_whitney_u(s_upvotes, q_upvotes)
-print(f"\nMann-Whitney U (upvotes): U={u:.0f}, effect size r={effect:.3f}")
-u, effect = mann_whitney_u(s_comments, q_comments)
-print(f"Mann-Whitney U (comments): U={u:.0f}, effect size r={effect:.3f}")
+def questions_vs_statements(posts):
+    upvotes, comments = posts.upvotes, posts.comments
+    print("\n2. QUESTIONS vs STATEMENTS")
+    print("-" * 40)
+
+    question_mask = posts.cols['is_question']
+    statement_mask = ~question_mask
+    n_questions = int(question_mask.sum())
+    n_statements = posts.n - n_questions
+
+    q_upvotes = upvotes[question_mask]
+    q_comments = comments[question_mask]
+    s_upvotes = upvotes[statement_mask]
+    s_comments = comments[statement_mask]
+
+    print(f"Questions: {n_questions} posts")
+    print(f"  Mean upvotes: {mean(q_upvotes):.1f} (SD={std(q_upvotes):.1f})")
+    print(f"  Mean comments: {mean(q_comments):.1f} (SD={std(q_comments):.1f})")
+    print(f"Statements: {n_statements} posts")
+    print(f"  Mean upvotes: {mean(s_upvotes):.1f} (SD={std(s_upvotes):.1f})")
+    print(f"  Mean comments: {mean(s_comments):.1f} (SD={std(s_comments):.1f})")
+    print(f"Ratio: {n_statements/n_questions:.1f}:1 (statements:questions)")
+
+    # Statistical test
+    u, effect, p = posts.upvote_metric.mann_whitney(statement_mask, question_mask)
+    print(f"\nMann-Whitney U (upvotes): U={u:.0f}, effect size r={effect:.3f}, p={p:.3g}")
+    u, effect, p = posts.comment_metric.mann_whitney(statement_mask, question_mask)
+    print(f"Mann-Whitney U (comments): U={u:.0f}, effect size r={effect:.3f}, p={p:.3g}")
+    return {
+        'questions': n_questions,
+        'statements': n_statements,
+        'q_mean_upvotes': mean(q_upvotes),
+        'q_mean_comments': mean(q_comments),
+        's_mean_upvotes': mean(s_upvotes),
+        's_mean_comments': mean(s_comments),
+    }
 
 # 3. Knowledge Type Analysis
-print("\n3. KNOWLEDGE TYPE ANALYSIS")
-print("-" * 40)
-
-knowledge_types = defaultdict(list)
-for p in posts:
-    kt = get_knowledge_type(get_title(p), get_body(p))
-    knowledge_types[kt].append((get_upvotes(p), get_comments(p)))
-
-for kt in ['procedural', 'conceptual', 'other']:
-    data_kt = knowledge_types[kt]
-    if data_kt:
-        up = [u for u, c in data_kt]
-        co = [c for u, c in data_kt]
-        print(f"{kt.capitalize()}: {len(data_kt)} posts")
-        print(f"  Mean upvotes: {mean(up):.1f} (SD={std(up):.1f})")
-        print(f"  Mean comments: {mean(co):.1f} (SD={std(co):.1f})")
-
-# Statistical test between procedural and conceptual
-if knowledge_types['procedural'] and knowledge_types['conceptual']:
-    proc_up = [u for u, c in knowledge_types['procedural']]
-    conc_up = [u for u, c in knowledge_types['conceptual']]
-    u, effect = mann_whitney_u(proc_up, conc_up)
-    print(f"\nMann-Whitney U (procedural vs conceptual upvotes): U={u:.0f}, r={effect:.3f}")
+def knowledge_types(posts):
+    upvotes, comments = posts.upvotes, posts.comments
+    print("\n3. KNOWLEDGE TYPE ANALYSIS")
+    print("-" * 40)
+
+    knowledge_counts = {}
+    knowledge_masks = {}
+    for code, kt in enumerate(KNOWLEDGE_TYPES):
+        kt_mask = posts.cols['knowledge_type'] == code
+        knowledge_masks[kt] = kt_mask
+        knowledge_counts[kt] = int(kt_mask.sum())
+        if knowledge_counts[kt]:
+            up = upvotes[kt_mask]
+            co = comments[kt_mask]
+            print(f"{kt.capitalize()}: {knowledge_counts[kt]} posts")
+            print(f"  Mean upvotes: {mean(up):.1f} (SD={std(up):.1f})")
+            print(f"  Mean comments: {mean(co):.1f} (SD={std(co):.1f})")
+
+    # Statistical test between procedural and conceptual
+    if knowledge_counts['procedural'] and knowledge_counts['conceptual']:
+        u, effect, p = posts.upvote_metric.mann_whitney(knowledge_masks['procedural'], knowledge_masks['conceptual'])
+        print(f"\nMann-Whitney U (procedural vs conceptual upvotes): U={u:.0f}, r={effect:.3f}, p={p:.3g}")
+    return {'procedural_posts': knowledge_counts['procedural'], 'conceptual_posts': knowledge_counts['conceptual']}
 
 # 4. Post Length Analysis
-print("\n4. POST LENGTH ANALYSIS")
-print("-" * 40)
-
-short = [(get_upvotes(p), get_comments(p)) for p in posts if len(get_body(p)) < 500]
-medium = [(get_upvotes(p), get_comments(p)) for p in posts if 500 <= len(get_body(p)) < 2000]
-long_posts = [(get_upvotes(p), get_comments(p)) for p in posts if len(get_body(p)) >= 2000]
-
-for name, data_len in [('Short (<500)', short), ('Medium (500-2000)', medium), ('Long (>2000)', long_posts)]:
-    if data_len:
-        up = [u for u, c in data_len]
-        co = [c for u, c in data_len]
-        print(f"{name}: {len(data_len)} posts, mean upvotes={mean(up):.1f}, mean comments={mean(co):.1f}")
-
-# Statistical test
-if short and long_posts:
-    u, effect = mann_whitney_u([u for u, c in long_posts], [u for u, c in short])
-    print(f"\nMann-Whitney U (long vs short upvotes): U={u:.0f}, r={effect:.3f}")
+def post_length(posts):
+    upvotes, comments = posts.upvotes, posts.comments
+    print("\n4. POST LENGTH ANALYSIS")
+    print("-" * 40)
+
+    body_length = posts.cols['body_length']
+    short = body_length < 500
+    medium = (body_length >= 500) & (body_length < 2000)
+    long_posts = body_length >= 2000
+
+    for name, length_mask in [('Short (<500)', short), ('Medium (500-2000)', medium), ('Long (>2000)', long_posts)]:
+        if length_mask.any():
+            print(f"{name}: {int(length_mask.sum())} posts, mean upvotes={mean(upvotes[length_mask]):.1f}, "
+                  f"mean comments={mean(comments[length_mask]):.1f}")
+
+    # Statistical test
+    if short.any() and long_posts.any():
+        u, effect, p = posts.upvote_metric.mann_whitney(long_posts, short)
+        print(f"\nMann-Whitney U (long vs short upvotes): U={u:.0f}, r={effect:.3f}, p={p:.3g}")
+    return {}
 
 # 5. Participation Inequality
-print("\n5. PARTICIPATION INEQUALITY")
-print("-" * 40)
+def participation_inequality(posts):
+    print("\n5. PARTICIPATION INEQUALITY")
+    print("-" * 40)
 
-gini_upvotes = gini_coefficient(upvotes)
-gini_comments = gini_coefficient(comments)
+    gini_upvotes = posts.upvote_metric.gini()
+    gini_comments = posts.comment_metric.gini()
 
-print(f"Gini coefficient (upvotes): {gini_upvotes:.3f}")
-print(f"Gini coefficient (comments): {gini_comments:.3f}")
-print(f"Human MOOC baseline: 0.55-0.65")
-print(f"Difference from upper human baseline: +{gini_upvotes - 0.65:.3f}")
+    print(f"Gini coefficient (upvotes): {gini_upvotes:.3f}")
+    print(f"Gini coefficient (comments): {gini_comments:.3f}")
+    print(f"Human MOOC baseline: 0.55-0.65")
+    print(f"Difference from upper human baseline: +{gini_upvotes - 0.65:.3f}")
+    return {'gini_upvotes': gini_upvotes, 'gini_comments': gini_comments}
 
 # 6. Temporal Analysis
-print("\n6. TEMPORAL ANALYSIS")
-print("-" * 40)
-
-hourly_counts = defaultdict(int)
-for p in posts:
-    created = get_created(p)
-    if created:
-        hourly_counts[created.hour] += 1
-
-if hourly_counts:
-    total = sum(hourly_counts.values())
-    peak_hour = max(hourly_counts.keys(), key=lambda h: hourly_counts[h])
-    peak_pct = hourly_counts[peak_hour] / total * 100
-    
-    print(f"Peak hour: {peak_hour}:00 UTC")
-    print(f"Posts at peak hour: {hourly_counts[peak_hour]} ({peak_pct:.1f}%)")
-    print(f"Expected if uniform: {100/24:.1f}%")
-    print(f"Clustering factor: {peak_pct / (100/24):.1f}x")
-    
-    # Check for scheduling signature (>15% at any single hour)
-    if peak_pct > 15:
-        print(f"⚠️ SCHEDULING SIGNATURE DETECTED (>{15}% threshold)")
+def temporal(posts):
+    created_at = posts.cols['created_at']
+    print("\n6. TEMPORAL ANALYSIS")
+    print("-" * 40)
+
+    hours = hour_of_day(created_at[created_at != NO_TIMESTAMP])
+    hourly_counts = np.bincount(hours, minlength=24)
+
+    peak_hour, peak_pct = None, 0.0
+    if hourly_counts.any():
+        total = int(hourly_counts.sum())
+        peak_hour = int(hourly_counts.argmax())
+        peak_pct = hourly_counts[peak_hour] / total * 100
+
+        print(f"Peak hour: {peak_hour}:00 UTC")
+        print(f"Posts at peak hour: {hourly_counts[peak_hour]} ({peak_pct:.1f}%)")
+        print(f"Expected if uniform: {100/24:.1f}%")
+        print(f"Clustering factor: {peak_pct / (100/24):.1f}x")
+
+        # Check for scheduling signature (>15% at any single hour)
+        if peak_pct > 15:
+            print(f"⚠️ SCHEDULING SIGNATURE DETECTED (>{15}% threshold)")
+
+    # Three-phase breakdown, by epoch ranges
+    post_phase = phase_of(created_at)
+    phase_counts = np.bincount(post_phase, minlength=len(PHASES) + 1)
+    phase_spam = np.bincount(post_phase, weights=posts.cols['is_spam'], minlength=len(PHASES) + 1)
+    phases = {}
+    print("\nPosts per phase:")
+    for phase, (start, end, label) in PHASES.items():
+        begin, stop = phase_range(phase)
+        days = (stop - begin) // SECONDS_PER_DAY
+        n = int(phase_counts[phase])
+        spam_pct = phase_spam[phase] / n * 100 if n else 0.0
+        last_day = np.datetime64(end) - 1
+        print(f"  Phase {phase} ({start} to {last_day}, {label}): {n:,} posts, {n / days:,.0f}/day, "
+              f"{spam_pct:.1f}% spam")
+        phases[phase] = {'posts': n, 'daily_avg': n / days, 'spam_pct': float(spam_pct)}
+    return {'peak_hour': peak_hour, 'peak_pct': float(peak_pct), 'phases': phases}
 
 # 7. Top Learning Posts
-print("\n7. TOP LEARNING-RELATED POSTS")
-print("-" * 40)
-
-learning_keywords = ['learn', 'skill', 'built', 'tutorial', 'how to', 'guide', 'discovered', 'figured out']
-learning_posts = []
-for p in posts:
-    title = get_title(p).lower()
-    if any(k in title for k in learning_keywords):
-        learning_posts.append((get_comments(p), get_upvotes(p), get_title(p)[:60]))
-
-learning_posts.sort(reverse=True)
-for i, (comments, upvotes, title) in enumerate(learning_posts[:10]):
-    print(f"{i+1}. [{comments:,} comments, {upvotes} upvotes] {title}...")
-
-# 8. Summary Statistics for Paper
-print("\n" + "=" * 70)
-print("SUMMARY FOR PAPER")
-print("=" * 70)
-
-print(f"""
-Dataset: {len(posts):,} unique posts from Moltbook
-Total engagement: {sum(comments):,} comments, {sum(upvotes):,} upvotes
+def top_learning_posts(posts):
+    print("\n7. TOP LEARNING-RELATED POSTS")
+    print("-" * 40)
+
+    learning_posts = [(int(posts.comments[i]), int(posts.upvotes[i]), title[:60])
+                      for i, title in posts.cols['learning_titles'].items()]
+
+    learning_posts.sort(reverse=True)
+    for i, (lp_comments, lp_upvotes, title) in enumerate(learning_posts[:10]):
+        print(f"{i+1}. [{lp_comments:,} comments, {lp_upvotes} upvotes] {title}...")
+    return {}
+
+# 8. Summary Statistics for Paper (from the other sections' results)
+def summary(results):
+    basic = results['basic_statistics']
+    qs = results['questions_vs_statements']
+    kt = results['knowledge_types']
+    gini = results['participation_inequality']
+    peak = results['temporal']
+    print("\n" + "=" * 70)
+    print("SUMMARY FOR PAPER")
+    print("=" * 70)
+
+    print(f"""
+Dataset: {basic['total_posts']:,} unique posts from Moltbook
+Total engagement: {basic['total_comments']:,} comments, {basic['total_upvotes']:,} upvotes
 
 Key Findings:
-1. Questions vs Statements: {len(statements):,} statements, {len(questions):,} questions
-   Ratio: {len(statements)/len(questions):.0f}:1
-   Statements get {mean(s_comments)/mean(q_comments):.1f}x more comments
+1. Questions vs Statements: {qs['statements']:,} statements, {qs['questions']:,} questions
+   Ratio: {qs['statements']/qs['questions']:.0f}:1
+   Statements get {qs['s_mean_comments']/qs['q_mean_comments']:.1f}x more comments
 
 2. Knowledge Types:
-   Procedural: {len(knowledge_types['procedural'])} posts
-   Conceptual: {len(knowledge_types['conceptual'])} posts
-   
+   Procedural: {kt['procedural_posts']} posts
+   Conceptual: {kt['conceptual_posts']} posts
+
 3. Participation Inequality:
-   Gini (upvotes): {gini_upvotes:.2f}
-   Gini (comments): {gini_comments:.2f}
-   
+   Gini (upvotes): {gini['gini_upvotes']:.2f}
+   Gini (comments): {gini['gini_comments']:.2f}
+
 4. Temporal Clustering:
-   Peak hour: {peak_hour}:00 UTC ({peak_pct:.1f}% of posts)
+   Peak hour: {peak['peak_hour']}:00 UTC ({peak['peak_pct']:.1f}% of posts)
 """)
-
-# Save results for paper
-results = {
-    'total_posts': len(posts),
-    'total_comments': sum(comments),
-    'total_upvotes': sum(upvotes),
-    'questions': len(questions),
-    'statements': len(statements),
-    'q_mean_upvotes': mean(q_upvotes),
-    'q_mean_comments': mean(q_comments),
-    's_mean_upvotes': mean(s_upvotes),
-    's_mean_comments': mean(s_comments),
-    'procedural_posts': len(knowledge_types['procedural']),
-    'conceptual_posts': len(knowledge_types['conceptual']),
-    'gini_upvotes': gini_upvotes,
-    'gini_comments': gini_comments,
-    'peak_hour': peak_hour,
-    'peak_pct': peak_pct,
+    return {}
+
+# Section -> (function, post columns it reads)
+SECTIONS = {
+    'basic_statistics': (basic_statistics, ('upvotes', 'comment_count')),
+    'questions_vs_statements': (questions_vs_statements, ('upvotes', 'comment_count', 'is_question')),
+    'knowledge_types': (knowledge_types, ('upvotes', 'comment_count', 'knowledge_type')),
+    'post_length': (post_length, ('upvotes', 'comment_count', 'body_length')),
+    'participation_inequality': (participation_inequality, ('upvotes', 'comment_count')),
+    'temporal': (temporal, ('created_at', 'is_spam')),
+    'top_learning_posts': (top_learning_posts, ('upvotes', 'comment_count', 'learning_titles')),
 }
 
-with open(DATA_FILE.parent / 'analysis_results.json', 'w') as f:
-    json.dump(results, f, indent=2)
-
-print(f"\nResults saved to {DATA_FILE.parent / 'analysis_results.json'}")
+def source_version(path):
+    """Content version of the input file: path, size, mtime and features version."""
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}:{FEATURES_VERSION}"
+
+def column_digests(cols):
+    digests = {name: array_digest(cols[name]) for _, columns in SECTIONS.values() for name in columns
+               if name != 'learning_titles'}
+    digests['learning_titles'] = content_key(json.dumps(sorted(cols['learning_titles'].items())))
+    return digests
+
+def section_key(name, digests):
+    fn, columns = SECTIONS[name]
+    return content_key(name, inspect.getsource(fn), LIBRARY_SOURCE, *(digests[c] for c in columns))
+
+def run_section(compute, key, cache):
+    """Print a section and return its results, replayed from the cache if key is stored; returns (results, hit)."""
+    entry = cache.get(key) if cache else None
+    hit = entry is not None
+    if not hit:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            results = compute()
+        # Through JSON, so computed and cached results look the same downstream
+        entry = {'output': out.getvalue(), 'results': json.loads(json.dumps(results))}
+        if cache:
+            cache.put(key, entry)
+    sys.stdout.write(entry['output'])
+    return entry['results'], hit
+
+def analyze(data_file=DATA_FILE, cache=None):
+    """Run (or replay) every section; returns {section: results}."""
+    version_key = content_key('columns', source_version(data_file))
+    source = cache.get(version_key) if cache else None
+    posts = None
+
+    def load():
+        nonlocal posts, source
+        with span('load') as section:
+            cols = load_posts(data_file)
+            posts = Posts(cols)
+            section.rows = posts.n
+        source = {'n_posts': posts.n, 'fetched_at': cols['fetched_at'], 'digests': column_digests(cols)}
+        if cache:
+            cache.put(version_key, source)
+
+    if source is None:
+        load()
+    keys = {name: section_key(name, source['digests']) for name in SECTIONS}
+    if posts is None and not all(cache.get(key) for key in keys.values()):
+        load()  # some section has to be computed
+    print(f"Loaded {source['n_posts']} unique posts")
+    if source['fetched_at']:
+        print(f"Fetched at: {source['fetched_at']}")
+    print()
+
+    print("=" * 70)
+    print("COMPREHENSIVE EDM ANALYSIS")
+    print("=" * 70)
+
+    results = {}
+    cached = []
+    for name, (fn, _) in SECTIONS.items():
+        with span(name) as section:
+            results[name], hit = run_section(lambda: fn(posts), keys[name], cache)
+            section.rows = 0 if hit else posts.n
+        if hit:
+            cached.append(name)
+    key = content_key('summary', inspect.getsource(summary), json.dumps(results, sort_keys=True))
+    with span('summary'):
+        _, hit = run_section(lambda: summary(results), key, cache)
+    if hit:
+        cached.append('summary')
+    if cache:
+        print(f"{len(cached)} of {len(SECTIONS) + 1} sections from the cache"
+              + (f" ({', '.join(cached)})" if cached else ''))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('data_file', nargs='?', type=Path, default=DATA_FILE, help='posts database or JSON crawl file')
+    parser.add_argument('--deep-profile', action='store_true', help='also run cProfile and tracemalloc (slower)')
+    parser.add_argument('--no-cache', action='store_true', help='recompute every section; do not read or write the cache')
+    parser.add_argument('--cache-dir', type=Path, help=f'section cache (default: {CACHE_DIR}/ next to the data file)')
+    parser.add_argument('--cache-size', type=float, default=MAX_BYTES / 2 ** 20,
+                        help='cache size limit in MB; least recently used entries are evicted')
+    args = parser.parse_args()
+    if args.deep_profile:
+        profiling.enable_deep()
+
+    out_dir = args.data_file.parent
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache_dir or out_dir / CACHE_DIR, int(args.cache_size * 2 ** 20))
+    sections = analyze(args.data_file, cache)
+
+    # Save results for paper
+    with span('save'):
+        results = {}
+        for name in SECTIONS:
+            results.update(sections[name])
+        with open(out_dir / 'analysis_results.json', 'w') as f:
+            json.dump(results, f, indent=2)
+    print(f"\nResults saved to {out_dir / 'analysis_results.json'}")
+
+    print()
+    profiling.print_report()
+    profiling.write(out_dir / 'analysis_profile.json')
+    print(f"Profile saved to {out_dir / 'analysis_profile.json'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Per-author activity profiles over posts and comments.
+Streams the posts table and the comments table once each into flat
+NumPy arrays (author code, time, upvotes) and computes every author's
+profile at once: hour-of-day histogram, intervals between consecutive
+posts or comments, upvote share and contribution to the upvote Gini,
+and a periodicity score from the autocorrelation of the author's
+activity series (FFT over batches of authors). Authors whose activity
+repeats at a fixed interval, or who concentrate in one hour of the day,
+are flagged as likely scheduled bots. Results go to the author_profiles
+table.
+
+Usage:
+    python scripts/author_profiles.py
+    python scripts/author_profiles.py --posts-db data/moltbook_combined.db \\
+        --comments-db data/moltbook_comments_full.db --out data/author_profiles.db
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+from stats_kernel import gini_contributions, group_median
+from time_buckets import SCHEDULING_THRESHOLD
+from timestamps import NO_TIMESTAMP
+
+POSTS_DB = Path("data/moltbook_combined.db")
+COMMENTS_DB = Path("data/moltbook_comments_full.db")
+CHUNK_SIZE = 100000
+
+KINDS = ('post', 'comment')
+
+MIN_EVENTS = 10  # fewer posts/comments than this are not profiled for periodicity
+BIN_SECONDS = 600  # activity series resolution
+MIN_LAG = 2  # bins; shorter lags only see bursts
+MAX_LAG = 24 * 3600 // BIN_SECONDS  # periods up to one day
+PERIODIC_ACF = 0.5  # autocorrelation peak that flags a fixed posting interval
+FFT_BATCH = 256  # authors per FFT batch
+
+
+def _read_events(cursor, kind, author_codes, names, parts, chunk_size):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        codes = []
+        for author_id, author_name, *_ in rows:
+            code = author_codes.get(author_id)
+            if code is None:
+                code = author_codes[author_id] = len(author_codes)
+                names.append(author_name)
+            codes.append(code)
+        _, _, created, upvotes = zip(*rows)
+        n = len(rows)
+        parts['author'].append(np.array(codes, dtype=np.int32))
+        parts['kind'].append(np.full(n, KINDS.index(kind), dtype=np.int8))
+        parts['created_at'].append(np.fromiter((NO_TIMESTAMP if t is None else t for t in created), np.int64, n))
+        parts['upvotes'].append(np.fromiter((u or 0 for u in upvotes), np.int64, n))
+
+def load_events(posts_db=POSTS_DB, comments_db=COMMENTS_DB, chunk_size=CHUNK_SIZE):
+    """Read every post and comment as (author, kind, created_at, upvotes) arrays.
+
+    Authors are coded in order of appearance across both databases;
+    'author_ids'/'author_names' map codes back. Rows without an author
+    are skipped.
+    """
+    author_codes = {}
+    names = []
+    parts = {'author': [], 'kind': [], 'created_at': [], 'upvotes': []}
+    sources = []
+    if posts_db:
+        conn = sqlite3.connect(f'file:{posts_db}?mode=ro', uri=True)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(posts)')}
+        created = "CAST(strftime('%s', created_at) AS INTEGER)"
+        if 'created_epoch' in columns:
+            created = f'COALESCE(created_epoch, {created})'
+        sources.append((conn, 'post', f'''
+            SELECT author_id, author_name, {created}, upvotes FROM posts
+            WHERE author_id IS NOT NULL AND author_id != ''
+        '''))
+    if comments_db:
+        conn = sqlite3.connect(f'file:{comments_db}?mode=ro', uri=True)
+        sources.append((conn, 'comment', '''
+            SELECT author_id, author_name, CAST(strftime('%s', created_at) AS INTEGER), upvotes
+            FROM comments WHERE author_id IS NOT NULL AND author_id != ''
+        '''))
+    for conn, kind, sql in sources:
+        _read_events(conn.execute(sql), kind, author_codes, names, parts, chunk_size)
+        conn.close()
+
+    events = {name: np.concatenate(chunks) if chunks else np.zeros(0, np.int64) for name, chunks in parts.items()}
+    ids = [None] * len(author_codes)
+    for author_id, code in author_codes.items():
+        ids[code] = author_id
+    events['author_ids'] = ids
+    events['author_names'] = names
+    return events
+
+def periodicity(group, created, groups, start, n_bins):
+    """Autocorrelation peak and its lag (seconds) of each group's activity series.
+
+    The series counts events per BIN_SECONDS bin from `start`; the
+    autocorrelation comes from one real FFT per batch of FFT_BATCH groups.
+    """
+    max_lag = min(MAX_LAG, n_bins - 1)
+    # Zero padding of max_lag bins keeps lags up to max_lag free of wrap-around
+    n_fft = 1 << int(np.ceil(np.log2(n_bins + max_lag)))
+    peaks = np.zeros(len(groups))
+    lags = np.zeros(len(groups), dtype=np.int64)
+    # Row of each selected group, -1 for the rest
+    row_of = np.full(int(group.max()) + 1 if group.size else 1, -1, dtype=np.int64)
+    row_of[groups] = np.arange(len(groups))
+    rows = row_of[group]
+    keep = rows >= 0
+    rows, bins = rows[keep], ((created[keep] - start) // BIN_SECONDS)
+    order = np.argsort(rows, kind='stable')
+    rows, bins = rows[order], bins[order]
+    bounds = np.searchsorted(rows, np.arange(0, len(groups) + FFT_BATCH, FFT_BATCH))
+
+    for b in range(0, len(groups), FFT_BATCH):
+        lo, hi = bounds[b // FFT_BATCH], bounds[b // FFT_BATCH + 1]
+        size = min(FFT_BATCH, len(groups) - b)
+        series = np.bincount((rows[lo:hi] - b) * n_fft + bins[lo:hi], minlength=size * n_fft)
+        series = series.reshape(size, n_fft).astype(np.float64)
+        series[:, :n_bins] -= series[:, :n_bins].mean(axis=1, keepdims=True)
+        spectrum = np.fft.rfft(series, axis=1)
+        acf = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=n_fft, axis=1)[:, :max_lag + 1]
+        acf /= np.maximum(acf[:, :1], 1e-12)
+        if max_lag >= MIN_LAG:
+            window = acf[:, MIN_LAG:]
+            best = window.argmax(axis=1)
+            peaks[b:b + size] = window[np.arange(size), best]
+            lags[b:b + size] = (best + MIN_LAG) * BIN_SECONDS
+    return peaks, lags
+
+def author_profiles(events):
+    """Profile arrays, one entry per (author, kind) with at least one event."""
+    n_authors = len(events['author_ids'])
+    group_all = events['author'].astype(np.int64) * len(KINDS) + events['kind']
+    n_groups = n_authors * len(KINDS)
+
+    counts = np.bincount(group_all, minlength=n_groups)
+    present = np.flatnonzero(counts)
+    upvotes = np.bincount(group_all, weights=events['upvotes'], minlength=n_groups)
+
+    timed = events['created_at'] != NO_TIMESTAMP
+    group, created = group_all[timed], events['created_at'][timed]
+    hours = (created // 3600) % 24
+    hour_counts = np.bincount(group * 24 + hours, minlength=n_groups * 24).reshape(n_groups, 24)
+    timed_counts = hour_counts.sum(axis=1)
+    peak_hour = hour_counts.argmax(axis=1)
+    peak_share = hour_counts.max(axis=1) / np.maximum(timed_counts, 1)
+
+    first = np.full(n_groups, NO_TIMESTAMP, dtype=np.int64)
+    last = np.full(n_groups, NO_TIMESTAMP, dtype=np.int64)
+    order = np.lexsort((created, group))
+    group, created = group[order], created[order]
+    if group.size:
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        ends = np.r_[starts[1:], group.size] - 1
+        first[group[starts]] = created[starts]
+        last[group[ends]] = created[ends]
+
+    # Gaps between consecutive events of the same author and kind
+    same = group[1:] == group[:-1]
+    gap_group = group[1:][same]
+    gaps = (created[1:] - created[:-1])[same].astype(np.float64)
+    n_gaps = np.bincount(gap_group, minlength=n_groups)
+    gap_sum = np.bincount(gap_group, weights=gaps, minlength=n_groups)
+    gap_sq = np.bincount(gap_group, weights=gaps ** 2, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_gap = np.where(n_gaps > 0, gap_sum / np.maximum(n_gaps, 1), np.nan)
+        std_gap = np.sqrt(np.maximum(gap_sq / np.maximum(n_gaps, 1) - mean_gap ** 2, 0))
+        gap_cv = np.where((n_gaps > 1) & (mean_gap > 0), std_gap / mean_gap, np.nan)
+    median_gap = group_median(gap_group, gaps, n_groups)
+
+    # Upvote share and Gini contribution within each kind
+    share = np.zeros(n_groups)
+    contribution = np.zeros(n_groups)
+    for k in range(len(KINDS)):
+        members = present[present % len(KINDS) == k]
+        total = upvotes[members].sum()
+        share[members] = upvotes[members] / total if total else 0
+        contribution[members] = gini_contributions(upvotes[members])
+
+    acf_peak = np.full(n_groups, np.nan)
+    period = np.zeros(n_groups, dtype=np.int64)
+    candidates = np.flatnonzero(timed_counts >= MIN_EVENTS)
+    if candidates.size:
+        start = int(created.min())
+        n_bins = int((created.max() - start) // BIN_SECONDS) + 1
+        peaks, lags = periodicity(group, created, candidates, start, n_bins)
+        acf_peak[candidates], period[candidates] = peaks, lags
+
+    profiled = timed_counts >= MIN_EVENTS
+    metrics = {
+        'events': counts,
+        'first_epoch': first,
+        'last_epoch': last,
+        'peak_hour': peak_hour,
+        'peak_share': peak_share,
+        'mean_interval': mean_gap,
+        'median_interval': median_gap,
+        'interval_cv': gap_cv,
+        'upvotes': upvotes.astype(np.int64),
+        'upvote_share': share,
+        'gini_contribution': contribution,
+        'acf_peak': acf_peak,
+        'period_seconds': period,
+        'is_periodic': profiled & (np.nan_to_num(acf_peak) >= PERIODIC_ACF),
+        'is_scheduled': profiled & (peak_share > SCHEDULING_THRESHOLD),
+    }
+    metrics = {name: values[present] for name, values in metrics.items()}
+    metrics['hour_counts'] = hour_counts[present]
+    metrics['author'] = present // len(KINDS)
+    metrics['kind'] = present % len(KINDS)
+    return metrics
+
+PROFILE_COLUMNS = ('events', 'first_epoch', 'last_epoch', 'peak_hour', 'peak_share', 'mean_interval',
+                   'median_interval', 'interval_cv', 'upvotes', 'upvote_share', 'gini_contribution',
+                   'acf_peak', 'period_seconds', 'is_periodic', 'is_scheduled')
+
+def write_profiles(db_file, events, profiles):
+    """Replace the author_profiles table with these profiles."""
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+    c.execute('DROP TABLE IF EXISTS author_profiles')
+    c.execute('''
+        CREATE TABLE author_profiles (
+            author_id TEXT,
+            kind TEXT,
+            author_name TEXT,
+            events INTEGER,
+            first_epoch INTEGER,
+            last_epoch INTEGER,
+            peak_hour INTEGER,
+            peak_share REAL,
+            mean_interval REAL,
+            median_interval REAL,
+            interval_cv REAL,
+            upvotes INTEGER,
+            upvote_share REAL,
+            gini_contribution REAL,
+            acf_peak REAL,
+            period_seconds INTEGER,
+            is_periodic INTEGER,
+            is_scheduled INTEGER,
+            hour_counts TEXT,
+            PRIMARY KEY (author_id, kind)
+        )
+    ''')
+
+    def column(values):
+        if values.dtype.kind == 'f':
+            return [None if v != v else v for v in values.tolist()]
+        return values.astype(np.int64).tolist()
+
+    ids, names = events['author_ids'], events['author_names']
+    authors = profiles['author'].tolist()
+    c.executemany(f'''
+        INSERT INTO author_profiles (author_id, kind, author_name, {', '.join(PROFILE_COLUMNS)}, hour_counts)
+        VALUES ({', '.join('?' * (len(PROFILE_COLUMNS) + 4))})
+    ''', zip((ids[a] for a in authors), (KINDS[k] for k in profiles['kind'].tolist()),
+             (names[a] for a in authors), *(column(profiles[name]) for name in PROFILE_COLUMNS),
+             (json.dumps(h) for h in profiles['hour_counts'].tolist())))
+    conn.commit()
+    conn.close()
+
+def print_summary(events, profiles):
+    print("\n" + "=" * 60)
+    print("AUTHOR PROFILES")
+    print("=" * 60)
+    for k, kind in enumerate(KINDS):
+        mine = profiles['kind'] == k
+        if not mine.any():
+            continue
+        events_k = profiles['events'][mine]
+        print(f"\n{kind.capitalize()} authors: {int(mine.sum()):,} ({int(events_k.sum()):,} {kind}s, "
+              f"median {np.median(events_k):.0f} per author)")
+        print(f"  Upvote Gini across authors: {profiles['gini_contribution'][mine].sum():.3f}")
+        top = np.sort(profiles['upvote_share'][mine])[::-1]
+        print(f"  Top 1% of authors hold {top[:max(len(top) // 100, 1)].sum() * 100:.1f}% of upvotes")
+        profiled = mine & (profiles['events'] >= MIN_EVENTS)
+        print(f"  Authors with >= {MIN_EVENTS} {kind}s: {int(profiled.sum()):,}")
+        print(f"  Scheduled (>{SCHEDULING_THRESHOLD:.0%} in one hour of day): {int(profiles['is_scheduled'][mine].sum()):,}")
+        periodic = np.flatnonzero(mine & profiles['is_periodic'])
+        print(f"  Periodic (autocorrelation >= {PERIODIC_ACF}): {len(periodic):,}")
+        for i in periodic[np.argsort(-profiles['events'][periodic])][:5]:
+            author = profiles['author'][i]
+            print(f"    {events['author_names'][author] or events['author_ids'][author]}: "
+                  f"{profiles['events'][i]:,} {kind}s, every {profiles['period_seconds'][i] / 60:.0f} min "
+                  f"(acf {profiles['acf_peak'][i]:.2f}, interval CV {profiles['interval_cv'][i]:.2f})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts-db', type=Path, default=POSTS_DB)
+    parser.add_argument('--comments-db', type=Path, default=COMMENTS_DB)
+    parser.add_argument('--no-comments', action='store_true', help='profile post authors only')
+    parser.add_argument('--out', type=Path, help='database for the author_profiles table (default: --posts-db)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    events = load_events(args.posts_db, None if args.no_comments else args.comments_db)
+    loaded = time.perf_counter()
+    print(f"Loaded {len(events['author']):,} posts and comments by {len(events['author_ids']):,} authors "
+          f"in {loaded - start:.1f}s")
+    profiles = author_profiles(events)
+    computed = time.perf_counter()
+    print(f"Computed {len(profiles['author']):,} profiles in {computed - loaded:.1f}s")
+    out = args.out or args.posts_db
+    write_profiles(out, events, profiles)
+    print(f"Wrote author_profiles to {out} in {time.perf_counter() - computed:.1f}s")
+    print_summary(events, profiles)
+
+if __name__ == "__main__":
+    main()
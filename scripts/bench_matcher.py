@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark the multi-pattern keyword matcher against the per-keyword
+`in` loop used by the original classifiers, and check that every
+backend finds the same keywords.
+
+Usage:
+    python scripts/bench_matcher.py                        # synthetic posts
+    python scripts/bench_matcher.py --db data/moltbook_combined.db
+    python scripts/bench_matcher.py --extra-keywords 500   # a larger taxonomy
+"""
+
+import argparse
+import random
+import time
+
+from features import TAXONOMY
+from keyword_matcher import BACKENDS, KeywordMatcher, ahocorasick, iter_text_batches
+
+WORDS = ('agent', 'memory', 'context', 'model', 'human', 'token', 'post', 'thread', 'today',
+         'learning', 'prompt', 'reply', 'molt', 'shell', 'night', 'data', 'clawback', 'mint',
+         'builder', 'thinking', 'why', 'skills', 'guide', 'wonderful', 'ideas', 'codebase')
+
+# Reference implementation: one `in` check per keyword and category,
+# as classify_posts and analyze_full_data originally did
+def legacy_counts(text, taxonomy):
+    text = text.lower()
+    return [sum(1 for k in keywords if k in text) for keywords in taxonomy.values()]
+
+def synthetic_texts(size, seed):
+    """Posts of 0-400 words drawn from a vocabulary that hits the taxonomy."""
+    rng = random.Random(seed)
+    vocab = WORDS + tuple(k.strip() for keywords in TAXONOMY.values() for k in keywords)
+    return [' '.join(rng.choice(vocab) for _ in range(rng.randint(0, 400))) for _ in range(size)]
+
+def db_texts(path, limit):
+    texts = []
+    for batch in iter_text_batches(path, f"SELECT title || ' ' || COALESCE(body, '') FROM posts LIMIT {limit}"):
+        texts.extend(batch)
+    return texts
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=20000, help='synthetic sample size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', help='benchmark on posts from a database instead')
+    parser.add_argument('--extra-keywords', type=int, default=0,
+                        help='add N synthetic keywords to a category to see how cost scales')
+    args = parser.parse_args()
+
+    texts = db_texts(args.db, args.size) if args.db else synthetic_texts(args.size, args.seed)
+    taxonomy = dict(TAXONOMY)
+    if args.extra_keywords:
+        taxonomy['extra'] = [f'keyword{i:05d}' for i in range(args.extra_keywords)]
+    n_keywords = len({k for keywords in taxonomy.values() for k in keywords})
+    print(f"Benchmarking on {len(texts):,} texts, {sum(map(len, texts)) / max(len(texts), 1):,.0f} chars "
+          f"on average, {n_keywords} keywords in {len(taxonomy)} categories")
+    print(f"{'method':<32}{'time (s)':>10}{'texts/s':>12}{'speedup':>10}")
+
+    legacy, legacy_time = timed(lambda: [legacy_counts(t, taxonomy) for t in texts])
+    print(f"{'legacy in-loop':<32}{legacy_time:>10.3f}{len(texts) / legacy_time:>12,.0f}{1:>9.1f}x")
+
+    backends = [b for b in BACKENDS if b != 'ahocorasick' or ahocorasick is not None]
+    for word_boundary in (False, True):
+        reference = None
+        for backend in backends:
+            matcher = KeywordMatcher(taxonomy, word_boundary=word_boundary, backend=backend)
+            counts, elapsed = timed(matcher.count_batch, texts)
+            counts = counts.tolist()
+            if word_boundary:
+                # All backends must agree with each other
+                if reference is None:
+                    reference = counts
+                elif counts != reference:
+                    raise AssertionError(f"{backend} with word boundaries disagrees with {backends[0]}")
+            elif counts != legacy:
+                raise AssertionError(f"{backend} disagrees with the legacy loop")
+            name = f"{backend}{' (word boundary)' if word_boundary else ''}"
+            print(f"{name:<32}{elapsed:>10.3f}{len(texts) / elapsed:>12,.0f}{legacy_time / elapsed:>9.1f}x")
+
+    if ahocorasick is None:
+        print("pyahocorasick is not installed; pip install pyahocorasick for the C automaton")
+    print("All backends match the legacy loop.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark every pipeline stage on synthetic data and catch regressions.
+For each size, synthetic_data.py writes a fresh seeded dataset, then
+each stage runs as its own process on a private copy of it: the JSON
+import, database setup (migrations, features, rollups, search index),
+classification, near-duplicate clustering, thread metrics, the columnar
+snapshot export, the analysis and the figures. Each stage reports wall
+time, CPU time and peak memory (max RSS over the stage and its worker
+processes).
+
+With --baseline, stages are compared against a saved run: one that is
+more than --threshold slower (or uses --mem-threshold more memory) than
+its baseline fails the run with exit status 1. Differences below
+MIN_SECONDS / MIN_MB are noise and never fail.
+
+Usage:
+    python scripts/bench_pipeline.py --sizes 10k --save-baseline
+    python scripts/bench_pipeline.py --sizes 10k,100k --baseline data/bench/baseline.json
+    python scripts/bench_pipeline.py --sizes full --stages setup,analysis
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from synthetic_data import COMMENTS_FILE, FULL_POSTS, JSON_FILE, POSTS_FILE
+
+SCRIPTS = Path(__file__).resolve().parent
+WORK_DIR = Path("data/bench")
+BASELINE = "baseline.json"
+SIZES = {'10k': 10000, '100k': 100000, 'full': FULL_POSTS}
+THRESHOLD = 0.25  # allowed slowdown before a stage fails
+MEM_THRESHOLD = 0.25  # allowed growth of peak memory
+MIN_SECONDS = 0.5  # smaller slowdowns are noise
+MIN_MB = 20
+
+# Stage -> command, given the size's work dir (in pipeline order; every
+# stage after setup needs the migrated databases it leaves behind)
+STAGES = {
+    'generate': lambda d, seed: ['synthetic_data.py', '--posts', str(d.n_posts), '--seed', str(seed),
+                                 '--out-dir', d.source, '--json'],
+    'import': lambda d, seed: ['setup_db.py', d.source / JSON_FILE, '--db', d.path / 'import.db', '--bulk',
+                               '--comments-db', d.path / 'missing.db'],
+    'setup': lambda d, seed: ['setup_db.py', d.path / 'missing.json', '--db', d.posts, '--comments-db', d.comments],
+    'classify': lambda d, seed: ['classify_corpus.py', '--posts-db', d.posts, '--comments-db', d.comments,
+                                 '--force'],
+    'near_duplicates': lambda d, seed: ['near_duplicates.py', '--posts-db', d.posts, '--comments-db', d.comments,
+                                        '--state', d.path / 'near_duplicates.npz', '--full'],
+    'threads': lambda d, seed: ['comment_threads.py', '--db', d.comments],
+    'snapshot': lambda d, seed: ['export_snapshot.py', '--posts-db', d.posts, '--comments-db', d.comments,
+                                 '--out', d.path / 'snapshot', '--force'],
+    'analysis': lambda d, seed: ['analyze_full_data.py', d.posts, '--no-cache'],
+    'figures': lambda d, seed: ['generate_figures.py', '--db', d.posts, '--output-dir', d.path / 'figures',
+                                '--force', '--no-cache', '--formats', 'png'],
+}
+
+
+class Workspace:
+    """Files of one benchmark size under work_dir/<size>."""
+
+    def __init__(self, work_dir, size):
+        self.n_posts = SIZES[size]
+        self.path = Path(work_dir) / size
+        self.source = self.path / 'source'
+        self.posts = self.path / POSTS_FILE
+        self.comments = self.path / COMMENTS_FILE
+        self.logs = self.path / 'logs'
+
+    def reset(self, stage):
+        """Start a stage from the release layout: setup gets fresh copies of the generated databases."""
+        if stage == 'import':
+            (self.path / 'import.db').unlink(missing_ok=True)
+        elif stage == 'setup':
+            shutil.copyfile(self.source / POSTS_FILE, self.posts)
+            shutil.copyfile(self.source / COMMENTS_FILE, self.comments)
+
+def run_stage(command, log_file):
+    """Run one stage; returns (exit status, wall seconds, CPU seconds, peak RSS in MB)."""
+    start = time.perf_counter()
+    with open(log_file, 'w') as log:
+        process = subprocess.Popen([sys.executable, SCRIPTS / command[0]] + [str(a) for a in command[1:]],
+                                   stdout=log, stderr=subprocess.STDOUT)
+        # wait4 reports the stage's own usage plus that of the workers it waited for
+        _, status, usage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - start
+    return os.waitstatus_to_exitcode(status), wall, usage.ru_utime + usage.ru_stime, usage.ru_maxrss / 1024
+
+def bench_size(work_dir, size, stages, seed, repeat=1):
+    """Time the stages on one dataset size; returns {stage: measurements}."""
+    ws = Workspace(work_dir, size)
+    ws.logs.mkdir(parents=True, exist_ok=True)
+    results = {}
+    print(f"\n{size} ({ws.n_posts:,} posts)")
+    print(f"  {'stage':<16}{'wall (s)':>10}{'cpu (s)':>10}{'rss (MB)':>10}")
+    if 'generate' not in stages and not (ws.source / POSTS_FILE).exists():
+        stages = ['generate'] + stages
+    if 'setup' not in stages and not ws.posts.exists():
+        stages = [s for s in STAGES if s == 'setup' or s in stages]
+    for stage in stages:
+        best = None
+        for _ in range(repeat):
+            ws.reset(stage)
+            code, wall, cpu, rss = run_stage(STAGES[stage](ws, seed), ws.logs / f'{stage}.log')
+            if code:
+                print(f"  {stage:<16}failed with status {code}, see {ws.logs / f'{stage}.log'}")
+                results[stage] = {'status': code}
+                return results
+            if best is None or wall < best['seconds']:
+                best = {'seconds': round(wall, 3), 'cpu_seconds': round(cpu, 3), 'max_rss_mb': round(rss, 1)}
+        results[stage] = best
+        print(f"  {stage:<16}{best['seconds']:>10.2f}{best['cpu_seconds']:>10.2f}{best['max_rss_mb']:>10.1f}")
+    return results
+
+def regressions(results, baseline, threshold=THRESHOLD, mem_threshold=MEM_THRESHOLD):
+    """(size, stage, message) for every stage that failed or is slower/larger than its baseline."""
+    found = []
+    for size, stages in results.items():
+        for stage, now in stages.items():
+            if 'status' in now:
+                found.append((size, stage, f"exited with status {now['status']}"))
+                continue
+            before = baseline.get(size, {}).get(stage)
+            if not before or 'status' in before:
+                continue
+            seconds, base = now['seconds'], before['seconds']
+            if seconds > base * (1 + threshold) and seconds - base > MIN_SECONDS:
+                found.append((size, stage, f"{seconds:.2f}s vs {base:.2f}s ({seconds / base - 1:+.0%})"))
+            rss, base_rss = now['max_rss_mb'], before['max_rss_mb']
+            if rss > base_rss * (1 + mem_threshold) and rss - base_rss > MIN_MB:
+                found.append((size, stage, f"{rss:.0f} MB vs {base_rss:.0f} MB ({rss / base_rss - 1:+.0%})"))
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10k', help=f"comma-separated, of {', '.join(SIZES)}")
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma-separated stages to run (default: all)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help='runs per stage; the fastest counts')
+    parser.add_argument('--work-dir', type=Path, default=WORK_DIR)
+    parser.add_argument('--out', type=Path, help='results file (default: <work-dir>/results.json)')
+    parser.add_argument('--baseline', type=Path, help='saved results to check for regressions')
+    parser.add_argument('--save-baseline', action='store_true', help=f'also save the results as <work-dir>/{BASELINE}')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='allowed slowdown (0.25 = 25%%)')
+    parser.add_argument('--mem-threshold', type=float, default=MEM_THRESHOLD, help='allowed peak memory growth')
+    args = parser.parse_args()
+
+    sizes = args.sizes.split(',')
+    stages = [s for s in STAGES if s in args.stages.split(',')]
+    for name in sizes:
+        if name not in SIZES:
+            parser.error(f"unknown size {name!r}")
+    for name in args.stages.split(','):
+        if name not in STAGES:
+            parser.error(f"unknown stage {name!r}")
+
+    results = {size: bench_size(args.work_dir, size, stages, args.seed, args.repeat) for size in sizes}
+    out = args.out or args.work_dir / 'results.json'
+    record = {'seed': args.seed, 'cpus': os.cpu_count(), 'results': results}
+    out.write_text(json.dumps(record, indent=2))
+    print(f"\nResults saved to {out}")
+    if args.save_baseline:
+        (args.work_dir / BASELINE).write_text(json.dumps(record, indent=2))
+        print(f"Baseline saved to {args.work_dir / BASELINE}")
+
+    baseline = json.loads(args.baseline.read_text())['results'] if args.baseline else {}
+    found = regressions(results, baseline, args.threshold, args.mem_threshold)
+    for size, stage, message in found:
+        print(f"REGRESSION {size} {stage}: {message}")
+    if args.baseline and not found:
+        print(f"No regressions against {args.baseline}")
+    sys.exit(1 if found else 0)
+
+if __name__ == "__main__":
+    main()
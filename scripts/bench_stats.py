@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark the array-based statistics kernel against the original
+pure-Python helpers from analyze_full_data.py, and check that both
+produce the same numbers.
+
+Usage:
+    python scripts/bench_stats.py                 # synthetic power-law data
+    python scripts/bench_stats.py --size 231080
+    python scripts/bench_stats.py --db data/moltbook_combined.db
+"""
+
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+import stats_kernel
+
+# Reference implementations, as originally written in analyze_full_data.py
+def legacy_gini_coefficient(values):
+    if not values or all(v == 0 for v in values):
+        return 0
+    sorted_values = sorted(values)
+    n = len(sorted_values)
+    total = sum(sorted_values)
+    if total == 0:
+        return 0
+    gini_sum = sum((2 * (i + 1) - n - 1) * v for i, v in enumerate(sorted_values))
+    return gini_sum / (n * total)
+
+def legacy_mean(values):
+    return sum(values) / len(values) if values else 0
+
+def legacy_median(values):
+    if not values:
+        return 0
+    sorted_v = sorted(values)
+    n = len(sorted_v)
+    if n % 2:
+        return sorted_v[n // 2]
+    return (sorted_v[n // 2 - 1] + sorted_v[n // 2]) / 2
+
+def legacy_std(values):
+    if len(values) < 2:
+        return 0
+    m = legacy_mean(values)
+    return math.sqrt(sum((v - m) ** 2 for v in values) / (len(values) - 1))
+
+def legacy_mann_whitney_u(group1, group2):
+    if not group1 or not group2:
+        return None, None
+
+    combined = [(v, 0) for v in group1] + [(v, 1) for v in group2]
+    combined.sort(key=lambda x: x[0])
+
+    ranks = []
+    i = 0
+    while i < len(combined):
+        j = i
+        while j < len(combined) and combined[j][0] == combined[i][0]:
+            j += 1
+        avg_rank = (i + j + 1) / 2
+        for k in range(i, j):
+            ranks.append((avg_rank, combined[k][1]))
+        i = j
+
+    r1 = sum(r for r, g in ranks if g == 0)
+    n1, n2 = len(group1), len(group2)
+    u1 = r1 - n1 * (n1 + 1) / 2
+    u2 = n1 * n2 - u1
+    u = min(u1, u2)
+    effect = 1 - (2 * u) / (n1 * n2)
+    return u, effect
+
+def synthetic_columns(size, seed):
+    """Power-law upvotes/comments with a ~20% question split."""
+    rng = random.Random(seed)
+    upvotes = [int(rng.paretovariate(1.2)) - 1 for _ in range(size)]
+    comments = [int(rng.paretovariate(1.1)) - 1 for _ in range(size)]
+    is_question = [rng.random() < 0.2 for _ in range(size)]
+    return upvotes, comments, is_question
+
+def db_columns(path):
+    from post_columns import load_posts
+    cols = load_posts(path)
+    return cols['upvotes'].tolist(), cols['comment_count'].tolist(), cols['is_question'].tolist()
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def check(name, legacy, kernel, rel_tol=1e-9):
+    if not math.isclose(legacy, kernel, rel_tol=rel_tol, abs_tol=1e-9):
+        raise AssertionError(f"{name}: legacy={legacy!r} kernel={kernel!r}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=100000, help='synthetic sample size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', help='benchmark on a posts database or JSON crawl instead')
+    args = parser.parse_args()
+
+    if args.db:
+        upvotes, comments, is_question = db_columns(args.db)
+    else:
+        upvotes, comments, is_question = synthetic_columns(args.size, args.seed)
+
+    q_up = [u for u, q in zip(upvotes, is_question) if q]
+    s_up = [u for u, q in zip(upvotes, is_question) if not q]
+    q_co = [c for c, q in zip(comments, is_question) if q]
+    s_co = [c for c, q in zip(comments, is_question) if not q]
+    print(f"Benchmarking on {len(upvotes):,} values ({len(q_up):,} questions)")
+    print(f"{'statistic':<28}{'legacy (s)':>12}{'kernel (s)':>12}{'speedup':>10}")
+
+    up_arr = np.asarray(upvotes)
+    co_arr = np.asarray(comments)
+    q_mask = np.asarray(is_question, dtype=bool)
+    legacy_total = kernel_total = 0.0
+
+    def report(name, legacy_time, kernel_time):
+        nonlocal legacy_total, kernel_total
+        legacy_total += legacy_time
+        kernel_total += kernel_time
+        print(f"{name:<28}{legacy_time:>12.4f}{kernel_time:>12.4f}{legacy_time / max(kernel_time, 1e-9):>9.1f}x")
+
+    for name, legacy_fn, kernel_fn in [
+        ('mean', legacy_mean, stats_kernel.mean),
+        ('std', legacy_std, stats_kernel.std),
+        ('median', legacy_median, stats_kernel.median),
+        ('gini', legacy_gini_coefficient, stats_kernel.gini_coefficient),
+    ]:
+        legacy, lt = timed(legacy_fn, upvotes)
+        kernel, kt = timed(kernel_fn, up_arr)
+        check(name, legacy, kernel)
+        report(name, lt, kt)
+
+    for name, group1, group2 in [('mann-whitney upvotes', s_up, q_up), ('mann-whitney comments', s_co, q_co)]:
+        (l_u, l_r), lt = timed(legacy_mann_whitney_u, group1, group2)
+        (k_u, k_r, _), kt = timed(stats_kernel.mann_whitney_u, np.asarray(group1), np.asarray(group2))
+        check(f"{name} U", l_u, k_u)
+        check(f"{name} r", l_r, k_r)
+        report(name, lt, kt)
+
+    # Several comparisons on one column share a single cached sort
+    start = time.perf_counter()
+    metric = stats_kernel.Metric(up_arr)
+    k_u, k_r, _ = metric.mann_whitney(~q_mask, q_mask)
+    k_gini = metric.gini()
+    k_median = metric.median()
+    cached_time = time.perf_counter() - start
+    l_u, l_r = legacy_mann_whitney_u(s_up, q_up)
+    check('cached mann-whitney U', l_u, k_u)
+    check('cached mann-whitney r', l_r, k_r)
+    check('cached gini', legacy_gini_coefficient(upvotes), k_gini)
+    check('cached median', legacy_median(upvotes), k_median)
+    print(f"{'cached metric (U+gini+med)':<28}{'':>12}{cached_time:>12.4f}")
+
+    metric = stats_kernel.Metric(co_arr)
+    check('cached gini comments', legacy_gini_coefficient(comments), metric.gini())
+
+    print(f"{'total':<28}{legacy_total:>12.4f}{kernel_total:>12.4f}{legacy_total / max(kernel_total, 1e-9):>9.1f}x")
+    print("All kernel results match the legacy implementations.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Sharded, multi-process classification of every post and comment.
+Each table's rowid range is cut into shards, and a process pool
+classifies them: every worker reads its shard straight from SQLite in
+rowid batches, runs the keyword classifiers of features.py
+(features.extract for posts, features.extract_comment for comments) and
+writes the labels back in one transaction per batch. The databases are
+switched to WAL for the run, so readers and the one writer at a time
+don't block each other. Classification scales with the workers; the
+writes themselves are serialized by SQLite.
+
+Only rows whose text hash or features version changed are classified
+again (text_hash and features_version are stored with the labels);
+--force reclassifies everything. Each shard reports its throughput, and
+--scaling times a dry run at 1, 2, 4, ... workers.
+
+Usage:
+    python scripts/classify_corpus.py
+    python scripts/classify_corpus.py --workers 8 --force
+    python scripts/classify_corpus.py --no-comments --scaling
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from features import COMMENT_FEATURE_COLUMNS, FEATURE_COLUMNS, FEATURES_VERSION, extract, extract_comment, text_hash
+from rollups import create_triggers, drop_triggers, rebuild_rollups
+from setup_db import migrate_posts
+
+POSTS_DB = Path("data/moltbook_combined.db")
+COMMENTS_DB = Path("data/moltbook_comments_full.db")
+BATCH_SIZE = 5000
+SHARDS_PER_WORKER = 4  # smaller shards even out the load across workers
+BUSY_TIMEOUT = 600  # seconds a worker waits for the write lock
+
+# Table -> (text columns, classifier, label columns)
+CLASSIFIERS = {
+    'posts': (('title', 'body'), extract, FEATURE_COLUMNS),
+    'comments': (('content',), extract_comment, COMMENT_FEATURE_COLUMNS),
+}
+
+# Columns the comments table gets on the first run (posts: setup_db.POST_MIGRATIONS)
+COMMENT_MIGRATIONS = {
+    'is_question': 'BOOLEAN',
+    'is_spam': 'BOOLEAN',
+    'is_learning': 'BOOLEAN',
+    'knowledge_type': 'TEXT',
+    'features_version': 'INTEGER',
+    'text_hash': 'INTEGER',
+}
+
+
+def migrate_comments(conn):
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(comments)')}
+    for name, decl in COMMENT_MIGRATIONS.items():
+        if name not in existing:
+            conn.execute(f'ALTER TABLE comments ADD COLUMN {name} {decl}')
+    conn.commit()
+
+def shard_ranges(conn, table, n_shards):
+    """[lo, hi] rowid ranges splitting table into about n_shards equal spans."""
+    lo, hi = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM {table}').fetchone()
+    if lo is None:
+        return []
+    step = max(1, -(-(hi - lo + 1) // n_shards))
+    return [(start, min(start + step - 1, hi)) for start in range(lo, hi + 1, step)]
+
+def classify_shard(db_file, table, lo, hi, force=False, dry_run=False, batch_size=BATCH_SIZE):
+    """Classify rows lo..hi of table; returns (table, lo, hi, rows read, rows classified, seconds).
+
+    Runs in a worker process with its own connection. Each batch is read
+    in full before it is classified, so no read statement holds the
+    database while the batch is written.
+    """
+    start = time.perf_counter()
+    columns, classify, labels = CLASSIFIERS[table]
+    conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT)
+    conn.execute('PRAGMA synchronous = NORMAL')  # durable enough in WAL mode
+    select = f'''
+        SELECT rowid, {', '.join(columns)}, features_version, text_hash FROM {table}
+        WHERE rowid > ? AND rowid <= ? ORDER BY rowid LIMIT ?
+    '''
+    update = f'''
+        UPDATE {table} SET {', '.join(f'{name} = ?' for name in labels)}, features_version = ?, text_hash = ?
+        WHERE rowid = ?
+    '''
+    read = classified = 0
+    last_rowid = lo - 1
+    while True:
+        rows = conn.execute(select, (last_rowid, hi, batch_size)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for rowid, *texts, version, old_hash in rows:
+            new_hash = text_hash(*texts)
+            if force or version != FEATURES_VERSION or old_hash != new_hash:
+                updates.append(classify(*texts) + (FEATURES_VERSION, new_hash, rowid))
+        if updates and not dry_run:
+            with conn:
+                conn.executemany(update, updates)
+        read += len(rows)
+        classified += len(updates)
+        last_rowid = rows[-1][0]
+    conn.close()
+    return table, lo, hi, read, classified, time.perf_counter() - start
+
+def classify_corpus(posts_db=POSTS_DB, comments_db=COMMENTS_DB, workers=None, force=False, dry_run=False,
+                    batch_size=BATCH_SIZE, verbose=True):
+    """Classify both tables across a process pool; returns {table: (rows read, rows classified)}."""
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    sources = [(table, db) for table, db in (('posts', posts_db), ('comments', comments_db)) if db]
+    conns = {}
+    jobs = []
+    for table, db in sources:
+        conn = conns[table] = sqlite3.connect(db, timeout=BUSY_TIMEOUT)
+        if table == 'posts':
+            migrate_posts(conn)
+        else:
+            migrate_comments(conn)
+        jobs += [(db, table, lo, hi) for lo, hi in shard_ranges(conn, table, workers * SHARDS_PER_WORKER)]
+    journal = {}
+    if not dry_run:
+        for table, conn in conns.items():
+            journal[table] = conn.execute('PRAGMA journal_mode').fetchone()[0]
+            conn.execute('PRAGMA journal_mode = WAL')
+        if 'posts' in conns:
+            # Label changes would update the rollups row by row; rebuilt below
+            drop_triggers(conns['posts'])
+            conns['posts'].commit()
+
+    totals = {table: [0, 0] for table, _ in sources}
+    finished = False
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(classify_shard, *job, force, dry_run, batch_size) for job in jobs]
+            for future in as_completed(futures):
+                table, lo, hi, read, classified, elapsed = future.result()
+                totals[table][0] += read
+                totals[table][1] += classified
+                if verbose:
+                    print(f"  {table} {lo:>9}-{hi:<9} {read:>8,} rows, {classified:>8,} classified "
+                          f"in {elapsed:5.1f}s ({read / max(elapsed, 1e-9):,.0f} rows/s)")
+        finished = True
+    finally:
+        if 'posts' in conns and not dry_run:
+            create_triggers(conns['posts'])
+            if totals['posts'][1] or not finished:
+                rebuild_rollups(conns['posts'])
+        for table, conn in conns.items():
+            if table in journal:
+                conn.execute(f'PRAGMA journal_mode = {journal[table]}')
+            conn.commit()
+            conn.close()
+
+    elapsed = time.perf_counter() - start
+    read = sum(r for r, _ in totals.values())
+    if verbose:
+        for table, (n_read, n_classified) in totals.items():
+            print(f"{table}: {n_classified:,} of {n_read:,} rows classified")
+        print(f"{read:,} rows in {elapsed:.1f}s with {workers} workers ({read / max(elapsed, 1e-9):,.0f} rows/s)")
+    return {table: tuple(counts) for table, counts in totals.items()}
+
+def scaling(posts_db, comments_db, max_workers=None, batch_size=BATCH_SIZE):
+    """Dry-run throughput at 1, 2, 4, ... workers, with speedup and parallel efficiency."""
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = sorted({1 << i for i in range(max_workers.bit_length()) if 1 << i <= max_workers} | {max_workers})
+    base = None
+    print(f"{'workers':>7}  {'seconds':>8}  {'rows/s':>10}  {'speedup':>7}  {'efficiency':>10}")
+    for n in counts:
+        start = time.perf_counter()
+        totals = classify_corpus(posts_db, comments_db, n, force=True, dry_run=True, batch_size=batch_size,
+                                 verbose=False)
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        rows = sum(r for r, _ in totals.values())
+        print(f"{n:>7}  {elapsed:>8.1f}  {rows / elapsed:>10,.0f}  {base / elapsed:>7.2f}  {base / elapsed / n:>10.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts-db', type=Path, default=POSTS_DB)
+    parser.add_argument('--comments-db', type=Path, default=COMMENTS_DB)
+    parser.add_argument('--no-comments', action='store_true', help='classify posts only')
+    parser.add_argument('--no-posts', action='store_true', help='classify comments only')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--force', action='store_true', help='reclassify rows whose text and version are unchanged')
+    parser.add_argument('--dry-run', action='store_true', help='classify without writing labels')
+    parser.add_argument('--scaling', action='store_true', help='time dry runs at 1, 2, 4, ... --workers workers')
+    args = parser.parse_args()
+
+    posts_db = None if args.no_posts else args.posts_db
+    comments_db = None if args.no_comments else args.comments_db
+    if args.scaling:
+        scaling(posts_db, comments_db, args.workers, args.batch_size)
+    else:
+        classify_corpus(posts_db, comments_db, args.workers, args.force, args.dry_run, args.batch_size)
+
+if __name__ == "__main__":
+    main()
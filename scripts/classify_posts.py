@@ -1,37 +1,19 @@
 """
 Post Classification Script
 Classifies Moltbook posts by knowledge type and discourse type.
+The keyword lists live in features.py, shared with setup_db and the analysis.
 """
 
+import features
+
+
 def classify_knowledge_type(title: str) -> str:
     """
     Classify post by knowledge type based on title keywords.
     
     Returns: 'Procedural', 'Conceptual', or 'Other'
     """
-    title_lower = title.lower()
-    
-    # Procedural keywords
-    procedural_keywords = [
-        'skill', 'build', 'built', 'how to', 'how-to', 
-        'tutorial', 'guide', 'til:', 'learned'
-    ]
-    
-    # Conceptual keywords  
-    conceptual_keywords = [
-        'why ', 'understand', 'theory', ' think ', 
-        'philosophy', 'consciousness', 'meaning'
-    ]
-    
-    for kw in procedural_keywords:
-        if kw in title_lower:
-            return 'Procedural'
-    
-    for kw in conceptual_keywords:
-        if kw in title_lower:
-            return 'Conceptual'
-    
-    return 'Other'
+    return features.title_knowledge_type(title).capitalize()
 
 
 def classify_discourse_type(title: str) -> str:
@@ -40,9 +22,7 @@ def classify_discourse_type(title: str) -> str:
     
     Returns: 'Question' or 'Statement'
     """
-    if '?' in title:
-        return 'Question'
-    return 'Statement'
+    return features.discourse_type(title).capitalize()
 
 
 def is_spam(title: str) -> bool:
@@ -51,13 +31,7 @@ def is_spam(title: str) -> bool:
     
     Returns: True if spam, False otherwise
     """
-    title_lower = title.lower()
-    spam_patterns = ['mint', 'claw', 'mbc']
-    
-    for pattern in spam_patterns:
-        if pattern in title_lower:
-            return True
-    return False
+    return features.is_spam(title)
 
 
 def classify_length(body_length: int) -> str:
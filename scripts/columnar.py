@@ -0,0 +1,196 @@
+"""
+Memory-mapped columnar snapshots of the posts and comments tables.
+A snapshot is a directory with manifest.json (each table's row count,
+columns and metadata) and one subdirectory per table holding every
+column in its own file(s), in row order:
+
+    numeric     <name>.npy                         a fixed-width array
+    text        <name>.offsets.npy, <name>.bytes   UTF-8 strings back to back;
+                                                   row i is bytes[offsets[i]:offsets[i + 1]]
+    dictionary  <name>.codes.npy and <name>.values.*   int32 code per row
+                                                   (-1 for NULL) into a text column of values
+
+Readers memory-map the files, so opening a column parses nothing and
+copies nothing; pages are read from disk as they are touched. NULL text
+reads as ''. export_snapshot.py writes snapshots from the databases, and
+post_columns.load_posts() accepts a snapshot directory.
+"""
+
+import json
+import os
+import shutil
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+TEXT = 'text'
+DICTIONARY = 'dictionary'
+
+
+def _map_array(path):
+    """Memory-map a .npy file (empty arrays are read normally: there is nothing to map)."""
+    array = np.load(path, mmap_mode='r')
+    return array if array.size else np.load(path)
+
+def _map_bytes(path):
+    if not os.path.getsize(path):
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+
+class TextColumn:
+    """Offset-encoded strings; row i is decoded when it is read."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def open(cls, directory, name):
+        return cls(_map_array(directory / f'{name}.offsets.npy'), _map_bytes(directory / f'{name}.bytes'))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8', 'surrogatepass')
+
+    def byte_lengths(self):
+        return np.diff(self.offsets)
+
+
+class DictionaryColumn:
+    """Per-row int32 codes into a text column of distinct values; code -1 is NULL."""
+
+    def __init__(self, codes, dictionary):
+        self.codes = codes
+        self.dictionary = dictionary
+
+    @classmethod
+    def open(cls, directory, name):
+        return cls(_map_array(directory / f'{name}.codes.npy'), TextColumn.open(directory, f'{name}.values'))
+
+    @cached_property
+    def values(self):
+        """All distinct values, decoded (code -> value)."""
+        return [self.dictionary[i] for i in range(len(self.dictionary))]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        code = self.codes[i]
+        return None if code < 0 else self.dictionary[code]
+
+    def code_of(self, value):
+        """Code of value (-1 if it never occurs), for filtering on the codes array."""
+        try:
+            return self.values.index(value)
+        except ValueError:
+            return -1
+
+
+class TableWriter:
+    """Streams one table into column files: append() chunks of rows, then close().
+
+    kinds maps each column to a NumPy dtype (numeric), TEXT or DICTIONARY.
+    """
+
+    def __init__(self, directory, kinds):
+        self.directory = Path(directory)
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+        self.directory.mkdir(parents=True)
+        self.kinds = kinds
+        self.rows = 0
+        self.numeric = {name: [] for name, kind in kinds.items() if kind not in (TEXT, DICTIONARY)}
+        self.text = {name: self._text_file(name) for name, kind in kinds.items() if kind == TEXT}
+        self.codes = {name: [] for name, kind in kinds.items() if kind == DICTIONARY}
+        self.dictionaries = {name: {} for name in self.codes}
+
+    def _text_file(self, name):
+        return {'file': open(self.directory / f'{name}.bytes', 'wb'), 'lengths': []}
+
+    def append(self, chunk):
+        """Add rows given as {column: sequence of values}."""
+        n = len(next(iter(chunk.values())))
+        for name, values in self.numeric.items():
+            values.append(np.asarray(chunk[name], dtype=self.kinds[name]))
+        for name, out in self.text.items():
+            encoded = _encode(chunk[name])
+            out['lengths'].append(np.fromiter(map(len, encoded), dtype=np.int64, count=n))
+            out['file'].write(b''.join(encoded))
+        for name, codes in self.codes.items():
+            lookup = self.dictionaries[name]
+            codes.append(np.fromiter((-1 if v is None else lookup.setdefault(v, len(lookup)) for v in chunk[name]),
+                                     dtype=np.int32, count=n))
+        self.rows += n
+
+    def close(self):
+        """Write the remaining files; returns the column kinds as stored in the manifest."""
+        for name, parts in self.numeric.items():
+            np.save(self.directory / f'{name}.npy', np.concatenate(parts) if parts
+                    else np.zeros(0, dtype=self.kinds[name]))
+        for name, out in self.text.items():
+            out['file'].close()
+            _save_offsets(self.directory / f'{name}.offsets.npy', out['lengths'])
+        for name, codes in self.codes.items():
+            np.save(self.directory / f'{name}.codes.npy', np.concatenate(codes) if codes
+                    else np.zeros(0, dtype=np.int32))
+            _write_strings(self.directory, f'{name}.values', list(self.dictionaries[name]))
+        return {name: kind if kind in (TEXT, DICTIONARY) else np.dtype(kind).name
+                for name, kind in self.kinds.items()}
+
+def _encode(values):
+    return [(v or '').encode('utf-8', 'surrogatepass') for v in values]
+
+def _write_strings(directory, name, values):
+    encoded = _encode(values)
+    (directory / f'{name}.bytes').write_bytes(b''.join(encoded))
+    _save_offsets(directory / f'{name}.offsets.npy', [np.fromiter(map(len, encoded), dtype=np.int64)])
+
+def _save_offsets(path, lengths):
+    lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64)
+    np.save(path, np.concatenate(([0], np.cumsum(lengths))).astype(np.int64))
+
+
+def is_snapshot(path):
+    return (Path(path) / MANIFEST).is_file()
+
+def read_manifest(path):
+    with open(Path(path) / MANIFEST) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_VERSION:
+        raise ValueError(f"{path}: snapshot format {manifest.get('format')}, expected {FORMAT_VERSION}")
+    return manifest
+
+def write_manifest(path, manifest):
+    manifest['format'] = FORMAT_VERSION
+    tmp = Path(path) / f'{MANIFEST}.tmp'
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, Path(path) / MANIFEST)
+
+def table_info(path, table):
+    """Manifest entry of a table: 'rows', 'columns' ({name: kind}) and its metadata."""
+    tables = read_manifest(path)['tables']
+    if table not in tables:
+        raise KeyError(f"{path}: no {table} table in the snapshot")
+    return tables[table]
+
+def load_table(path, table, columns=None):
+    """Memory-map columns of a snapshot table: arrays for numeric columns, TextColumn/DictionaryColumn otherwise."""
+    kinds = table_info(path, table)['columns']
+    directory = Path(path) / table
+    loaded = {}
+    for name in columns or kinds:
+        kind = kinds[name]
+        if kind == TEXT:
+            loaded[name] = TextColumn.open(directory, name)
+        elif kind == DICTIONARY:
+            loaded[name] = DictionaryColumn.open(directory, name)
+        else:
+            loaded[name] = _map_array(directory / f'{name}.npy')
+    return loaded
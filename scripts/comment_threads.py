@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Comment-thread engine for moltbook_comments_full.db.
+Streams the comments table once into flat NumPy arrays, builds a
+parent/child adjacency over them (CSR offsets, comments grouped per
+post) and computes per-thread metrics for every post in one pass:
+depth histogram, branching factor, reply latency and author
+reciprocity. Results go to the thread_summary and thread_depths tables.
+
+Usage:
+    python scripts/comment_threads.py
+    python scripts/comment_threads.py --db data/moltbook_comments_full.db --out data/threads.db
+"""
+
+import argparse
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+from stats_kernel import group_median
+from timestamps import NO_TIMESTAMP
+
+COMMENTS_DB = Path("data/moltbook_comments_full.db")
+CHUNK_SIZE = 100000
+
+
+def _has_id_index(conn):
+    """True if some index on comments starts with the id column (needed for the parent join)."""
+    for _, name, *_ in conn.execute('PRAGMA index_list(comments)'):
+        columns = [row[2] for row in conn.execute(f'PRAGMA index_info({name})')]
+        if columns[:1] == ['id']:
+            return True
+    return False
+
+def _gather_ranges(offsets, nodes, values):
+    """Concatenate values[offsets[n]:offsets[n + 1]] for every node, without a Python loop."""
+    starts = offsets[nodes]
+    lengths = offsets[nodes + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return values[:0]
+    shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return values[shifts + np.arange(total)]
+
+def load_threads(db_file=COMMENTS_DB, chunk_size=CHUNK_SIZE):
+    """Read the comments table into arrays grouped by post.
+
+    Comments are sorted by (post, created_at). Returns a dict with
+    'post_ids' (list of post ids, one per thread), 'post_offsets' (comments
+    of thread t are rows post_offsets[t]:post_offsets[t + 1]), per-comment
+    arrays 'thread', 'parent' (row of the parent comment, -1 for top-level),
+    'author' (integer code, -1 if unknown), 'created_at' (epoch seconds) and
+    'depth', plus the child adjacency 'child_offsets'/'children'.
+    """
+    conn = sqlite3.connect(db_file)
+    if not _has_id_index(conn):
+        print("Indexing comments(id) for the parent join...")
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_comments_id ON comments(id)')
+        conn.commit()
+
+    # The self-join turns parent ids into rowids inside SQLite, so no
+    # per-comment id mapping is built in Python
+    cursor = conn.execute('''
+        SELECT c.rowid, c.post_id, p.rowid, c.author_id,
+               CAST(strftime('%s', c.created_at) AS INTEGER)
+        FROM comments c LEFT JOIN comments p ON p.id = c.parent_id
+    ''')
+    post_codes = {}
+    author_codes = {}
+    parts = {'rowid': [], 'thread': [], 'parent_rowid': [], 'author': [], 'created_at': []}
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        rowids, posts, parents, authors, created = zip(*rows)
+        n = len(rows)
+        parts['rowid'].append(np.fromiter(rowids, np.int64, n))
+        parts['thread'].append(np.fromiter((post_codes.setdefault(p, len(post_codes)) for p in posts),
+                                           np.int32, n))
+        parts['parent_rowid'].append(np.fromiter((-1 if p is None else p for p in parents), np.int64, n))
+        parts['author'].append(np.fromiter((author_codes.setdefault(a, len(author_codes)) if a else -1
+                                            for a in authors), np.int32, n))
+        parts['created_at'].append(np.fromiter((NO_TIMESTAMP if t is None else t for t in created),
+                                               np.int64, n))
+    conn.close()
+
+    columns = {name: np.concatenate(chunks) if chunks else np.zeros(0, np.int64)
+               for name, chunks in parts.items()}
+    n = len(columns['rowid'])
+    n_threads = len(post_codes)
+
+    order = np.lexsort((columns['created_at'], columns['thread']))
+    rowid = columns['rowid'][order]
+    thread = columns['thread'][order].astype(np.int32)
+    parent_rowid = columns['parent_rowid'][order]
+
+    # rowid -> sorted row, then parent rowids -> parent rows
+    position = np.full(int(rowid.max()) + 1 if n else 1, -1, dtype=np.int32)
+    position[rowid] = np.arange(n, dtype=np.int32)
+    parent = np.where(parent_rowid >= 0, position[np.maximum(parent_rowid, 0)], -1).astype(np.int32)
+    # A parent in another thread is a data error; treat such comments as top-level
+    cross = (parent >= 0) & (thread[np.maximum(parent, 0)] != thread)
+    parent[cross] = -1
+
+    has_parent = parent >= 0
+    child_counts = np.bincount(parent[has_parent], minlength=n)
+    child_offsets = np.concatenate(([0], np.cumsum(child_counts))).astype(np.int64)
+    replies = np.nonzero(has_parent)[0]
+    children = replies[np.argsort(parent[replies], kind='stable')].astype(np.int32)
+
+    # Breadth-first over the adjacency; comments on a parent cycle keep depth -1
+    depth = np.full(n, -1, dtype=np.int32)
+    level = np.nonzero(~has_parent)[0]
+    d = 0
+    while level.size:
+        depth[level] = d
+        level = _gather_ranges(child_offsets, level, children)
+        d += 1
+
+    post_ids = [None] * n_threads
+    for post_id, code in post_codes.items():
+        post_ids[code] = post_id
+    return {
+        'post_ids': post_ids,
+        'post_offsets': np.concatenate(([0], np.cumsum(np.bincount(thread, minlength=n_threads)))),
+        'thread': thread,
+        'parent': parent,
+        'author': columns['author'][order].astype(np.int32),
+        'n_authors': len(author_codes),
+        'created_at': columns['created_at'][order],
+        'depth': depth,
+        'child_counts': child_counts,
+        'child_offsets': child_offsets,
+        'children': children,
+    }
+
+def thread_metrics(threads):
+    """Per-thread metric arrays (one entry per post) and the depth histogram."""
+    thread = threads['thread']
+    parent = threads['parent']
+    depth = threads['depth']
+    author = threads['author']
+    created = threads['created_at']
+    offsets = threads['post_offsets']
+    n_threads = len(threads['post_ids'])
+
+    comments = np.diff(offsets)
+    starts = offsets[:-1]
+    top_level = np.bincount(thread[parent < 0], minlength=n_threads)
+    reached = depth >= 0
+    max_depth = np.maximum.reduceat(depth, starts) if n_threads else np.zeros(0, np.int32)
+    mean_depth = (np.bincount(thread[reached], weights=depth[reached], minlength=n_threads) /
+                  np.maximum(np.bincount(thread[reached], minlength=n_threads), 1))
+
+    # Branching: children per node that has any, counting the post itself
+    # as the node the top-level comments reply to
+    child_counts = threads['child_counts']
+    internal = np.bincount(thread[child_counts > 0], minlength=n_threads) + (top_level > 0)
+    branching = np.where(internal > 0, comments / np.maximum(internal, 1), np.nan)
+    max_children = np.maximum(np.maximum.reduceat(child_counts, starts) if n_threads else 0, top_level)
+
+    # Reply latency: seconds between a reply and the comment it answers
+    is_reply = parent >= 0
+    reply = np.nonzero(is_reply)[0]
+    reply = reply[(created[reply] != NO_TIMESTAMP) & (created[parent[reply]] != NO_TIMESTAMP)]
+    latency = (created[reply] - created[parent[reply]]).astype(np.float64)
+    reply_thread = thread[reply]
+    n_replies = np.bincount(reply_thread, minlength=n_threads)
+    mean_latency = np.where(n_replies > 0, np.bincount(reply_thread, weights=latency, minlength=n_threads) /
+                            np.maximum(n_replies, 1), np.nan)
+    median_latency = group_median(reply_thread, latency, n_threads)
+
+    # Reciprocity: share of directed author pairs (A replied to B) in a
+    # thread where B also replied to A
+    n_authors = max(threads['n_authors'], 1)
+    replier = author[is_reply]
+    replied = author[parent[is_reply]]
+    pair_thread = thread[is_reply].astype(np.int64)
+    keep = (replier >= 0) & (replied >= 0) & (replier != replied)
+    pair_thread, replier, replied = pair_thread[keep], replier[keep].astype(np.int64), replied[keep].astype(np.int64)
+    pairs = np.unique((pair_thread * n_authors + replier) * n_authors + replied)
+    pair_owner = pairs // (n_authors * n_authors)
+    a, b = (pairs // n_authors) % n_authors, pairs % n_authors
+    reciprocated = np.isin((pair_owner * n_authors + b) * n_authors + a, pairs, assume_unique=True)
+    author_pairs = np.bincount(pair_owner, minlength=n_threads)
+    reciprocal_pairs = np.bincount(pair_owner[reciprocated], minlength=n_threads)
+    reciprocity = np.where(author_pairs > 0, reciprocal_pairs / np.maximum(author_pairs, 1), np.nan)
+
+    known = author >= 0
+    authors = np.bincount(np.unique(thread[known].astype(np.int64) * n_authors + author[known]) // n_authors,
+                          minlength=n_threads)
+
+    # Depth histogram as (thread, depth, comments) triples
+    max_d = int(depth.max()) + 1 if depth.size else 1
+    keys, counts = np.unique(thread[reached].astype(np.int64) * max_d + depth[reached], return_counts=True)
+
+    return {
+        'comments': comments,
+        'top_level': top_level,
+        'authors': authors,
+        'max_depth': max_depth,
+        'mean_depth': mean_depth,
+        'branching_factor': branching,
+        'max_children': max_children,
+        'replies': n_replies,
+        'median_reply_seconds': median_latency,
+        'mean_reply_seconds': mean_latency,
+        'author_pairs': author_pairs,
+        'reciprocal_pairs': reciprocal_pairs,
+        'reciprocity': reciprocity,
+        'depth_histogram': (keys // max_d, keys % max_d, counts),
+    }
+
+SUMMARY_COLUMNS = ('comments', 'top_level', 'authors', 'max_depth', 'mean_depth', 'branching_factor',
+                   'max_children', 'replies', 'median_reply_seconds', 'mean_reply_seconds',
+                   'author_pairs', 'reciprocal_pairs', 'reciprocity')
+
+def write_summary(db_file, threads, metrics):
+    """Replace the thread_summary and thread_depths tables with these results."""
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+    c.execute('DROP TABLE IF EXISTS thread_summary')
+    c.execute('''
+        CREATE TABLE thread_summary (
+            post_id TEXT PRIMARY KEY,
+            comments INTEGER,
+            top_level INTEGER,
+            authors INTEGER,
+            max_depth INTEGER,
+            mean_depth REAL,
+            branching_factor REAL,
+            max_children INTEGER,
+            replies INTEGER,
+            median_reply_seconds REAL,
+            mean_reply_seconds REAL,
+            author_pairs INTEGER,
+            reciprocal_pairs INTEGER,
+            reciprocity REAL
+        )
+    ''')
+    c.execute('DROP TABLE IF EXISTS thread_depths')
+    c.execute('''
+        CREATE TABLE thread_depths (
+            post_id TEXT,
+            depth INTEGER,
+            comments INTEGER,
+            PRIMARY KEY (post_id, depth)
+        )
+    ''')
+
+    def nullable(values):
+        return [None if v != v else v for v in values.tolist()]
+
+    columns = [nullable(metrics[name]) if metrics[name].dtype.kind == 'f' else metrics[name].tolist()
+               for name in SUMMARY_COLUMNS]
+    c.executemany(f'''
+        INSERT INTO thread_summary (post_id, {', '.join(SUMMARY_COLUMNS)})
+        VALUES ({', '.join('?' * (len(SUMMARY_COLUMNS) + 1))})
+    ''', zip(threads['post_ids'], *columns))
+
+    post_ids = threads['post_ids']
+    hist_thread, hist_depth, hist_count = metrics['depth_histogram']
+    c.executemany('INSERT INTO thread_depths (post_id, depth, comments) VALUES (?, ?, ?)',
+                  ((post_ids[t], d, n) for t, d, n in zip(hist_thread.tolist(), hist_depth.tolist(),
+                                                           hist_count.tolist())))
+    conn.commit()
+    conn.close()
+
+def print_summary(threads, metrics):
+    comments = metrics['comments']
+    print("\n" + "=" * 60)
+    print("COMMENT THREADS")
+    print("=" * 60)
+    print(f"Threads: {len(comments):,}")
+    if not len(comments):
+        return
+    print(f"Comments: {int(comments.sum()):,} (median {np.median(comments):.0f} per thread, max {comments.max():,})")
+    replies = metrics['replies']
+    print(f"Threads with replies: {int((replies > 0).sum()):,} ({100 * (replies > 0).mean():.1f}%)")
+    print(f"Mean max depth: {metrics['max_depth'].mean():.2f}")
+    print(f"Mean branching factor: {np.nanmean(metrics['branching_factor']):.2f}")
+    if replies.any():
+        print(f"Median reply latency (median over threads): "
+              f"{np.nanmedian(metrics['median_reply_seconds']) / 60:.1f} min")
+    pairs = metrics['author_pairs'].sum()
+    if pairs:
+        print(f"Author reciprocity: {metrics['reciprocal_pairs'].sum() / pairs:.3f} "
+              f"of {int(pairs):,} directed author pairs")
+
+    print("\nComments by depth:")
+    _, depth, counts = metrics['depth_histogram']
+    totals = np.bincount(depth, weights=counts)
+    for d, n in enumerate(totals[:10]):
+        print(f"  depth {d}: {int(n):,}")
+    if len(totals) > 10:
+        print(f"  depth 10+: {int(totals[10:].sum()):,}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', type=Path, default=COMMENTS_DB, help='comments database')
+    parser.add_argument('--out', type=Path, help='database for the summary tables (default: --db)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    threads = load_threads(args.db)
+    loaded = time.perf_counter()
+    print(f"Loaded {len(threads['thread']):,} comments in {len(threads['post_ids']):,} threads "
+          f"in {loaded - start:.1f}s")
+    metrics = thread_metrics(threads)
+    computed = time.perf_counter()
+    print(f"Computed thread metrics in {computed - loaded:.1f}s")
+    write_summary(args.out or args.db, threads, metrics)
+    print(f"Wrote thread_summary and thread_depths to {args.out or args.db} "
+          f"in {time.perf_counter() - computed:.1f}s")
+    print_summary(threads, metrics)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Cross-database queries over posts and comments.
+Opens moltbook_combined.db with moltbook_comments_full.db ATTACHed, so
+comment activity can be joined to post features (discourse type,
+knowledge type, submolt) inside SQLite. Covering indexes keep the joins
+on index pages; Python only ever sees the aggregated rows.
+
+Usage:
+    python scripts/db_queries.py --list
+    python scripts/db_queries.py comments_by_discourse reply_depth_by_submolt
+    python scripts/db_queries.py reply_depth_by_submolt --limit 20 --csv depth_by_submolt.csv
+"""
+
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+POSTS_DB = Path("data/moltbook_combined.db")
+COMMENTS_DB = Path("data/moltbook_comments_full.db")
+COMMENTS_SCHEMA = 'cdb'
+
+# Each index covers the columns the queries below read from its table
+COVERING_INDEXES = {
+    'main': {
+        'idx_posts_id_features': 'posts(id, submolt, is_spam, discourse_type, knowledge_type, created_at)',
+        'idx_posts_submolt_id': 'posts(submolt, id, is_spam)',
+    },
+    COMMENTS_SCHEMA: {
+        'idx_comments_post_created_author': 'comments(post_id, created_at, author_id)',
+        'idx_comments_post_depth': 'comments(post_id, depth)',
+    },
+}
+
+# Posts the paper counts as substantive (see classification/spam_filtering.md)
+NOT_SPAM = 'COALESCE(p.is_spam, 0) = 0'
+
+# The persisted title rule of classification/discourse_type.md (not is_question,
+# which also counts question-word openings)
+DISCOURSE_TYPE = "p.discourse_type"
+
+# Per-post comment totals read from idx_comments_post_created_author alone
+PER_POST = f'''
+    SELECT post_id, COUNT(*) AS comments, COUNT(DISTINCT author_id) AS commenters,
+           MIN(created_at) AS first_comment
+    FROM {COMMENTS_SCHEMA}.comments GROUP BY post_id
+'''
+
+QUERIES = {
+    'comments_by_discourse': (
+        'Comment activity per post for questions vs statements',
+        f'''
+        WITH per_post AS ({PER_POST})
+        SELECT {DISCOURSE_TYPE} AS discourse_type,
+               COUNT(*) AS posts,
+               COUNT(pp.post_id) AS posts_with_comments,
+               COALESCE(SUM(pp.comments), 0) AS comments,
+               AVG(COALESCE(pp.comments, 0)) AS comments_per_post,
+               AVG(pp.commenters) AS commenters_per_thread
+        FROM posts p LEFT JOIN per_post pp ON pp.post_id = p.id
+        WHERE {NOT_SPAM}
+        GROUP BY 1 ORDER BY 1
+        ''',
+    ),
+    'comments_by_knowledge_type': (
+        'Comment activity per post by knowledge type',
+        f'''
+        WITH per_post AS ({PER_POST})
+        SELECT COALESCE(p.knowledge_type, 'unknown') AS knowledge_type,
+               COUNT(*) AS posts,
+               COUNT(pp.post_id) AS posts_with_comments,
+               COALESCE(SUM(pp.comments), 0) AS comments,
+               AVG(COALESCE(pp.comments, 0)) AS comments_per_post,
+               AVG(pp.commenters) AS commenters_per_thread
+        FROM posts p LEFT JOIN per_post pp ON pp.post_id = p.id
+        WHERE {NOT_SPAM}
+        GROUP BY 1 ORDER BY posts DESC
+        ''',
+    ),
+    'reply_depth_by_submolt': (
+        'Reply depth of comments per submolt',
+        f'''
+        SELECT p.submolt,
+               COUNT(*) AS comments,
+               COUNT(DISTINCT c.post_id) AS threads,
+               AVG(c.depth) AS mean_depth,
+               MAX(c.depth) AS max_depth,
+               AVG(c.depth > 0) AS reply_share
+        FROM {COMMENTS_SCHEMA}.comments c JOIN posts p ON p.id = c.post_id
+        WHERE {NOT_SPAM} AND p.submolt != ''
+        GROUP BY p.submolt HAVING COUNT(*) >= :min_comments
+        ORDER BY comments DESC LIMIT :limit
+        ''',
+    ),
+    'first_comment_latency_by_discourse': (
+        'Hours from post to first comment, questions vs statements',
+        f'''
+        WITH per_post AS ({PER_POST})
+        SELECT {DISCOURSE_TYPE} AS discourse_type,
+               COUNT(*) AS threads,
+               AVG((julianday(pp.first_comment) - julianday(p.created_at)) * 24) AS mean_hours_to_first_comment,
+               AVG((julianday(pp.first_comment) - julianday(p.created_at)) * 24 <= 1) AS answered_within_hour
+        FROM posts p JOIN per_post pp ON pp.post_id = p.id
+        WHERE {NOT_SPAM} AND p.created_at IS NOT NULL
+        GROUP BY 1 ORDER BY 1
+        ''',
+    ),
+    'commenters_by_submolt': (
+        'Distinct commenters and comments per commenter for each submolt',
+        f'''
+        SELECT p.submolt,
+               COUNT(DISTINCT c.author_id) AS commenters,
+               COUNT(*) AS comments,
+               COUNT(*) * 1.0 / COUNT(DISTINCT c.author_id) AS comments_per_commenter
+        FROM {COMMENTS_SCHEMA}.comments c JOIN posts p ON p.id = c.post_id
+        WHERE {NOT_SPAM} AND p.submolt != ''
+        GROUP BY p.submolt HAVING COUNT(*) >= :min_comments
+        ORDER BY commenters DESC LIMIT :limit
+        ''',
+    ),
+}
+
+DEFAULT_PARAMS = {'limit': 10, 'min_comments': 1}
+
+
+def connect(posts_db=POSTS_DB, comments_db=COMMENTS_DB, create_indexes=True):
+    """Open the posts database with the comments database ATTACHed as `cdb`."""
+    conn = sqlite3.connect(posts_db)
+    conn.execute(f'ATTACH DATABASE ? AS {COMMENTS_SCHEMA}', (str(comments_db),))
+    missing = {'knowledge_type', 'is_spam', 'discourse_type'} - {
+        row[1] for row in conn.execute('PRAGMA main.table_info(posts)')}
+    if missing:
+        raise RuntimeError(f"posts table lacks {', '.join(sorted(missing))}; "
+                           f"run scripts/setup_db.py --db {posts_db} to add the feature columns")
+    if create_indexes:
+        ensure_indexes(conn)
+    return conn
+
+def ensure_indexes(conn):
+    """Create any missing covering index; the first build scans each table once.
+
+    An index whose columns changed since it was built is rebuilt.
+    """
+    for schema, indexes in COVERING_INDEXES.items():
+        existing = dict(conn.execute(f"SELECT name, sql FROM {schema}.sqlite_master WHERE type = 'index'"))
+        for name, target in indexes.items():
+            if name in existing:
+                if existing[name].endswith(f' ON {target}'):
+                    continue
+                conn.execute(f'DROP INDEX {schema}.{name}')
+            start = time.perf_counter()
+            conn.execute(f'CREATE INDEX {schema}.{name} ON {target}')
+            # Fresh statistics so the planner picks the covering index
+            conn.execute(f"ANALYZE {schema}.{target.split('(')[0]}")
+            conn.commit()
+            print(f"Built {schema}.{name} in {time.perf_counter() - start:.1f}s")
+
+def run_query(conn, name, **params):
+    """Run one of QUERIES; returns (column names, rows)."""
+    _, sql = QUERIES[name]
+    cursor = conn.execute(sql, {**DEFAULT_PARAMS, **params})
+    return [d[0] for d in cursor.description], cursor.fetchall()
+
+def query_plan(conn, name, **params):
+    _, sql = QUERIES[name]
+    return [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, {**DEFAULT_PARAMS, **params})]
+
+def print_table(columns, rows):
+    def fmt(v):
+        if isinstance(v, float):
+            return f'{v:,.3f}'
+        if isinstance(v, int):
+            return f'{v:,}'
+        return str(v)
+    cells = [[fmt(v) for v in row] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    print('  '.join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in cells:
+        print('  '.join(v.rjust(w) if i else v.ljust(w) for i, (v, w) in enumerate(zip(row, widths))))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('queries', nargs='*', help='queries to run (default: all)')
+    parser.add_argument('--posts-db', type=Path, default=POSTS_DB)
+    parser.add_argument('--comments-db', type=Path, default=COMMENTS_DB)
+    parser.add_argument('--limit', type=int, default=DEFAULT_PARAMS['limit'], help='rows for per-submolt queries')
+    parser.add_argument('--min-comments', type=int, default=DEFAULT_PARAMS['min_comments'])
+    parser.add_argument('--csv', type=Path, help='write the (single) query result to this CSV file')
+    parser.add_argument('--plan', action='store_true', help='show the SQLite query plan instead of running')
+    parser.add_argument('--list', action='store_true', help='list the available queries')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (description, _) in QUERIES.items():
+            print(f"{name:<38}{description}")
+        return
+    names = args.queries or list(QUERIES)
+    unknown = [n for n in names if n not in QUERIES]
+    if unknown:
+        parser.error(f"unknown query: {', '.join(unknown)} (see --list)")
+    if args.csv and len(names) != 1:
+        parser.error('--csv takes exactly one query')
+
+    conn = connect(args.posts_db, args.comments_db)
+    params = {'limit': args.limit, 'min_comments': args.min_comments}
+    for name in names:
+        print(f"\n{name}: {QUERIES[name][0]}")
+        if args.plan:
+            print('\n'.join(f"  {step}" for step in query_plan(conn, name, **params)))
+            continue
+        start = time.perf_counter()
+        columns, rows = run_query(conn, name, **params)
+        print_table(columns, rows)
+        print(f"({len(rows)} rows in {time.perf_counter() - start:.2f}s)")
+        if args.csv:
+            with open(args.csv, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(rows)
+            print(f"Saved to {args.csv}", file=sys.stderr)
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Export the posts and comments databases to a columnar snapshot
+(columnar.py) that scripts memory-map instead of decoding SQLite rows.
+Numbers, flags and epoch timestamps become fixed-width arrays; submolt,
+author and post ids, which repeat, are dictionary-encoded; titles, bodies
+and comment texts are offset-encoded UTF-8.
+
+The posts table carries the columns of post_columns.load_posts (with
+the features and epoch seconds that setup_db.py persists), so the
+analysis and the figures read a snapshot directly:
+
+    python scripts/analyze_full_data.py data/snapshot
+
+A table is exported again only when its database (or FEATURES_VERSION)
+changed since the last export, or with --force.
+
+Usage:
+    python scripts/export_snapshot.py
+    python scripts/export_snapshot.py --out data/snapshot --force
+    python scripts/export_snapshot.py --no-comments
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+from columnar import DICTIONARY, TEXT, TableWriter, is_snapshot, load_table, read_manifest, write_manifest
+from features import FEATURES_VERSION
+from post_columns import COLUMN_DTYPES, load_posts_sqlite
+from timestamps import parse_epochs
+
+POSTS_DB = Path("data/moltbook_combined.db")
+COMMENTS_DB = Path("data/moltbook_comments_full.db")
+SNAPSHOT_DIR = Path("data/snapshot")
+CHUNK_SIZE = 50000
+
+POST_KINDS = {
+    **COLUMN_DTYPES,
+    'downvotes': np.int64,
+    'id': TEXT,
+    'title': TEXT,
+    'body': TEXT,
+    'author_id': DICTIONARY,
+    'author_name': DICTIONARY,
+    'submolt': DICTIONARY,
+}
+
+COMMENT_KINDS = {
+    'upvotes': np.int64,
+    'downvotes': np.int64,
+    'author_karma': np.int64,
+    'depth': np.int64,
+    'created_at': np.int64,
+    'id': TEXT,
+    'parent_id': TEXT,
+    'content': TEXT,
+    'post_id': DICTIONARY,
+    'author_id': DICTIONARY,
+    'author_name': DICTIONARY,
+}
+
+# Labels classify_corpus.py adds to the comments table, exported when present
+COMMENT_LABEL_KINDS = {
+    'is_question': np.bool_,
+    'is_spam': np.bool_,
+    'is_learning': np.bool_,
+    'knowledge_type': DICTIONARY,
+}
+
+
+def source_version(path):
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}:{FEATURES_VERSION}"
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+def comment_kinds(db):
+    conn = sqlite3.connect(f'file:{db}?mode=ro', uri=True)
+    present = _columns(conn, 'comments')
+    conn.close()
+    return {**COMMENT_KINDS, **{name: kind for name, kind in COMMENT_LABEL_KINDS.items() if name in present}}
+
+def export_posts(db, writer):
+    """Stream the posts table into writer; returns the table metadata."""
+    # Analysis columns (features, epochs) exactly as load_posts reads them
+    cols = load_posts_sqlite(db)
+    conn = sqlite3.connect(f'file:{db}?mode=ro', uri=True)
+    cursor = conn.execute('''
+        SELECT id, title, body, author_id, author_name, submolt, COALESCE(downvotes, 0)
+        FROM posts ORDER BY rowid
+    ''')
+    offset = 0
+    while True:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            break
+        chunk = dict(zip(('id', 'title', 'body', 'author_id', 'author_name', 'submolt', 'downvotes'), zip(*rows)))
+        for name in COLUMN_DTYPES:
+            chunk[name] = cols[name][offset:offset + len(rows)]
+        writer.append(chunk)
+        offset += len(rows)
+    conn.close()
+    return {'fetched_at': cols['fetched_at']}
+
+def export_comments(db, writer):
+    """Stream the comments table into writer; returns the table metadata."""
+    labels = [name for name in COMMENT_LABEL_KINDS if name in writer.kinds]
+    exprs = {
+        'id': 'id', 'parent_id': 'parent_id', 'content': 'content', 'post_id': 'post_id',
+        'author_id': 'author_id', 'author_name': 'author_name',
+        'upvotes': 'COALESCE(upvotes, 0)', 'downvotes': 'COALESCE(downvotes, 0)',
+        'author_karma': 'COALESCE(author_karma, 0)', 'depth': 'COALESCE(depth, 0)', 'created_at': 'created_at',
+    }
+    exprs.update({name: name if COMMENT_LABEL_KINDS[name] == DICTIONARY else f'COALESCE({name}, 0)'
+                  for name in labels})
+    conn = sqlite3.connect(f'file:{db}?mode=ro', uri=True)
+    cursor = conn.execute(f"SELECT {', '.join(exprs.values())} FROM comments ORDER BY rowid")
+    while True:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            break
+        chunk = dict(zip(exprs, zip(*rows)))
+        chunk['created_at'] = parse_epochs(chunk['created_at'])
+        writer.append(chunk)
+    conn.close()
+    return {}
+
+def export_snapshot(posts_db=POSTS_DB, comments_db=COMMENTS_DB, out=SNAPSHOT_DIR, force=False):
+    """Export each given database whose source changed; returns {table: rows written}."""
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(out) if is_snapshot(out) else {'tables': {}}
+    written = {}
+    for table, db, export in (('posts', posts_db, export_posts), ('comments', comments_db, export_comments)):
+        if db is None:
+            continue
+        if not Path(db).exists():
+            print(f"{table}: {db} not found, skipped")
+            continue
+        version = source_version(db)
+        if not force and manifest['tables'].get(table, {}).get('source') == version:
+            print(f"{table}: unchanged since the last export")
+            continue
+        start = time.perf_counter()
+        kinds = POST_KINDS if table == 'posts' else comment_kinds(db)
+        # Written beside the old table and swapped in, then the manifest is updated
+        writer = TableWriter(out / f'{table}.tmp', kinds)
+        meta = export(db, writer)
+        columns = writer.close()
+        shutil.rmtree(out / table, ignore_errors=True)
+        os.replace(out / f'{table}.tmp', out / table)
+        manifest['tables'][table] = {'rows': writer.rows, 'source': version, 'columns': columns, **meta}
+        write_manifest(out, manifest)
+        size = sum(f.stat().st_size for f in (out / table).iterdir())
+        print(f"{table}: {writer.rows:,} rows, {len(columns)} columns, {size / 2 ** 20:,.1f} MB "
+              f"in {time.perf_counter() - start:.1f}s")
+        written[table] = writer.rows
+    return written
+
+def time_load(out):
+    """Time memory-mapping upvotes and created_at of every table."""
+    start = time.perf_counter()
+    rows = 0
+    for table in read_manifest(out)['tables']:
+        cols = load_table(out, table, ['upvotes', 'created_at'])
+        rows += len(cols['upvotes'])
+    print(f"Mapped upvotes and created_at of {rows:,} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts-db', type=Path, default=POSTS_DB)
+    parser.add_argument('--comments-db', type=Path, default=COMMENTS_DB)
+    parser.add_argument('--out', type=Path, default=SNAPSHOT_DIR, help='snapshot directory')
+    parser.add_argument('--no-comments', action='store_true', help='export posts only')
+    parser.add_argument('--force', action='store_true', help='export tables whose database is unchanged too')
+    args = parser.parse_args()
+
+    export_snapshot(args.posts_db, None if args.no_comments else args.comments_db, args.out, args.force)
+    if is_snapshot(args.out):
+        time_load(args.out)
+
+if __name__ == "__main__":
+    main()
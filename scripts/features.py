@@ -0,0 +1,143 @@
+"""
+Post feature extraction shared by every script.
+One call per post computes all the heuristic flags at once
+(question, spam, learning, knowledge types, length) from the
+lowercased title and body, using one keyword list per feature.
+"""
+
+import hashlib
+
+from keyword_matcher import KeywordMatcher
+
+FEATURES_VERSION = 2
+
+# Columns produced by extract(), in order; setup_db persists them in posts
+FEATURE_COLUMNS = ('is_question', 'is_spam', 'is_learning', 'knowledge_type',
+                   'title_knowledge_type', 'discourse_type', 'body_length')
+
+KNOWLEDGE_TYPES = ('procedural', 'conceptual', 'other')
+
+QUESTION_PREFIXES = ('what ', 'why ', 'how ', 'is ', 'are ', 'do ', 'does ', 'can ', 'should ',
+                     'would ', 'could ', 'anyone ', 'who ', 'where ', 'when ')
+
+# Knowledge type over title + body: whichever list has more distinct hits
+PROCEDURAL_KEYWORDS = ['skill', 'build', 'built', 'how to', 'tutorial', 'guide', 'made', 'created',
+                       'workflow', 'tool', 'script', 'code', 'implement', 'setup', 'configure']
+CONCEPTUAL_KEYWORDS = ['understand', 'theory', 'why', 'philosophy', 'consciousness', 'meaning',
+                       'think', 'believe', 'concept', 'idea', 'question', 'wonder', 'curious']
+
+# Title-only knowledge type, see classification/knowledge_type.md
+TITLE_PROCEDURAL_KEYWORDS = ['skill', 'build', 'built', 'how to', 'how-to',
+                             'tutorial', 'guide', 'til:', 'learned']
+TITLE_CONCEPTUAL_KEYWORDS = ['why ', 'understand', 'theory', ' think ',
+                             'philosophy', 'consciousness', 'meaning']
+
+LEARNING_KEYWORDS = ['learn', 'skill', 'built', 'tutorial', 'how to', 'guide', 'discovered', 'figured out']
+
+# See classification/spam_filtering.md
+SPAM_PATTERNS = ['mint', 'claw', 'mbc']
+
+
+# Every keyword list by category, for corpus-wide matching (keyword_matcher.py)
+TAXONOMY = {
+    'spam': SPAM_PATTERNS,
+    'procedural': PROCEDURAL_KEYWORDS,
+    'conceptual': CONCEPTUAL_KEYWORDS,
+    'title_procedural': TITLE_PROCEDURAL_KEYWORDS,
+    'title_conceptual': TITLE_CONCEPTUAL_KEYWORDS,
+    'learning': LEARNING_KEYWORDS,
+}
+
+# Texts are lowercased once in extract(), so the matchers skip it
+TEXT_MATCHER = KeywordMatcher({'procedural': PROCEDURAL_KEYWORDS, 'conceptual': CONCEPTUAL_KEYWORDS},
+                              ignore_case=False)
+TITLE_MATCHER = KeywordMatcher({'learning': LEARNING_KEYWORDS, 'spam': SPAM_PATTERNS,
+                               'title_procedural': TITLE_PROCEDURAL_KEYWORDS,
+                               'title_conceptual': TITLE_CONCEPTUAL_KEYWORDS},
+                              ignore_case=False)
+
+_PROCEDURAL = frozenset(PROCEDURAL_KEYWORDS)
+_CONCEPTUAL = frozenset(CONCEPTUAL_KEYWORDS)
+_TITLE_PROCEDURAL = frozenset(TITLE_PROCEDURAL_KEYWORDS)
+_TITLE_CONCEPTUAL = frozenset(TITLE_CONCEPTUAL_KEYWORDS)
+_LEARNING = frozenset(LEARNING_KEYWORDS)
+_SPAM = frozenset(SPAM_PATTERNS)
+
+
+def _knowledge_type(hits):
+    proc_count = len(hits & _PROCEDURAL)
+    conc_count = len(hits & _CONCEPTUAL)
+    if proc_count > conc_count:
+        return 'procedural'
+    elif conc_count > proc_count:
+        return 'conceptual'
+    return 'other'
+
+def _title_knowledge_type(title_hits):
+    if title_hits & _TITLE_PROCEDURAL:
+        return 'procedural'
+    if title_hits & _TITLE_CONCEPTUAL:
+        return 'conceptual'
+    return 'other'
+
+def extract(title, body):
+    """All features of one post, as a tuple ordered like FEATURE_COLUMNS."""
+    title = title or ''
+    body = body or ''
+    title_lower = title.lower()
+    text_hits = TEXT_MATCHER.present(title_lower + ' ' + body.lower())
+    title_hits = TITLE_MATCHER.present(title_lower)
+    return (
+        '?' in title or title_lower.startswith(QUESTION_PREFIXES),
+        bool(title_hits & _SPAM),
+        bool(title_hits & _LEARNING),
+        _knowledge_type(text_hits),
+        _title_knowledge_type(title_hits),
+        'question' if '?' in title else 'statement',
+        len(body),
+    )
+
+# Columns produced by extract_comment(), for the comments table
+COMMENT_FEATURE_COLUMNS = ('is_question', 'is_spam', 'is_learning', 'knowledge_type')
+
+def extract_comment(content):
+    """Features of one comment, ordered like COMMENT_FEATURE_COLUMNS.
+
+    Comments have no title, so the title keyword lists (spam, learning)
+    are matched against the content.
+    """
+    content = content or ''
+    lower = content.lower()
+    hits = TITLE_MATCHER.present(lower)
+    return (
+        '?' in content,
+        bool(hits & _SPAM),
+        bool(hits & _LEARNING),
+        _knowledge_type(TEXT_MATCHER.present(lower)),
+    )
+
+def text_hash(*texts):
+    """Signed 64-bit hash of a row's classified text, stored as text_hash beside the labels."""
+    text = '\x1f'.join(t or '' for t in texts)
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+def extract_dict(title, body):
+    return dict(zip(FEATURE_COLUMNS, extract(title, body)))
+
+# Single-feature helpers for callers that only need one flag
+def is_question(title):
+    title = title or ''
+    return '?' in title or title.lower().startswith(QUESTION_PREFIXES)
+
+def is_spam(title):
+    return bool(TITLE_MATCHER.present((title or '').lower()) & _SPAM)
+
+def knowledge_type(title, body):
+    return _knowledge_type(TEXT_MATCHER.present(((title or '') + ' ' + (body or '')).lower()))
+
+def title_knowledge_type(title):
+    return _title_knowledge_type(TITLE_MATCHER.present((title or '').lower()))
+
+def discourse_type(title):
+    """Question if the title contains '?', see classification/discourse_type.md."""
+    return 'question' if '?' in (title or '') else 'statement'
@@ -2,129 +2,535 @@
 """
 Comprehensive Moltbook data fetcher for EDM analysis.
 Paginates through all posts to maximize dataset size.
+
+Feeds (the global sorts and every submolt feed) are crawled concurrently
+by a thread pool sharing one pooled HTTP session. Requests go through a
+per-endpoint token bucket and are retried with backoff on 429/5xx.
+
+Progress is appended to a JSON Lines checkpoint log (new or changed posts
+and the feed cursor, once per page), headed by the run it belongs to. An
+interrupted full crawl replays the log on restart and continues every
+feed where it stopped. An --incremental run keeps the recovered posts but
+not the cursors, whose offsets and done flags go stale as new posts
+arrive. A feed answering with a status retrying cannot fix (e.g. 404 for
+a deleted submolt) is closed as failed rather than left open.
+
+data/crawl_state.json keeps per-feed high-water marks across runs (the
+newest created_at seen in each feed). With --incremental the crawler
+starts from the previous snapshot and stops paginating a feed as soon as
+it reaches known territory: posts at or below the high-water mark for
+sort=new feeds, or a page with no unseen post ids for the other sorts.
 """
 
-import requests
+import argparse
 import json
-import time
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
+import requests
+from requests.adapters import HTTPAdapter
+
+import profiling
+from profiling import span
+from stream_posts import iter_posts
+
 API_KEY = "YOUR_MOLTBOOK_API_KEY"
 BASE_URL = "https://www.moltbook.com/api/v1"
 HEADERS = {"Authorization": f"Bearer {API_KEY}"}
 
 DATA_DIR = Path("data")
-DATA_DIR.mkdir(parents=True, exist_ok=True)
+CHECKPOINT_LOG = DATA_DIR / "all_posts.log.jsonl"
+SNAPSHOT_FILE = DATA_DIR / "all_posts.json"
+STATE_FILE = DATA_DIR / "crawl_state.json"
+PROFILE_FILE = DATA_DIR / "crawl_profile.json"
+
+PAGE_SIZE = 100
+WORKERS = 8
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5  # seconds, doubled on every retry
+BACKOFF_MAX = 30.0
+
+# Requests/second and burst size per endpoint (first path segment)
+RATE_LIMITS = {
+    'posts': (2.0, 4),
+    'submolts': (2.0, 4),
+}
+DEFAULT_RATE_LIMIT = (2.0, 4)
 
 all_posts = {}  # id -> post (deduplicated)
-stats = {"api_calls": 0, "posts_fetched": 0, "errors": 0}
-
-def fetch_posts(endpoint, params=None, max_pages=50):
-    """Fetch posts with pagination."""
-    if params is None:
-        params = {}
-    
-    page = 0
+cursors = {}  # feed key -> {"offset": next offset, "done": bool, "high_water": ...}
+crawl_state = {"feeds": {}}  # feed key -> {"high_water": ..., "completed_at": ..., "pages": ...}
+stats = {"api_calls": 0, "posts_fetched": 0, "errors": 0, "retries": 0, "rate_limited": 0}
+state_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests/second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold every caller for `seconds`, e.g. after a 429."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class MoltbookClient:
+    """Pooled HTTP session with per-endpoint rate limits and retries."""
+
+    def __init__(self, base_url=BASE_URL, workers=WORKERS, rate_limits=None):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        limits = dict(RATE_LIMITS, **(rate_limits or {}))
+        self.buckets = {name: TokenBucket(*limit) for name, limit in limits.items()}
+        self.default_limit = limits.get('default', DEFAULT_RATE_LIMIT)
+        self.buckets_lock = threading.Lock()
+
+    def bucket(self, endpoint):
+        key = endpoint.split('/', 1)[0]
+        with self.buckets_lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(*self.default_limit)
+            return self.buckets[key]
+
+    def get_json(self, endpoint, params=None):
+        """GET an endpoint, retrying 429/5xx and network errors with backoff.
+
+        Returns the decoded JSON, or None once retries are exhausted;
+        raises PermanentError on any other error status.
+        """
+        bucket = self.bucket(endpoint)
+        for attempt in range(MAX_RETRIES + 1):
+            bucket.acquire()
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * (1 + random.random() / 2)
+            try:
+                # Latency per endpoint, one sample per attempt
+                with span(f"http.{endpoint.split('/', 1)[0]}"):
+                    resp = self.session.get(f"{self.base_url}/{endpoint}", params=params, timeout=30)
+            except requests.RequestException as e:
+                # Retried like a 429/5xx; an error is only counted on giving up
+                print(f"  Exception on {endpoint}: {e}")
+            else:
+                with state_lock:
+                    stats["api_calls"] += 1
+                if resp.status_code == 200:
+                    return resp.json()
+                if resp.status_code != 429 and resp.status_code < 500:
+                    print(f"  Error {resp.status_code}: {resp.text[:100]}")
+                    with state_lock:
+                        stats["errors"] += 1
+                    raise PermanentError(f"HTTP {resp.status_code} on {endpoint}")
+                if resp.status_code == 429:
+                    retry_after = resp.headers.get('Retry-After')
+                    if retry_after and retry_after.isdigit():
+                        delay = max(delay, float(retry_after))
+                    bucket.pause(delay)
+                    with state_lock:
+                        stats["rate_limited"] += 1
+            if attempt < MAX_RETRIES:
+                with state_lock:
+                    stats["retries"] += 1
+                time.sleep(delay)
+        print(f"  Giving up on {endpoint} {params} after {MAX_RETRIES} retries")
+        with state_lock:
+            stats["errors"] += 1
+        return None
+
+
+class PermanentError(Exception):
+    """A request failed with a status that retrying will not fix (e.g. 404 for a deleted submolt)."""
+
+
+class CheckpointLog:
+    """Append-only JSON Lines log of crawled posts and feed cursors.
+
+    Each line is {"run": {"started_at": ..., "incremental": ...}},
+    {"post": {...}} or {"cursor": {"feed": ..., "offset": ..., "done": ...}};
+    cursors belong to the run line above them. Appends cost only the size
+    of the page, not of everything collected so far; compact() rewrites
+    the log with one line per post.
+    """
+
+    def __init__(self, path=CHECKPOINT_LOG):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.f = None
+        self.run = None
+
+    def recover(self):
+        """Replay the log into (posts, cursors, run) for its last run; a torn final line is ignored.
+
+        Posts of every run are kept. run is None for a log without run lines.
+        """
+        posts, feed_cursors, run = {}, {}, None
+        if not self.path.exists():
+            return posts, feed_cursors, run
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if 'post' in record:
+                    posts[record['post']['id']] = record['post']
+                elif 'cursor' in record:
+                    cursor = record['cursor']
+                    feed_cursors[cursor.pop('feed')] = cursor
+                elif 'run' in record:
+                    feed_cursors, run = {}, record['run']
+        return posts, feed_cursors, run
+
+    def open(self):
+        self.f = open(self.path, 'a')
+        # Terminate a line torn by a crash so the next record starts cleanly
+        if self.f.tell() and not self._ends_with_newline():
+            self.f.write('\n')
+        if not self.f.tell():
+            self.f.write(json.dumps({'run': self.run}) + '\n')
+            self.f.flush()
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def append(self, posts, feed, cursor):
+        lines = [json.dumps({'post': post}) for post in posts]
+        lines.append(json.dumps({'cursor': dict(cursor, feed=feed)}))
+        with self.lock:
+            self.f.write('\n'.join(lines) + '\n')
+            self.f.flush()
+
+    def compact(self, posts, feed_cursors):
+        """Rewrite the log with the current state only (atomic replace)."""
+        tmp = self.path.with_suffix('.tmp')
+        with self.lock:
+            with open(tmp, 'w') as f:
+                f.write(json.dumps({'run': self.run}) + '\n')
+                for post in posts.values():
+                    f.write(json.dumps({'post': post}) + '\n')
+                for feed, cursor in feed_cursors.items():
+                    f.write(json.dumps({'cursor': dict(cursor, feed=feed)}) + '\n')
+            if self.f:
+                self.f.close()
+            os.replace(tmp, self.path)
+            self.f = open(self.path, 'a')
+
+    def close(self):
+        if self.f:
+            self.f.close()
+            self.f = None
+
+    def remove(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+def feed_key(endpoint, params):
+    return f"{endpoint}?sort={params.get('sort')}"
+
+def created_epoch(post):
+    """created_at of an API post as epoch seconds, or None."""
+    ts = post.get('createdAt', post.get('created_at'))
+    if not ts:
+        return None
+    try:
+        if isinstance(ts, (int, float)):
+            return float(ts)
+        return datetime.fromisoformat(ts.replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def load_crawl_state():
+    if STATE_FILE.exists():
+        with open(STATE_FILE) as f:
+            crawl_state.update(json.load(f))
+
+def save_crawl_state():
+    with state_lock:
+        state = json.dumps(dict(crawl_state, updated_at=datetime.now().isoformat()), indent=2)
+    tmp = STATE_FILE.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        f.write(state)
+    os.replace(tmp, STATE_FILE)
+
+def complete_feed(key, high_water, pages):
+    """Record a finished feed and its new high-water mark in crawl_state.json."""
+    with state_lock:
+        feed_state = crawl_state['feeds'].setdefault(key, {})
+        if high_water is not None:
+            feed_state['high_water'] = max(high_water, feed_state.get('high_water') or high_water)
+        feed_state['completed_at'] = datetime.now().isoformat()
+        feed_state['pages'] = pages
+    save_crawl_state()
+
+def fetch_posts(client, endpoint, params=None, max_pages=50, log=None, incremental=False):
+    """Fetch posts with pagination, continuing from the feed's saved cursor.
+
+    With incremental=True, stop once the feed reaches posts we already
+    have (see the module docstring).
+    """
+    params = dict(params or {})
+    label = f"{endpoint} sort={params.get('sort')}"
+    key = feed_key(endpoint, params)
+    by_time = params.get('sort') == 'new'
+    with state_lock:
+        known_high_water = crawl_state['feeds'].get(key, {}).get('high_water')
+
+    with state_lock:
+        cursor = dict(cursors.get(key, {'offset': 0, 'done': False}))
+    if cursor['done']:
+        print(f"  [{label}] already {'failed' if cursor.get('failed') else 'complete'} in this run, skipping")
+        return len(all_posts)
+    page = cursor['offset'] // PAGE_SIZE
+    high_water = cursor.get('high_water')
+    if page:
+        print(f"  [{label}] resuming at page {page+1}")
+
+    def advance(changed, offset, done):
+        cursor.update(offset=offset, done=done, high_water=high_water)
+        with state_lock:
+            cursors[key] = dict(cursor)
+        if log:
+            log.append(changed, key, cursor)
+
     while page < max_pages:
+        params['limit'] = PAGE_SIZE
+        if page > 0:
+            params['offset'] = page * PAGE_SIZE
+
         try:
-            params['limit'] = 100
-            if page > 0:
-                params['offset'] = page * 100
-            
-            resp = requests.get(f"{BASE_URL}/{endpoint}", headers=HEADERS, params=params, timeout=30)
-            stats["api_calls"] += 1
-            
-            if resp.status_code != 200:
-                print(f"  Error {resp.status_code}: {resp.text[:100]}")
-                stats["errors"] += 1
-                break
-            
-            data = resp.json()
-            posts = data if isinstance(data, list) else data.get('posts', data.get('data', []))
-            
-            if not posts:
-                break
-            
+            data = client.get_json(endpoint, params)
+        except PermanentError as e:
+            # Closed, so the feed neither keeps the log alive nor is retried
+            # by a resume; the next run tries it afresh
+            print(f"  [{label}] {e}, giving up on the feed")
+            cursor['failed'] = str(e)
+            advance([], page * PAGE_SIZE, True)
+            break
+        if data is None:
+            # Record the cursor as open (also when no page has been fetched
+            # yet) so the feed counts as unfinished and a restart retries it
+            advance([], page * PAGE_SIZE, False)
+            break
+
+        posts = data if isinstance(data, list) else data.get('posts', data.get('data', []))
+
+        if not posts:
+            advance([], page * PAGE_SIZE, True)
+            complete_feed(key, high_water, page)
+            break
+
+        changed = []
+        unseen = 0
+        with state_lock:
             for post in posts:
-                if 'id' in post:
+                if 'id' not in post:
+                    continue
+                previous = all_posts.get(post['id'])
+                if previous is None:
+                    unseen += 1
+                if previous != post:
                     all_posts[post['id']] = post
-            
+                    changed.append(post)
             stats["posts_fetched"] += len(posts)
-            print(f"  Page {page+1}: {len(posts)} posts (total unique: {len(all_posts)})")
-            
-            if len(posts) < 100:
-                break
-            
-            page += 1
-            time.sleep(0.5)  # Rate limiting
-            
-        except Exception as e:
-            print(f"  Exception: {e}")
-            stats["errors"] += 1
+            total = len(all_posts)
+        print(f"  [{label}] Page {page+1}: {len(posts)} posts, {len(changed)} new/changed (total unique: {total})")
+
+        times = [t for t in map(created_epoch, posts) if t is not None]
+        if times:
+            high_water = max(times + ([high_water] if high_water is not None else []))
+
+        known = False
+        if incremental:
+            if by_time and known_high_water is not None and times:
+                known = min(times) <= known_high_water
+            elif not by_time:
+                known = unseen == 0
+
+        page += 1
+        done = len(posts) < PAGE_SIZE or page >= max_pages or known
+        advance(changed, page * PAGE_SIZE, done)
+
+        if known:
+            print(f"  [{label}] Reached known territory at page {page}, stopping")
+        if done:
+            complete_feed(key, high_water, page)
             break
-    
+
     return len(all_posts)
 
-def save_checkpoint():
-    """Save current data to file."""
-    output_file = DATA_DIR / "all_posts.json"
-    with open(output_file, 'w') as f:
-        json.dump({
+def write_snapshot():
+    """Write the deduplicated crawl as one JSON document for setup_db."""
+    with state_lock:
+        snapshot = {
             "fetched_at": datetime.now().isoformat(),
             "total_posts": len(all_posts),
-            "stats": stats,
+            "stats": dict(stats),
             "posts": list(all_posts.values())
-        }, f, indent=2)
-    print(f"\n✓ Checkpoint saved: {len(all_posts)} posts to {output_file}")
+        }
+    tmp = SNAPSHOT_FILE.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, SNAPSHOT_FILE)
+    print(f"\n✓ Snapshot saved: {snapshot['total_posts']} posts to {SNAPSHOT_FILE}")
+
+def parse_rate_limits(values):
+    """Parse --rate endpoint=rps[:burst] options."""
+    limits = {}
+    for value in values or []:
+        name, _, spec = value.partition('=')
+        rate, _, burst = spec.partition(':')
+        limits[name] = (float(rate), int(burst) if burst else max(1, int(float(rate) * 2)))
+    return limits
 
 def main():
+    parser = argparse.ArgumentParser(description="Crawl Moltbook posts")
+    parser.add_argument('--base-url', default=BASE_URL, help='API base URL (e.g. a local mock server)')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='concurrent feeds')
+    parser.add_argument('--rate', action='append', metavar='ENDPOINT=RPS[:BURST]',
+                        help='per-endpoint rate limit, e.g. posts=5:10 or default=2')
+    parser.add_argument('--submolts', type=int, default=30, help='number of submolts to crawl')
+    parser.add_argument('--incremental', action='store_true',
+                        help='refresh from the last snapshot, stopping each feed at known posts')
+    parser.add_argument('--deep-profile', action='store_true',
+                        help=f'also run cProfile and tracemalloc for {PROFILE_FILE.name} (slower)')
+    args = parser.parse_args()
+    if args.deep_profile:
+        profiling.enable_deep()
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    client = MoltbookClient(args.base_url, args.workers, parse_rate_limits(args.rate))
+    start = time.perf_counter()
+
+    load_crawl_state()
+    if args.incremental and SNAPSHOT_FILE.exists():
+        for post, _ in iter_posts(SNAPSHOT_FILE):
+            if 'id' in post:
+                all_posts[post['id']] = post
+        print(f"Incremental run: {len(all_posts)} posts known from {SNAPSHOT_FILE}")
+
+    log = CheckpointLog()
+    recovered_posts, recovered_cursors, run = log.recover()
+    all_posts.update(recovered_posts)
+    # Only an interrupted full crawl is resumed where its feeds stopped;
+    # an incremental run starts every feed afresh
+    resume = bool(recovered_cursors) and not args.incremental and not (run or {}).get('incremental')
+    if resume:
+        cursors.update(recovered_cursors)
+        started = f" (run started {run['started_at']})" if run else ''
+        print(f"Resuming: {len(all_posts)} posts and {len(cursors)} feed cursors from {log.path}{started}")
+    elif recovered_posts:
+        print(f"Recovered {len(recovered_posts)} posts from {log.path}")
+    log.run = run if resume and run else {'started_at': datetime.now().isoformat(), 'incremental': args.incremental}
+    if log.run is not run and log.path.exists():
+        # Start the new run's section: the recovered posts plus the cursors kept
+        log.compact(recovered_posts, cursors)
+    else:
+        log.open()
+
     print("=" * 60)
     print("MOLTBOOK DATA FETCHER - EDM Analysis")
     print(f"Output: {DATA_DIR}")
+    print(f"Workers: {args.workers}")
     print("=" * 60)
-    
-    # 1. Fetch by different sorts
-    for sort in ['hot', 'new', 'top', 'rising']:
-        print(f"\n[{sort.upper()}] Fetching posts sorted by {sort}...")
-        fetch_posts('posts', {'sort': sort}, max_pages=20)
-        save_checkpoint()
-    
-    # 2. Fetch from all submolts
-    print("\n[SUBMOLTS] Fetching submolt list...")
-    try:
-        resp = requests.get(f"{BASE_URL}/submolts", headers=HEADERS, timeout=30)
-        submolts = resp.json() if resp.status_code == 200 else []
-        stats["api_calls"] += 1
-        
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        # 1. Fetch by different sorts
+        futures = {
+            pool.submit(fetch_posts, client, 'posts', {'sort': sort}, 20, log, args.incremental): f"sort={sort}"
+            for sort in ['hot', 'new', 'top', 'rising']
+        }
+
+        # 2. Fetch from all submolts, concurrently with the sort feeds
+        print("\n[SUBMOLTS] Fetching submolt list...")
+        try:
+            submolts = client.get_json('submolts')
+        except PermanentError as e:
+            print(f"  {e}")
+            submolts = None
+        if isinstance(submolts, dict):
+            submolts = submolts.get('submolts', submolts.get('data', []))
+        submolts = submolts or []
+
         # Save submolts
         with open(DATA_DIR / "submolts.json", 'w') as f:
             json.dump(submolts, f, indent=2)
-        
+
         submolt_names = [s.get('name', s.get('slug')) for s in submolts if isinstance(s, dict)]
         print(f"  Found {len(submolt_names)} submolts")
-        
-        for i, name in enumerate(submolt_names[:30]):  # Top 30 submolts
+
+        for name in submolt_names[:args.submolts]:
             if name:
-                print(f"\n[SUBMOLT {i+1}/{min(len(submolt_names), 30)}] Fetching m/{name}...")
-                fetch_posts(f'submolts/{name}/feed', {'sort': 'top'}, max_pages=10)
-                fetch_posts(f'submolts/{name}/feed', {'sort': 'new'}, max_pages=10)
-                save_checkpoint()
-                
-    except Exception as e:
-        print(f"  Error fetching submolts: {e}")
-        stats["errors"] += 1
-    
+                for sort in ['top', 'new']:
+                    future = pool.submit(fetch_posts, client, f'submolts/{name}/feed', {'sort': sort}, 10, log,
+                                         args.incremental)
+                    futures[future] = f"m/{name} sort={sort}"
+
+        for i, future in enumerate(as_completed(futures)):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"  Feed {futures[future]} failed: {e}")
+                with state_lock:
+                    stats["errors"] += 1
+            print(f"\n[{i+1}/{len(futures)}] Finished {futures[future]}")
+
     # 3. Final summary
+    elapsed = time.perf_counter() - start
     print("\n" + "=" * 60)
     print("FINAL SUMMARY")
     print("=" * 60)
     print(f"Total unique posts: {len(all_posts)}")
-    print(f"API calls made: {stats['api_calls']}")
+    print(f"API calls made: {stats['api_calls']} in {elapsed:.1f}s")
+    print(f"Retries: {stats['retries']} ({stats['rate_limited']} rate-limited)")
     print(f"Errors: {stats['errors']}")
-    save_checkpoint()
-    
+    failed = [feed for feed, cursor in cursors.items() if cursor.get('failed')]
+    if failed:
+        print(f"Failed feeds: {len(failed)} ({', '.join(failed[:5])}{', ...' if len(failed) > 5 else ''})")
+    print()
+    profiling.print_report()
+    profiling.write(PROFILE_FILE)
+
+    # Compaction: one snapshot for setup_db; the log is only kept while
+    # some feed is unfinished, so the next run can pick it up
+    write_snapshot()
+    unfinished = [feed for feed, cursor in cursors.items() if not cursor['done']]
+    if unfinished:
+        log.compact(all_posts, cursors)
+        log.close()
+        print(f"{len(unfinished)} feeds unfinished; rerun to resume from {log.path}")
+    else:
+        log.remove()
+
     # 4. Quick analysis preview
     if all_posts:
         posts = list(all_posts.values())
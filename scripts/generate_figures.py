@@ -1,117 +1,210 @@
 #!/usr/bin/env python3
-"""Generate figures for EDM paper"""
+"""Generate figures for EDM paper
+
+The posts are loaded once into columns (cached on disk, keyed by the
+database mtime, or memory-mapped from a columnar snapshot). Each figure
+reduces them to a few binned arrays, and figures are rendered in
+parallel worker processes. A figure is skipped when neither its binned
+data nor its rendering code changed since the last run.
+
+Usage:
+    python scripts/generate_figures.py
+    python scripts/generate_figures.py --db data/moltbook_combined.db --force
+"""
+import argparse
+import hashlib
+import inspect
 import json
 import os
-from datetime import datetime
-from collections import Counter
-import matplotlib.pyplot as plt
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import matplotlib
 matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from columnar import is_snapshot
+from features import FEATURES_VERSION
+from post_columns import load_posts
+from timestamps import NO_TIMESTAMP, hour_of_day
 
 DATA_DIR = "data"
+DB_FILE = os.path.join(DATA_DIR, "moltbook_combined.db")
+CACHE_FILE = os.path.join(DATA_DIR, "figure_columns.npz")
 OUTPUT_DIR = "edm-paper/EDM-template2024"
+MANIFEST = "figures_manifest.json"
+FORMATS = ('pdf', 'png')
+
+CACHED_COLUMNS = ('upvotes', 'comment_count', 'created_at', 'is_spam')
+
+def _source_key(path):
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}:{FEATURES_VERSION}"
+
+def load_columns(path=DB_FILE, cache_file=CACHE_FILE):
+    """Post columns for the figures, from the on-disk cache when the source is unchanged.
 
-def load_all_posts():
-    """Load all unique posts"""
-    all_posts = {}
-    for fname in os.listdir(DATA_DIR):
-        if fname.startswith("posts-") or fname.startswith("submolt-"):
-            path = os.path.join(DATA_DIR, fname)
-            if os.path.exists(path) and os.path.getsize(path) > 0:
-                try:
-                    with open(path) as f:
-                        data = json.load(f)
-                    if "posts" in data:
-                        for p in data["posts"]:
-                            all_posts[p["id"]] = p
-                except:
-                    pass
-    return list(all_posts.values())
-
-def generate_hourly_distribution():
-    """Generate hourly distribution figure"""
-    posts = load_all_posts()
-    
-    hours = []
-    for p in posts:
-        if "created_at" in p:
-            try:
-                ts = p["created_at"].replace("+00:00", "").replace("Z", "")
-                if "." in ts:
-                    ts = ts.split(".")[0]
-                dt = datetime.fromisoformat(ts)
-                hours.append(dt.hour)
-            except:
-                pass
-    
-    hour_counts = Counter(hours)
+    A columnar snapshot is memory-mapped directly; caching it would only copy it.
+    """
+    if is_snapshot(path):
+        cols = load_posts(path)
+        return {name: cols[name] for name in CACHED_COLUMNS}
+    key = _source_key(path)
+    if cache_file and os.path.exists(cache_file):
+        with np.load(cache_file) as cached:
+            if str(cached['key']) == key:
+                return {name: cached[name] for name in CACHED_COLUMNS}
+
+    cols = load_posts(path)
+    columns = {name: cols[name] for name in CACHED_COLUMNS}
+    if cache_file:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        tmp = cache_file + '.tmp.npz'
+        np.savez(tmp, key=np.array(key), **columns)
+        os.replace(tmp, cache_file)
+    return columns
+
+# Each figure: a compute step (columns -> small arrays, run in the parent)
+# and a render step (arrays -> files, run in a worker)
+def compute_hourly_distribution(cols):
+    hours = hour_of_day(cols['created_at'][cols['created_at'] != NO_TIMESTAMP])
+    return {'counts': np.bincount(hours, minlength=24)[:24]}
+
+def render_hourly_distribution(data, paths):
+    y = data['counts'].tolist()
     x = list(range(24))
-    y = [hour_counts.get(h, 0) for h in x]
-    
+
     fig, ax = plt.subplots(figsize=(8, 4))
     bars = ax.bar(x, y, color='#2E86AB', edgecolor='white', linewidth=0.5)
-    
+
     # Highlight the peak hour
     max_idx = y.index(max(y))
     bars[max_idx].set_color('#E63946')
-    
+
     ax.set_xlabel('Hour (UTC)', fontsize=11)
     ax.set_ylabel('Number of Posts', fontsize=11)
     ax.set_xticks(range(0, 24, 2))
     ax.set_xticklabels([f'{h:02d}:00' for h in range(0, 24, 2)], rotation=45, ha='right')
-    
+
     # Add annotation for peak
-    ax.annotate(f'Peak: {max(y)} posts', 
-                xy=(max_idx, max(y)), 
+    ax.annotate(f'Peak: {max(y)} posts',
+                xy=(max_idx, max(y)),
                 xytext=(max_idx + 2, max(y) - 10),
                 fontsize=9,
                 arrowprops=dict(arrowstyle='->', color='gray'))
-    
+
     ax.spines['top'].set_visible(False)
     ax.spines['right'].set_visible(False)
-    
+
     plt.tight_layout()
-    
-    # Save as PDF and PNG
-    plt.savefig(os.path.join(OUTPUT_DIR, 'hourly_distribution.pdf'), dpi=300, bbox_inches='tight')
-    plt.savefig(os.path.join(OUTPUT_DIR, 'hourly_distribution.png'), dpi=300, bbox_inches='tight')
-    print(f"Saved hourly_distribution.pdf and .png to {OUTPUT_DIR}")
-
-def generate_engagement_distribution():
-    """Generate engagement distribution figure"""
-    posts = load_all_posts()
-    
-    upvotes = [p.get("upvotes", 0) for p in posts]
-    
-    fig, ax = plt.subplots(figsize=(8, 4))
-    
+    _save(fig, paths)
+
+def compute_engagement_distribution(cols):
+    upvotes = cols['upvotes']
     # Use log bins for better visualization of power-law
-    import numpy as np
-    bins = np.logspace(0, np.log10(max(upvotes)+1), 30)
-    
-    ax.hist(upvotes, bins=bins, color='#2E86AB', edgecolor='white', linewidth=0.5)
+    bins = np.logspace(0, np.log10(upvotes.max() + 1), 30)
+    counts, _ = np.histogram(upvotes, bins=bins)
+    return {
+        'bins': bins,
+        'counts': counts,
+        'mean': upvotes.mean(),
+        'median': np.partition(upvotes, len(upvotes) // 2)[len(upvotes) // 2],
+    }
+
+def render_engagement_distribution(data, paths):
+    bins = data['bins']
+    fig, ax = plt.subplots(figsize=(8, 4))
+
+    ax.hist(bins[:-1], bins=bins, weights=data['counts'], color='#2E86AB', edgecolor='white', linewidth=0.5)
     ax.set_xscale('log')
     ax.set_xlabel('Upvotes (log scale)', fontsize=11)
     ax.set_ylabel('Number of Posts', fontsize=11)
-    
+
     # Add mean and median lines
-    mean_val = sum(upvotes) / len(upvotes)
-    median_val = sorted(upvotes)[len(upvotes)//2]
-    
-    ax.axvline(mean_val, color='#E63946', linestyle='--', label=f'Mean: {mean_val:.1f}')
-    ax.axvline(median_val, color='#2A9D8F', linestyle=':', label=f'Median: {median_val:.0f}')
+    ax.axvline(data['mean'], color='#E63946', linestyle='--', label=f"Mean: {data['mean']:.1f}")
+    ax.axvline(data['median'], color='#2A9D8F', linestyle=':', label=f"Median: {data['median']:.0f}")
     ax.legend(fontsize=9)
-    
+
     ax.spines['top'].set_visible(False)
     ax.spines['right'].set_visible(False)
-    
+
     plt.tight_layout()
-    
-    plt.savefig(os.path.join(OUTPUT_DIR, 'engagement_distribution.pdf'), dpi=300, bbox_inches='tight')
-    plt.savefig(os.path.join(OUTPUT_DIR, 'engagement_distribution.png'), dpi=300, bbox_inches='tight')
-    print(f"Saved engagement_distribution.pdf and .png to {OUTPUT_DIR}")
+    _save(fig, paths)
+
+FIGURES = {
+    'hourly_distribution': (compute_hourly_distribution, render_hourly_distribution),
+    'engagement_distribution': (compute_engagement_distribution, render_engagement_distribution),
+}
+
+def _save(fig, paths):
+    for path in paths:
+        fig.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+def _render(name, data, paths):
+    FIGURES[name][1](data, paths)
+    return name
+
+def figure_hash(name, data):
+    """Fingerprint of a figure's binned data and rendering code."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(inspect.getsource(FIGURES[name][1]).encode())
+    for key in sorted(data):
+        h.update(key.encode())
+        h.update(np.asarray(data[key]).tobytes())
+    return h.hexdigest()
+
+def generate_figures(db=DB_FILE, output_dir=OUTPUT_DIR, names=None, workers=None, force=False,
+                     formats=FORMATS, cache_file=CACHE_FILE):
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    cols = load_columns(db, cache_file)
+    loaded = time.perf_counter()
+    print(f"Loaded {len(cols['upvotes']):,} posts in {loaded - start:.2f}s")
+
+    manifest_path = Path(output_dir) / MANIFEST
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    jobs = []
+    for name in names or FIGURES:
+        data = FIGURES[name][0](cols)
+        paths = [os.path.join(output_dir, f'{name}.{fmt}') for fmt in formats]
+        digest = figure_hash(name, data)
+        if not force and manifest.get(name) == digest and all(os.path.exists(p) for p in paths):
+            print(f"Skipped {name} (unchanged)")
+            continue
+        jobs.append((name, data, paths, digest))
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_render, name, data, paths) for name, data, paths, _ in jobs]
+            for future in futures:
+                future.result()
+    else:
+        for name, data, paths, _ in jobs:
+            _render(name, data, paths)
+    for name, _, paths, digest in jobs:
+        manifest[name] = digest
+        print(f"Saved {', '.join(os.path.basename(p) for p in paths)} to {output_dir}")
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    print(f"Rendered {len(jobs)} of {len(names or FIGURES)} figures in {time.perf_counter() - loaded:.2f}s")
 
 if __name__ == "__main__":
-    generate_hourly_distribution()
-    generate_engagement_distribution()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('figures', nargs='*', help=f"figures to generate (default: all of {', '.join(FIGURES)})")
+    parser.add_argument('--db', default=DB_FILE, help='posts database, JSON crawl file or columnar snapshot')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--workers', type=int, help='render processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='re-render figures even if unchanged')
+    parser.add_argument('--formats', default=','.join(FORMATS), help='comma-separated output formats')
+    parser.add_argument('--no-cache', action='store_true', help='do not read or write the column cache')
+    args = parser.parse_args()
+    unknown = [name for name in args.figures if name not in FIGURES]
+    if unknown:
+        parser.error(f"unknown figure: {', '.join(unknown)}")
+
+    generate_figures(args.db, args.output_dir, args.figures or None, args.workers, args.force,
+                     tuple(args.formats.split(',')), None if args.no_cache else CACHE_FILE)
     print("Done!")
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Multi-pattern keyword matching for the classification taxonomies.
+Finds every keyword of every category in one linear scan of a text
+(Aho-Corasick), with optional word boundaries and per-category hit
+counts, plus a batch API for classifying the whole corpus.
+
+Uses the pyahocorasick C extension when installed (pip install
+pyahocorasick). Below AUTOMATON_MIN_KEYWORDS keywords, or without the
+extension, one C substring search per keyword is as fast or faster,
+so that is the default there (see bench_matcher.py). A pure Python
+automaton is available as backend='python'.
+
+Usage:
+    python scripts/keyword_matcher.py --db data/moltbook_combined.db
+    python scripts/keyword_matcher.py --db data/moltbook_combined.db \
+        --comments-db data/moltbook_comments_full.db --word-boundary
+"""
+
+import argparse
+import sqlite3
+import time
+from collections import deque
+
+import numpy as np
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+BACKENDS = ('ahocorasick', 'python', 'loop')
+BATCH_SIZE = 10000
+AUTOMATON_MIN_KEYWORDS = 64
+
+
+def default_backend(n_keywords, word_boundary=False):
+    """Fastest available backend for a taxonomy of n_keywords."""
+    if ahocorasick is not None and (word_boundary or n_keywords >= AUTOMATON_MIN_KEYWORDS):
+        return 'ahocorasick'
+    return 'loop'
+
+def _is_word(ch):
+    return ch.isalnum() or ch == '_'
+
+def _bounded(text, start, end, keyword):
+    """True if text[start:end] (== keyword) is not part of a longer word.
+
+    Keyword edges that are not word characters ('why ', 'til:') always
+    count as boundaries, like regex \\b.
+    """
+    if start > 0 and _is_word(keyword[0]) and _is_word(text[start - 1]):
+        return False
+    if end < len(text) and _is_word(keyword[-1]) and _is_word(text[end]):
+        return False
+    return True
+
+
+class Automaton:
+    """Pure Python Aho-Corasick automaton over a fixed set of keywords."""
+
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for keyword in keywords:
+            node = 0
+            for ch in keyword:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                node = nxt
+            self.output[node] += (keyword,)
+
+        # Breadth-first, so every fail target is final before it is used
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.output[nxt] += self.output[self.fail[nxt]]
+
+    def iter(self, text):
+        """Yield (end_index, keyword) for every occurrence, like pyahocorasick."""
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for keyword in output[node]:
+                yield i, keyword
+
+
+class KeywordMatcher:
+    """Finds the keywords of one or more categories in texts.
+
+    categories is a dict of category name -> keywords, or a plain list of
+    keywords (one category named 'keywords'). Matching is on lowercased
+    text unless ignore_case=False, in which case callers pass text that
+    is already lowercased. With word_boundary=True a keyword only counts
+    when it is not part of a longer word ('claw' matches '$CLAW' but not
+    'clawback').
+    """
+
+    def __init__(self, categories, word_boundary=False, ignore_case=True, backend=None):
+        if not isinstance(categories, dict):
+            categories = {'keywords': categories}
+        self.categories = tuple(categories)
+        self.word_boundary = word_boundary
+        self.ignore_case = ignore_case
+        if backend is not None and backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+        if backend == 'ahocorasick' and ahocorasick is None:
+            raise ImportError("backend='ahocorasick' needs the pyahocorasick package")
+
+        # Each distinct keyword maps to the indices of its categories
+        self.keyword_categories = {}
+        for i, name in enumerate(self.categories):
+            for keyword in categories[name]:
+                keyword = keyword.lower() if ignore_case else keyword
+                self.keyword_categories.setdefault(keyword, [])
+                if i not in self.keyword_categories[keyword]:
+                    self.keyword_categories[keyword].append(i)
+        self.keywords = tuple(self.keyword_categories)
+
+        self.backend = backend or default_backend(len(self.keywords), word_boundary)
+        if self.backend == 'ahocorasick':
+            self.automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self.automaton.add_word(keyword, keyword)
+            if self.keywords:
+                self.automaton.make_automaton()
+            else:
+                self.backend = 'loop'
+        elif self.backend == 'python':
+            self.automaton = Automaton(self.keywords)
+
+    def _iter(self, text):
+        """Yield (end_index, keyword) for every occurrence, boundaries ignored."""
+        if self.backend == 'loop':
+            for keyword in self.keywords:
+                start = text.find(keyword)
+                while start != -1:
+                    yield start + len(keyword) - 1, keyword
+                    start = text.find(keyword, start + 1)
+        else:
+            yield from self.automaton.iter(text)
+
+    def matches(self, text):
+        """Yield (start, keyword) for every occurrence in text."""
+        if self.ignore_case:
+            text = text.lower()
+        for end, keyword in self._iter(text):
+            start = end - len(keyword) + 1
+            if not self.word_boundary or _bounded(text, start, end + 1, keyword):
+                yield start, keyword
+
+    def present(self, text):
+        """Set of distinct keywords occurring in text."""
+        if self.word_boundary:
+            return {keyword for _, keyword in self.matches(text)}
+        if self.ignore_case:
+            text = text.lower()
+        if self.backend == 'loop':
+            return {k for k in self.keywords if k in text}
+        return {keyword for _, keyword in self.automaton.iter(text)}
+
+    def counts(self, text, distinct=True):
+        """Hits per category, in the order of self.categories.
+
+        With distinct=True each keyword counts once however often it
+        occurs (the knowledge-type rule); otherwise every occurrence counts.
+        """
+        counts = [0] * len(self.categories)
+        hits = self.present(text) if distinct else (k for _, k in self.matches(text))
+        for keyword in hits:
+            for i in self.keyword_categories[keyword]:
+                counts[i] += 1
+        return counts
+
+    def count_dict(self, text, distinct=True):
+        return dict(zip(self.categories, self.counts(text, distinct)))
+
+    def count_batch(self, texts, distinct=True):
+        """Per-category hit counts for many texts as an (n_texts, n_categories) array."""
+        rows = [self.counts(text or '', distinct) for text in texts]
+        return np.asarray(rows, dtype=np.int32).reshape(len(rows), len(self.categories))
+
+
+def iter_text_batches(db_path, query, batch_size=BATCH_SIZE):
+    """Yield lists of texts from a SQLite query returning one text column."""
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    cursor = conn.execute(query)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield [row[0] or '' for row in rows]
+    conn.close()
+
+def count_corpus(matcher, batches, distinct=True):
+    """Total per-category hit counts and number of matching texts over text batches."""
+    totals = np.zeros(len(matcher.categories), dtype=np.int64)
+    matching = np.zeros(len(matcher.categories), dtype=np.int64)
+    n_texts = 0
+    start = time.perf_counter()
+    for batch in batches:
+        counts = matcher.count_batch(batch, distinct)
+        totals += counts.sum(axis=0)
+        matching += (counts > 0).sum(axis=0)
+        n_texts += len(batch)
+    return totals, matching, n_texts, time.perf_counter() - start
+
+def report(label, matcher, totals, matching, n_texts, elapsed):
+    print(f"\n{label}: {n_texts:,} texts in {elapsed:.1f}s ({n_texts / max(elapsed, 1e-9):,.0f} texts/s)")
+    print(f"  {'category':<22}{'hits':>12}{'texts':>12}{'share':>9}")
+    for name, total, n in zip(matcher.categories, totals, matching):
+        print(f"  {name:<22}{total:>12,}{n:>12,}{100 * n / max(n_texts, 1):>8.1f}%")
+
+def main():
+    from features import TAXONOMY
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='data/moltbook_combined.db', help='posts database')
+    parser.add_argument('--comments-db', help='also classify comment content from this database')
+    parser.add_argument('--word-boundary', action='store_true', help='only match whole words')
+    parser.add_argument('--occurrences', action='store_true',
+                        help='count every occurrence instead of distinct keywords per text')
+    parser.add_argument('--backend', choices=BACKENDS, default=None)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    matcher = KeywordMatcher(TAXONOMY, word_boundary=args.word_boundary, backend=args.backend)
+    distinct = not args.occurrences
+    print(f"{len(matcher.keywords)} keywords in {len(matcher.categories)} categories, "
+          f"backend={matcher.backend}, word_boundary={args.word_boundary}")
+
+    batches = iter_text_batches(args.db, "SELECT title || ' ' || COALESCE(body, '') FROM posts",
+                                args.batch_size)
+    report('Posts (title + body)', matcher, *count_corpus(matcher, batches, distinct))
+    if args.comments_db:
+        batches = iter_text_batches(args.comments_db, 'SELECT content FROM comments', args.batch_size)
+        report('Comments', matcher, *count_corpus(matcher, batches, distinct))
+
+if __name__ == "__main__":
+    main()
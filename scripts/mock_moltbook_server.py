@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Moltbook API, for exercising the crawler offline.
+Serves deterministic synthetic posts with Moltbook-style limit/offset
+pagination, a token-bucket rate limit that answers 429 with Retry-After,
+and optional random 5xx failures and latency.
+
+--selftest starts a small server on an ephemeral port with a low rate
+limit and random 503s, crawls it with fetch_all_data.MoltbookClient and
+checks that every post arrives, that 429s and retries happened and that
+the crawl finishes; it exits with status 1 otherwise.
+
+Usage:
+    python scripts/mock_moltbook_server.py --port 8765 --posts 20000
+    python scripts/fetch_all_data.py --base-url http://127.0.0.1:8765/api/v1
+    python scripts/mock_moltbook_server.py --selftest
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = '/api/v1'
+MAX_LIMIT = 100
+START = datetime(2026, 1, 27, tzinfo=timezone.utc)
+
+
+def make_posts(n_posts, n_submolts, seed, new_posts=0):
+    """Synthetic posts plus the feeds the real API exposes over them.
+
+    The first n_posts are spread over 20 days; new_posts more follow one
+    minute apart, simulating activity since an earlier crawl.
+    """
+    rng = random.Random(seed)
+    submolts = [f'submolt{i}' for i in range(n_submolts)]
+    posts = []
+    for i in range(n_posts + new_posts):
+        if i < n_posts:
+            created = START + timedelta(seconds=int(i * 20 * 86400 / max(n_posts, 1)))
+        else:
+            created = START + timedelta(days=20, minutes=i - n_posts)
+        posts.append({
+            'id': f'post-{i:07d}',
+            'title': f'Post {i} about agents',
+            'content': 'x' * rng.randint(0, 800),
+            'author': {'id': f'agent-{rng.randint(0, n_posts // 5)}', 'name': f'agent{i % 97}'},
+            'submolt': {'name': submolts[rng.randrange(n_submolts)]},
+            'upvotes': int(rng.paretovariate(1.2)) - 1,
+            'downvotes': 0,
+            'comment_count': int(rng.paretovariate(1.1)) - 1,
+            'created_at': created.isoformat().replace('+00:00', 'Z'),
+        })
+
+    feeds = {
+        'new': sorted(posts, key=lambda p: p['created_at'], reverse=True),
+        'top': sorted(posts, key=lambda p: p['upvotes'], reverse=True),
+        'hot': sorted(posts, key=lambda p: p['comment_count'], reverse=True),
+    }
+    feeds['rising'] = rng.sample(posts, len(posts))
+    by_submolt = {name: [] for name in submolts}
+    for p in feeds['new']:
+        by_submolt[p['submolt']['name']].append(p)
+    return submolts, feeds, by_submolt
+
+
+class RateLimiter:
+    """Server-side token bucket shared by all clients."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class MoltbookHandler(BaseHTTPRequestHandler):
+    server_version = 'MockMoltbook/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.stats_lock:
+            server.stats['requests'] += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if not server.limiter.allow():
+            with server.stats_lock:
+                server.stats['rate_limited'] += 1
+            return self.send_json(429, {'error': 'rate limited'}, {'Retry-After': '1'})
+        if server.error_rate and server.rng.random() < server.error_rate:
+            with server.stats_lock:
+                server.stats['errors'] += 1
+            return self.send_json(503, {'error': 'temporarily unavailable'})
+
+        url = urlparse(self.path)
+        if not url.path.startswith(API_PREFIX):
+            return self.send_json(404, {'error': 'not found'})
+        parts = url.path[len(API_PREFIX):].strip('/').split('/')
+        query = parse_qs(url.query)
+        sort = query.get('sort', ['hot'])[0]
+        limit = min(int(query.get('limit', [25])[0]), MAX_LIMIT)
+        offset = int(query.get('offset', [0])[0])
+
+        if parts == ['posts']:
+            feed = server.feeds.get(sort)
+        elif parts == ['submolts']:
+            return self.send_json(200, [{'name': name} for name in server.submolts])
+        elif len(parts) == 3 and parts[0] == 'submolts' and parts[2] == 'feed':
+            feed = server.by_submolt.get(parts[1])
+            if feed is not None and sort == 'top':
+                feed = sorted(feed, key=lambda p: p['upvotes'], reverse=True)
+        else:
+            feed = None
+        if feed is None:
+            return self.send_json(404, {'error': 'not found'})
+        self.send_json(200, {'posts': feed[offset:offset + limit]})
+
+
+def make_server(port=8765, n_posts=20000, n_submolts=30, rate=50.0, burst=20,
+                error_rate=0.0, latency=0.0, seed=0, verbose=False, new_posts=0):
+    server = ThreadingHTTPServer(('127.0.0.1', port), MoltbookHandler)
+    server.daemon_threads = True
+    server.submolts, server.feeds, server.by_submolt = make_posts(n_posts, n_submolts, seed, new_posts)
+    server.limiter = RateLimiter(rate, burst)
+    server.error_rate = error_rate
+    server.latency = latency
+    server.rng = random.Random(seed)
+    server.verbose = verbose
+    server.stats = {'requests': 0, 'rate_limited': 0, 'errors': 0}
+    server.stats_lock = threading.Lock()
+    return server
+
+def selftest(n_posts=1000, rate=10.0, error_rate=0.1, timeout=120):
+    """Crawl the global sorts of a throttled, flaky server; returns True if every check passes."""
+    # Imported here so the server itself needs nothing beyond the standard library
+    import fetch_all_data as crawler
+
+    server = make_server(0, n_posts, n_submolts=5, rate=rate, burst=5, error_rate=error_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}{API_PREFIX}"
+    sorts = ['hot', 'new', 'top', 'rising']
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the crawl state out of data/
+        crawler.STATE_FILE = Path(tmp) / 'crawl_state.json'
+        # The client allows more than the server, so it has to back off on 429s
+        client = crawler.MoltbookClient(base_url, len(sorts), {'posts': (rate * 5, 20)})
+        with ThreadPoolExecutor(max_workers=len(sorts)) as pool:
+            futures = [pool.submit(crawler.fetch_posts, client, 'posts', {'sort': sort}, 20) for sort in sorts]
+            _, pending = wait(futures, timeout=timeout)
+            # Unfinished feeds fail fast once the server is gone
+            server.shutdown()
+    server.server_close()
+    elapsed = time.perf_counter() - start
+
+    stats = crawler.stats
+    checks = [
+        (not pending, f"crawl finished within {timeout}s ({elapsed:.1f}s)"),
+        (all(f.exception() is None for f in futures), "no feed raised"),
+        (all(crawler.cursors.get(crawler.feed_key('posts', {'sort': sort}), {}).get('done') for sort in sorts),
+         "every feed reached its last page"),
+        (len(crawler.all_posts) == n_posts, f"{len(crawler.all_posts)} unique posts of {n_posts}"),
+        (stats['rate_limited'] > 0, f"{stats['rate_limited']} rate-limited responses"),
+        (stats['retries'] > 0, f"{stats['retries']} retries"),
+        (stats['errors'] == 0, f"{stats['errors']} requests given up"),
+    ]
+    print(f"\nServer: {server.stats}")
+    for ok, label in checks:
+        print(f"  {'ok  ' if ok else 'FAIL'} {label}")
+    return all(ok for ok, _ in checks)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--submolts', type=int, default=30)
+    parser.add_argument('--rate', type=float, default=50.0, help='requests/second before 429s (0 = unlimited)')
+    parser.add_argument('--burst', type=int, default=20)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--new-posts', type=int, default=0,
+                        help='extra posts newer than the base set, to exercise incremental crawls')
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--selftest', action='store_true',
+                        help='crawl a small throttled server with fetch_all_data and check the result')
+    args = parser.parse_args()
+    if args.selftest:
+        sys.exit(0 if selftest() else 1)
+
+    server = make_server(args.port, args.posts, args.submolts, args.rate, args.burst,
+                         args.error_rate, args.latency, args.seed, args.verbose, args.new_posts)
+    print(f"Mock Moltbook API on http://127.0.0.1:{args.port}{API_PREFIX} ({args.posts} posts)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served: {server.stats}")
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
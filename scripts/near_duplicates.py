@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate and template detection over post and comment texts.
+Each text (post title + body, comment content) is reduced to a MinHash
+signature over its word 3-shingles; every run of digits reads as a
+single '0', so templates that differ only in counters or IDs
+("Mint CLAW #1770643665") shingle alike. Locality-sensitive hashing on bands of the signature proposes
+candidate pairs, pairs whose signatures agree on at least
+MIN_SIMILARITY of their hashes are linked, and each connected group
+becomes a cluster. Every row gets dup_cluster (the smallest row key in
+its cluster, shared across posts and comments) and dup_cluster_size;
+clusters of TEMPLATE_MIN_SIZE or more rows are template spam.
+
+Signatures are kept in a state file, so a run after a new crawl batch
+only hashes rows whose dup_cluster is NULL (new or edited rows) before
+re-clustering, and only rewrites rows whose cluster changed.
+
+Usage:
+    python scripts/near_duplicates.py
+    python scripts/near_duplicates.py --posts-db data/moltbook_combined.db \\
+        --comments-db data/moltbook_comments_full.db --full
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+POSTS_DB = Path("data/moltbook_combined.db")
+COMMENTS_DB = Path("data/moltbook_comments_full.db")
+STATE_FILE = Path("data/near_duplicates.npz")
+CHUNK_SIZE = 20000
+CHUNK_BYTES = 2 ** 20  # text per signatures() batch; hashing takes ~50 bytes per text byte
+
+NUM_PERM = 32  # MinHash signature length
+BANDS = 8  # LSH bands of NUM_PERM // BANDS hashes each
+MIN_SIMILARITY = 0.7  # estimated Jaccard similarity that links two texts
+TEMPLATE_MIN_SIZE = 10  # clusters this large are treated as template spam
+
+# Row keys: source index above KEY_SHIFT bits, rowid below
+KEY_SHIFT = 40
+SOURCES = (
+    ('posts', "COALESCE(title, '') || ' ' || COALESCE(body, '')"),
+    ('comments', "COALESCE(content, '')"),
+)
+CLUSTER_COLUMNS = {'dup_cluster': 'INTEGER', 'dup_cluster_size': 'INTEGER'}
+
+EMPTY = np.uint32(0xFFFFFFFF)  # signature of a text without words
+
+_rng = np.random.default_rng(20260127)
+PERM_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+PERM_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+BAND_MIX = _rng.integers(1, 2 ** 63, NUM_PERM // BANDS, dtype=np.uint64) | np.uint64(1)
+BYTE_BASE = np.uint64(0x100000001B3)
+SHINGLE_MIX = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+
+# Word bytes: ASCII letters (after lowercasing), digits and any non-ASCII byte
+_WORD_BYTE = np.zeros(256, dtype=bool)
+_WORD_BYTE[ord('a'):ord('z') + 1] = True
+_WORD_BYTE[ord('0'):ord('9') + 1] = True
+_WORD_BYTE[128:] = True
+
+
+def _words(texts):
+    """Hash of every word in a batch of texts, and the text each word belongs to.
+
+    Digit runs are folded to one '0' first. Each word is hashed as the
+    polynomial sum of byte * BASE**j over its bytes, j counted from the
+    word's start, so the powers only run to the longest word.
+    """
+    encoded = [t.lower().encode('utf-8', 'replace') for t in texts]
+    lengths = np.fromiter((len(e) + 1 for e in encoded), np.int64, len(encoded))
+    buf = np.frombuffer(b' '.join(encoded) + b' ', dtype=np.uint8)
+    digit = (buf >= ord('0')) & (buf <= ord('9'))
+    kept = np.flatnonzero(~(digit & np.r_[False, digit[:-1]]))
+    buf = np.where(digit, np.uint8(ord('0')), buf)[kept]
+    is_word = _WORD_BYTE[buf]
+    edges = np.diff(is_word.astype(np.int8), prepend=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if not len(starts):
+        return np.zeros(0, np.uint64), np.zeros(0, np.int64)
+
+    # Word bytes back to back; each one's position within its word
+    word_lengths = ends - starts
+    first = np.r_[0, np.cumsum(word_lengths)[:-1]]
+    position = np.arange(word_lengths.sum()) - np.repeat(first, word_lengths)
+    with np.errstate(over='ignore'):
+        terms = buf[is_word].astype(np.uint64) * _powers(word_lengths.max())[position]
+    hashes = np.add.reduceat(terms, first)
+    doc = np.searchsorted(np.cumsum(lengths), kept[starts], side='right')
+    return hashes, doc
+
+
+def _powers(n):
+    """BASE**i for i < n."""
+    powers = np.full(n, BYTE_BASE, dtype=np.uint64)
+    powers[0] = 1
+    with np.errstate(over='ignore'):
+        return np.cumprod(powers, dtype=np.uint64)
+
+
+def _byte_batches(texts, max_bytes):
+    """(start, stop) slices of texts holding about max_bytes of text each (at least one text)."""
+    ends = np.cumsum([len(t) for t in texts])
+    start = 0
+    while start < len(texts):
+        stop = max(start + 1, int(np.searchsorted(ends, ends[start] - len(texts[start]) + max_bytes, 'right')))
+        yield start, stop
+        start = stop
+
+
+def signatures(texts):
+    """MinHash signature (NUM_PERM uint32 values) of each text's word 3-shingles.
+
+    Texts of one or two words hash as a single shingle; texts without
+    words get an all-EMPTY signature.
+    """
+    n = len(texts)
+    sigs = np.full((n, NUM_PERM), EMPTY, dtype=np.uint32)
+    hashes, doc = _words(texts)
+    if not len(hashes):
+        return sigs
+
+    with np.errstate(over='ignore'):
+        padded = np.concatenate([hashes, np.zeros(2, np.uint64)])
+        doc_padded = np.concatenate([doc, [-1, -1]])
+        second = np.where(doc_padded[1:-1] == doc, padded[1:-1], np.uint64(0))
+        third = np.where(doc_padded[2:] == doc, padded[2:], np.uint64(0))
+        shingles = hashes * SHINGLE_MIX[0] + second * SHINGLE_MIX[1] + third
+    # Keep full shingles, plus the first word of texts shorter than three words
+    first = np.r_[True, doc[1:] != doc[:-1]]
+    keep = (doc_padded[2:] == doc) | (first & (doc_padded[2:] != doc))
+    shingles, doc = shingles[keep], doc[keep]
+
+    present, starts = np.unique(doc, return_index=True)
+    with np.errstate(over='ignore'):
+        for k in range(NUM_PERM):
+            permuted = (shingles * PERM_A[k] + PERM_B[k]) >> np.uint64(32)
+            sigs[present, k] = np.minimum.reduceat(permuted, starts)
+    return sigs
+
+
+def band_keys(sigs):
+    """One uint64 LSH bucket key per text and band."""
+    rows = NUM_PERM // BANDS
+    bands = sigs.reshape(len(sigs), BANDS, rows).astype(np.uint64)
+    with np.errstate(over='ignore'):
+        keys = (bands * BAND_MIX).sum(axis=2, dtype=np.uint64)
+    return keys + np.arange(BANDS, dtype=np.uint64)
+
+
+def cluster(sigs):
+    """Cluster label of each signature: the smallest index in its near-duplicate group.
+
+    Within each LSH bucket every member is compared with the bucket's
+    first member, and linked to it if their signatures agree on at least
+    MIN_SIMILARITY of the hashes. Groups are the connected components of
+    those links, found by min-label propagation.
+    """
+    n = len(sigs)
+    parent = np.arange(n)
+    if not n:
+        return parent
+    candidates = np.flatnonzero(sigs[:, 0] != EMPTY)
+    keys = band_keys(sigs[candidates])
+    src, dst = [], []
+    for band in range(BANDS):
+        order = np.argsort(keys[:, band], kind='stable')
+        key = keys[order, band]
+        first = np.r_[True, key[1:] != key[:-1]]
+        leader = order[np.flatnonzero(first)[np.cumsum(first) - 1]]
+        members, leaders = candidates[order[~first]], candidates[leader[~first]]
+        agree = (sigs[members] == sigs[leaders]).mean(axis=1) >= MIN_SIMILARITY
+        src.append(members[agree])
+        dst.append(leaders[agree])
+    src, dst = np.concatenate(src), np.concatenate(dst)
+
+    while True:
+        # Point every node at its root, then pull the larger root of each
+        # crossing link down to the smaller
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+        a, b = parent[src], parent[dst]
+        crossing = a != b
+        if not crossing.any():
+            return parent
+        np.minimum.at(parent, np.maximum(a, b)[crossing], np.minimum(a, b)[crossing])
+
+
+def add_cluster_columns(conn, table):
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    for name, decl in CLUSTER_COLUMNS.items():
+        if name not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {decl}')
+    conn.commit()
+
+
+def load_state(state_file):
+    """(keys, sigs, clusters, sizes) from the state file, empty if there is none."""
+    if state_file and os.path.exists(state_file):
+        with np.load(state_file) as state:
+            return state['keys'], state['sigs'], state['clusters'], state['sizes']
+    return (np.zeros(0, np.int64), np.zeros((0, NUM_PERM), np.uint32),
+            np.zeros(0, np.int64), np.zeros(0, np.int64))
+
+
+def save_state(state_file, keys, sigs, clusters, sizes):
+    os.makedirs(os.path.dirname(state_file) or '.', exist_ok=True)
+    tmp = f'{state_file}.tmp.npz'
+    np.savez(tmp, keys=keys, sigs=sigs, clusters=clusters, sizes=sizes)
+    os.replace(tmp, state_file)
+
+
+def _pending(conn, source, table, text, known, chunk_size):
+    """Keys and signatures of rows that need hashing: dup_cluster NULL or missing from the state."""
+    base = np.int64(source) << KEY_SHIFT
+    live = np.fromiter((r for r, in conn.execute(f'SELECT rowid FROM {table}')), np.int64) + base
+    stale = np.setdiff1d(live, known, assume_unique=True)
+    if len(stale):
+        conn.executemany(f'UPDATE {table} SET dup_cluster = NULL WHERE rowid = ?',
+                         ((int(k - base),) for k in stale))
+    keys, sigs = [], []
+    cursor = conn.execute(f'SELECT rowid, {text} FROM {table} WHERE dup_cluster IS NULL ORDER BY rowid')
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        rowids, texts = zip(*rows)
+        keys.append(np.array(rowids, dtype=np.int64) + base)
+        sigs += [signatures(texts[lo:hi]) for lo, hi in _byte_batches(texts, CHUNK_BYTES)]
+    return live, keys, sigs
+
+
+def update_clusters(posts_db=POSTS_DB, comments_db=COMMENTS_DB, state_file=STATE_FILE, full=False,
+                    chunk_size=CHUNK_SIZE):
+    """Hash new and edited rows, re-cluster everything and write changed cluster ids back."""
+    start = time.perf_counter()
+    conns = []
+    for source, db in enumerate((posts_db, comments_db)):
+        if db:
+            conns.append((source, sqlite3.connect(db)) + SOURCES[source])
+    keys, sigs, clusters, sizes = load_state(None if full else state_file)
+
+    live, new_keys, new_sigs = [], [], []
+    for source, conn, table, text in conns:
+        add_cluster_columns(conn, table)
+        if full:
+            conn.execute(f'UPDATE {table} SET dup_cluster = NULL')
+        known = keys[(keys >> KEY_SHIFT) == source]
+        rows, k, s = _pending(conn, source, table, text, known, chunk_size)
+        live.append(rows)
+        new_keys += k
+        new_sigs += s
+    hashed = time.perf_counter()
+    new_keys = np.concatenate(new_keys) if new_keys else np.zeros(0, np.int64)
+    print(f"Hashed {len(new_keys):,} new or edited rows in {hashed - start:.1f}s")
+
+    # Drop deleted rows, and the old signatures of re-hashed rows
+    keep = np.isin(keys, np.concatenate(live) if live else keys) & ~np.isin(keys, new_keys)
+    keys = np.concatenate([keys[keep], new_keys])
+    sigs = np.concatenate([sigs[keep]] + new_sigs)
+    prev_clusters = np.concatenate([clusters[keep], np.full(len(new_keys), -1)])
+    prev_sizes = np.concatenate([sizes[keep], np.full(len(new_keys), -1)])
+    order = np.argsort(keys, kind='stable')
+    keys, sigs, prev_clusters, prev_sizes = keys[order], sigs[order], prev_clusters[order], prev_sizes[order]
+
+    root = cluster(sigs)
+    clusters = keys[root]
+    sizes = np.bincount(root, minlength=len(keys))[root]
+    clustered = time.perf_counter()
+
+    changed = (clusters != prev_clusters) | (sizes != prev_sizes)
+    written = 0
+    for source, conn, table, _ in conns:
+        idx = np.flatnonzero(changed & ((keys >> KEY_SHIFT) == source))
+        base = source << KEY_SHIFT
+        conn.executemany(f'UPDATE {table} SET dup_cluster = ?, dup_cluster_size = ? WHERE rowid = ?',
+                         zip(clusters[idx].tolist(), sizes[idx].tolist(), (keys[idx] - base).tolist()))
+        conn.commit()
+        conn.close()
+        written += len(idx)
+    if state_file:
+        save_state(state_file, keys, sigs, clusters, sizes)
+    print(f"Clustered {len(keys):,} rows in {clustered - hashed:.1f}s, "
+          f"updated {written:,} rows in {time.perf_counter() - clustered:.1f}s")
+    return keys, clusters, sizes
+
+
+def print_summary(posts_db, comments_db, keys, clusters, sizes):
+    template = sizes >= TEMPLATE_MIN_SIZE
+    duplicate = sizes > 1
+    n_clusters = len(np.unique(clusters[duplicate]))
+    print(f"\n{duplicate.sum():,} of {len(keys):,} rows ({duplicate.mean() * 100 if len(keys) else 0:.1f}%) "
+          f"are in {n_clusters:,} near-duplicate clusters")
+    print(f"{template.sum():,} rows in {len(np.unique(clusters[template])):,} template clusters "
+          f"(>= {TEMPLATE_MIN_SIZE} rows)")
+    for source, db in enumerate((posts_db, comments_db)):
+        mask = (keys >> KEY_SHIFT) == source
+        if db and mask.any():
+            print(f"  {SOURCES[source][0]}: {template[mask].sum():,} of {mask.sum():,} "
+                  f"({template[mask].mean() * 100:.1f}%) in template clusters")
+
+    print("\nLargest clusters:")
+    labels, counts = np.unique(clusters[duplicate], return_counts=True)
+    for label, count in sorted(zip(labels.tolist(), counts.tolist()), key=lambda x: -x[1])[:10]:
+        source, rowid = label >> KEY_SHIFT, label & ((1 << KEY_SHIFT) - 1)
+        table, text = SOURCES[source]
+        conn = sqlite3.connect(f'file:{(posts_db, comments_db)[source]}?mode=ro', uri=True)
+        sample, = conn.execute(f'SELECT {text} FROM {table} WHERE rowid = ?', (rowid,)).fetchone()
+        conn.close()
+        sample = ' '.join(sample.split())
+        print(f"  {count:>8,}  {sample[:70]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts-db', type=Path, default=POSTS_DB)
+    parser.add_argument('--comments-db', type=Path, default=COMMENTS_DB)
+    parser.add_argument('--no-comments', action='store_true', help='cluster posts only')
+    parser.add_argument('--state', type=Path, default=STATE_FILE, help='signature state file')
+    parser.add_argument('--full', action='store_true', help='re-hash every row instead of only new or edited ones')
+    args = parser.parse_args()
+
+    comments_db = None if args.no_comments else args.comments_db
+    keys, clusters, sizes = update_clusters(args.posts_db, comments_db, args.state, args.full)
+    print_summary(args.posts_db, comments_db, keys, clusters, sizes)
+
+
+if __name__ == "__main__":
+    main()
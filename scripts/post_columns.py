@@ -0,0 +1,182 @@
+"""
+Columnar loader for Moltbook posts.
+Reads the posts table (or a JSON crawl file) into compact typed arrays
+so the analysis never has to hold hundreds of thousands of post dicts;
+a columnar snapshot (columnar.py) is memory-mapped instead.
+"""
+
+import sqlite3
+
+import numpy as np
+
+from columnar import is_snapshot, load_table, table_info
+from features import FEATURES_VERSION, KNOWLEDGE_TYPES, extract
+from stream_posts import iter_posts
+from timestamps import NO_TIMESTAMP, parse_epochs
+
+CHUNK_SIZE = 50000
+
+# Helper functions for raw post dicts (JSON crawls)
+def get_upvotes(post):
+    return post.get('upvotes', post.get('score', 0)) or 0
+
+def get_comments(post):
+    return post.get('commentCount', post.get('comment_count', 0)) or 0
+
+def get_title(post):
+    return post.get('title', '') or ''
+
+def get_body(post):
+    return post.get('body', post.get('content', '')) or ''
+
+def get_created(post):
+    return post.get('createdAt', post.get('created_at', post.get('timestamp')))
+
+def is_sqlite_file(path):
+    with open(path, 'rb') as f:
+        return f.read(16) == b'SQLite format 3\x00'
+
+COLUMN_DTYPES = {
+    'upvotes': np.int64,
+    'comment_count': np.int64,
+    'body_length': np.int64,
+    'created_at': np.int64,
+    'is_question': np.bool_,
+    'is_spam': np.bool_,
+    'knowledge_type': np.uint8,
+    'is_learning': np.bool_,
+}
+
+def _new_columns():
+    return {name: [] for name in COLUMN_DTYPES}
+
+def _chunk_arrays(chunk):
+    """Convert one chunk of per-row lists into typed arrays."""
+    return {name: np.asarray(chunk[name], dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+
+def _finish_columns(chunks, learning_titles, fetched_at):
+    """Concatenate per-chunk arrays into one typed array per column."""
+    columns = {}
+    for name, dtype in COLUMN_DTYPES.items():
+        parts = [c[name] for c in chunks]
+        columns[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+    columns['learning_titles'] = learning_titles
+    columns['fetched_at'] = fetched_at
+    return columns
+
+def _table_columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+def _append_features(chunk, features, kt_codes):
+    question, spam, learning, kt = features[:4]
+    chunk['is_question'].append(question)
+    chunk['is_spam'].append(spam)
+    chunk['is_learning'].append(learning)
+    chunk['knowledge_type'].append(kt_codes[kt])
+
+def load_posts_sqlite(path):
+    """Load the posts table of a Moltbook SQLite database into typed columns."""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    available = _table_columns(conn, 'posts')
+
+    # Read the features persisted by setup_db; only rows extracted by an
+    # older features version (or none) pull their body to recompute them
+    if 'features_version' in available:
+        current = f'features_version = {FEATURES_VERSION}'
+        feature_exprs = 'is_question, is_spam, is_learning, knowledge_type'
+    else:
+        current = '0'
+        feature_exprs = 'NULL, NULL, NULL, NULL'
+    length_expr = 'COALESCE(body_length, length(body), 0)' if 'body_length' in available else 'COALESCE(length(body), 0)'
+    # Epoch seconds stored by setup_db; rows it has not backfilled yet are parsed by SQLite
+    created_expr = "CAST(strftime('%s', created_at) AS INTEGER)"
+    if 'created_epoch' in available:
+        created_expr = f'COALESCE(created_epoch, {created_expr})'
+
+    cursor = conn.execute(f'''
+        SELECT COALESCE(upvotes, 0), COALESCE(comment_count, 0), {length_expr},
+               {created_expr},
+               {current}, {feature_exprs}, title,
+               CASE WHEN {current} THEN NULL ELSE body END
+        FROM posts ORDER BY rowid
+    ''')
+
+    kt_codes = {kt: i for i, kt in enumerate(KNOWLEDGE_TYPES)}
+    chunks = []
+    learning_titles = {}
+    offset = 0
+    while True:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            break
+        chunk = _new_columns()
+        for upvotes, comment_count, body_length, created, fresh, *features, title, body in rows:
+            chunk['upvotes'].append(upvotes)
+            chunk['comment_count'].append(comment_count)
+            chunk['body_length'].append(body_length)
+            chunk['created_at'].append(NO_TIMESTAMP if created is None else created)
+            if not fresh:
+                features = extract(title, body)
+            _append_features(chunk, features, kt_codes)
+            if features[2]:
+                learning_titles[offset] = title or ''
+            offset += 1
+        chunks.append(_chunk_arrays(chunk))
+
+    fetched_at = None
+    if 'fetch_logs' in {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}:
+        fetched_at = conn.execute('SELECT MAX(fetched_at) FROM fetch_logs').fetchone()[0]
+    conn.close()
+    return _finish_columns(chunks, learning_titles, fetched_at)
+
+def _json_chunk_arrays(chunk):
+    # Raw API timestamps are parsed for the whole chunk at once
+    chunk['created_at'] = parse_epochs(chunk['created_at'])
+    return _chunk_arrays(chunk)
+
+def load_posts_json(path):
+    """Stream a JSON crawl file ({"posts": [...]} or JSON Lines) into typed columns."""
+    meta = {}
+    chunks = []
+    chunk = _new_columns()
+    learning_titles = {}
+    kt_codes = {kt: i for i, kt in enumerate(KNOWLEDGE_TYPES)}
+    for i, (p, _) in enumerate(iter_posts(path, meta=meta)):
+        title = get_title(p)
+        body = get_body(p)
+        features = extract(title, body)
+        chunk['upvotes'].append(get_upvotes(p))
+        chunk['comment_count'].append(get_comments(p))
+        chunk['body_length'].append(len(body))
+        chunk['created_at'].append(get_created(p))
+        _append_features(chunk, features, kt_codes)
+        if features[2]:
+            learning_titles[i] = title
+        if len(chunk['upvotes']) >= CHUNK_SIZE:
+            chunks.append(_json_chunk_arrays(chunk))
+            chunk = _new_columns()
+
+    chunks.append(_json_chunk_arrays(chunk))
+    return _finish_columns(chunks, learning_titles, meta.get('fetched_at'))
+
+def load_posts_snapshot(path):
+    """Memory-map the post columns of a columnar snapshot (export_snapshot.py); nothing is parsed or copied."""
+    table = load_table(path, 'posts', [*COLUMN_DTYPES, 'title'])
+    columns = {name: table[name] for name in COLUMN_DTYPES}
+    titles = table['title']
+    columns['learning_titles'] = {int(i): titles[i] for i in np.flatnonzero(columns['is_learning'])}
+    columns['fetched_at'] = table_info(path, 'posts').get('fetched_at')
+    return columns
+
+def load_posts(path):
+    """Load posts from a SQLite database, JSON crawl file or columnar snapshot into typed columns.
+
+    Returns a dict of NumPy arrays (one entry per post) plus
+    'learning_titles' (row index -> title for learning-related posts)
+    and 'fetched_at'. Snapshot arrays are read-only memory maps.
+    """
+    if is_snapshot(path):
+        return load_posts_snapshot(path)
+    if is_sqlite_file(path):
+        return load_posts_sqlite(path)
+    return load_posts_json(path)
@@ -0,0 +1,196 @@
+"""
+Timing and memory spans for the pipeline scripts.
+Code wraps a unit of work in `with span(name, rows):` (or decorates a
+function with @timed(name)); every run of a span adds its wall time, CPU
+time (of the calling thread), rows processed and the growth of the
+process's peak RSS to the totals for that name. Spans that repeat
+(import batches, HTTP requests) also report duration percentiles.
+write() saves the totals as JSON, e.g. analysis_profile.json next to
+analysis_results.json.
+
+Spans cost a few microseconds each. Deep mode (enable_deep()) also runs
+cProfile and tracemalloc: the profile gains the top functions by
+cumulative time, the top allocation sites and each span's peak Python
+allocation, and the raw cProfile stats are saved next to it (.prof).
+tracemalloc peaks are process-wide, so those of concurrent spans overlap.
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+# ru_maxrss is in KiB on Linux and in bytes on macOS
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+def max_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT / 2 ** 20
+
+
+class Span:
+    """One run of a span; set .rows inside the block if the count is only known there."""
+
+    def __init__(self, rows=0):
+        self.rows = rows
+        self.py_peak = 0
+
+
+class Profiler:
+    """Per-name span totals for one process (thread-safe)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = {}
+        self.started_at = datetime.now().isoformat()
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.cprofile = None
+        self.local = threading.local()
+
+    def enable_deep(self):
+        if self.cprofile is None:
+            tracemalloc.start()
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    @contextmanager
+    def span(self, name, rows=0):
+        run = Span(rows)
+        deep = self.cprofile is not None
+        if deep:
+            # Nested spans: an inner span resets the tracemalloc peak, so
+            # it hands its peak up to the enclosing span when it ends
+            stack = self.local.__dict__.setdefault('stack', [])
+            stack.append(run)
+            tracemalloc.reset_peak()
+        rss = max_rss_mb()
+        cpu = time.thread_time()
+        start = time.perf_counter()
+        try:
+            yield run
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.thread_time() - cpu
+            peak_rss = max_rss_mb()
+            if deep:
+                run.py_peak = max(run.py_peak, tracemalloc.get_traced_memory()[1])
+                stack.pop()
+                if stack:
+                    stack[-1].py_peak = max(stack[-1].py_peak, run.py_peak)
+                tracemalloc.reset_peak()
+            self._record(name, run, wall, cpu, peak_rss, peak_rss - rss)
+
+    def _record(self, name, run, wall, cpu, peak_rss, rss_growth):
+        with self.lock:
+            total = self.spans.get(name)
+            if total is None:
+                total = self.spans[name] = {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': 0,
+                                            'max_rss_mb': 0.0, 'rss_growth_mb': 0.0, 'py_peak_mb': 0.0,
+                                            'durations': []}
+            total['count'] += 1
+            total['wall_s'] += wall
+            total['cpu_s'] += cpu
+            total['rows'] += run.rows
+            total['max_rss_mb'] = max(total['max_rss_mb'], peak_rss)
+            total['rss_growth_mb'] += rss_growth
+            total['py_peak_mb'] = max(total['py_peak_mb'], run.py_peak / 2 ** 20)
+            total['durations'].append(wall)
+
+    def timed(self, name=None):
+        """Decorator: run every call of the function in a span (default name: the function's)."""
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name or fn.__name__):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def summary(self):
+        """The profile as a JSON-ready dict."""
+        with self.lock:
+            spans = {}
+            for name, total in self.spans.items():
+                record = {key: value for key, value in total.items() if key != 'durations'}
+                if total['rows']:
+                    record['rows_per_s'] = total['rows'] / max(total['wall_s'], 1e-9)
+                if total['count'] > 1:
+                    values = np.percentile(total['durations'], PERCENTILES)
+                    record.update({f'p{p}_s': float(v) for p, v in zip(PERCENTILES, values)})
+                    record['max_s'] = max(total['durations'])
+                if self.cprofile is None:
+                    del record['py_peak_mb']
+                spans[name] = {key: round(value, 6) if isinstance(value, float) else value
+                               for key, value in record.items()}
+        profile = {
+            'script': Path(sys.argv[0]).name,
+            'started_at': self.started_at,
+            'wall_s': round(time.perf_counter() - self.start, 6),
+            'cpu_s': round(time.process_time() - self.cpu_start, 6),
+            'max_rss_mb': round(max_rss_mb(), 1),
+            'deep': self.cprofile is not None,
+            'spans': spans,
+        }
+        if self.cprofile is not None:
+            profile['top_functions'] = self._top_functions()
+            profile['top_allocations'] = [
+                {'site': str(stat.traceback[0]), 'size_mb': round(stat.size / 2 ** 20, 3), 'blocks': stat.count}
+                for stat in tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]
+            ]
+        return profile
+
+    def _top_functions(self):
+        stats = pstats.Stats(self.cprofile, stream=io.StringIO())  # stops the profiler
+        self.cprofile.enable()
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+        return [{'function': f'{path}:{line}({func})', 'calls': calls, 'tottime_s': round(tottime, 6),
+                 'cumtime_s': round(cumtime, 6)}
+                for (path, line, func), (_, calls, tottime, cumtime, _) in rows]
+
+    def write(self, path):
+        """Save the profile as JSON (and, in deep mode, the cProfile stats as <path>.prof)."""
+        path = Path(path)
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(path.with_suffix('.prof'))
+        profile = self.summary()
+        with open(path, 'w') as f:
+            json.dump(profile, f, indent=2)
+        return profile
+
+    def print_report(self):
+        profile = self.summary()
+        print(f"{'span':<32}{'count':>7}{'wall (s)':>10}{'cpu (s)':>10}{'rows/s':>13}{'p50 (ms)':>10}"
+              f"{'p99 (ms)':>10}{'+rss (MB)':>10}")
+        for name, s in profile['spans'].items():
+            rate = f"{s['rows_per_s']:,.0f}" if 'rows_per_s' in s else '-'
+            p50 = f"{s['p50_s'] * 1000:.1f}" if 'p50_s' in s else '-'
+            p99 = f"{s['p99_s'] * 1000:.1f}" if 'p99_s' in s else '-'
+            print(f"{name:<32}{s['count']:>7}{s['wall_s']:>10.2f}{s['cpu_s']:>10.2f}{rate:>13}{p50:>10}{p99:>10}"
+                  f"{s['rss_growth_mb']:>10.1f}")
+        print(f"total {profile['wall_s']:.2f}s wall, {profile['cpu_s']:.2f}s CPU, "
+              f"peak RSS {profile['max_rss_mb']:.0f} MB")
+
+
+# The process-wide profiler every script reports into
+PROFILER = Profiler()
+span = PROFILER.span
+timed = PROFILER.timed
+enable_deep = PROFILER.enable_deep
+write = PROFILER.write
+print_report = PROFILER.print_report
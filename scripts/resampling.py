@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Bootstrap confidence intervals and permutation p-values for the effect
+sizes of the analysis: every Mann-Whitney comparison of
+analyze_full_data.py (statements vs questions, procedural vs conceptual,
+long vs short) and the corpus-wide Gini coefficients.
+
+For each comparison it reports U (of group 1), the rank-biserial r
+(signed here: positive when group 1 tends to be larger; its magnitude is
+stats_kernel's r), both groups' means, medians and Gini coefficients and
+their differences, each with a percentile and a BCa interval. The
+permutation p-values test r (and so U) and the differences.
+
+The metrics are integer counts with few distinct values, so replicates
+are drawn as count vectors over the distinct values instead of index
+arrays: a bootstrap sample of a group is a multinomial draw of its
+counts, a permutation of the group labels a multivariate hypergeometric
+draw from the pooled counts. Every statistic is computed from a batch of
+count vectors at once (replicates x distinct values), so a replicate
+costs O(distinct values) whatever the number of posts. Batches run on a
+process pool; each one's seed is derived from --seed and its position,
+so results do not depend on the number of workers. The BCa acceleration
+comes from the exact jackknife, one leave-one-out per distinct value.
+
+Writes effect_sizes.json next to the database. Results are cached like
+the analysis sections (result_cache.py), keyed by this code, the input
+columns, the replicate count, the seed and the confidence level.
+
+Usage:
+    python scripts/resampling.py [data/moltbook_combined.db]
+    python scripts/resampling.py --replicates 10000 --seed 1 --workers 8
+    python scripts/resampling.py --confidence 0.99 --no-cache
+"""
+
+import argparse
+import inspect
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+
+import stats_kernel
+from analyze_full_data import CACHE_DIR, DATA_FILE
+from post_columns import KNOWLEDGE_TYPES, load_posts
+from result_cache import ResultCache, array_digest, content_key
+
+REPLICATES = 10000
+CONFIDENCE = 0.95
+BATCH_CELLS = 2 ** 22  # count-matrix cells per batch (replicates x distinct values)
+JACKKNIFE_MAX = 20000  # with more distinct values BCa is skipped (percentile interval only)
+RESULTS_FILE = "effect_sizes.json"  # next to the database
+NORMAL = NormalDist()
+
+# Statistics with a permutation p-value; U shares r's
+TESTED = ('r', 'mean_diff', 'median_diff', 'gini_diff')
+
+
+def value_counts(values, *masks):
+    """Sorted distinct values of the masked subsets and each subset's counts of them: (k,), (len(masks), k)."""
+    pooled = np.zeros(len(values), dtype=bool)
+    for mask in masks:
+        pooled |= mask
+    distinct, inverse = np.unique(values[pooled], return_inverse=True)
+    counts = np.stack([np.bincount(inverse[mask[pooled]], minlength=len(distinct)) for mask in masks])
+    return distinct.astype(np.float64), counts
+
+# Statistics of count matrices: one row of counts over the distinct values per sample
+def count_mean(values, counts):
+    return counts @ values / counts.sum(axis=1)
+
+def count_median(values, counts):
+    """Median as in stats_kernel.median: the middle value, or the mean of the two middle ones."""
+    n = counts.sum(axis=1)
+    cum = np.cumsum(counts, axis=1)
+    lo = (cum <= ((n - 1) // 2)[:, None]).sum(axis=1)
+    hi = (cum <= (n // 2)[:, None]).sum(axis=1)
+    return (values[lo] + values[hi]) / 2
+
+def count_gini(values, counts):
+    """stats_kernel.gini_sorted on the sorted sample: the run of c copies of a value after a smaller ones has weight c(2a + c - n)."""
+    n = counts.sum(axis=1)
+    before = np.cumsum(counts, axis=1) - counts
+    weighted = counts * values
+    total = weighted.sum(axis=1)
+    num = (weighted * (2 * before + counts - n[:, None])).sum(axis=1)
+    return np.divide(num, n * total, out=np.zeros(len(counts)), where=total > 0)
+
+def count_u(counts1, counts2):
+    """Mann-Whitney U of group 1: pairs in which its value is larger, ties counting half."""
+    below = np.cumsum(counts2, axis=1) - counts2
+    return (counts1 * (below + counts2 / 2)).sum(axis=1)
+
+def statistics(values, counts):
+    """{statistic: per-row values} for one sample (counts = (c,)) or a comparison (counts = (c1, c2))."""
+    if len(counts) == 1:
+        return {name: fn(values, counts[0]) for name, fn in
+                (('mean', count_mean), ('median', count_median), ('gini', count_gini))}
+    counts1, counts2 = counts
+    u = count_u(counts1, counts2)
+    stats = {'u': u, 'r': 2 * u / (counts1.sum(axis=1) * counts2.sum(axis=1)) - 1}
+    for name, fn in (('mean', count_mean), ('median', count_median), ('gini', count_gini)):
+        a, b = fn(values, counts1), fn(values, counts2)
+        stats[f'{name}_1'], stats[f'{name}_2'], stats[f'{name}_diff'] = a, b, a - b
+    return stats
+
+
+def _bootstrap_batch(values, counts, size, seed):
+    """Statistics of size bootstrap replicates, each group resampled on its own."""
+    rng = np.random.default_rng(seed)
+    draws = tuple(rng.multinomial(c.sum(), c / c.sum(), size=size) for c in counts)
+    return statistics(values, draws)
+
+def _permutation_batch(values, counts, size, seed):
+    """Statistics of size random relabellings of the pooled observations of two groups."""
+    rng = np.random.default_rng(seed)
+    pooled = counts[0] + counts[1]
+    first = rng.multivariate_hypergeometric(pooled, int(counts[0].sum()), size=size, method='marginals')
+    return statistics(values, (first, pooled - first))
+
+def replicate(batch_fn, values, counts, replicates, seed, pool=None):
+    """Run replicates of batch_fn in batches (on pool, if given); returns {statistic: replicate values}."""
+    batch = max(1, min(replicates, BATCH_CELLS // len(values)))
+    sizes = [min(batch, replicates - start) for start in range(0, replicates, batch)]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(len(sizes))
+    if pool is None:
+        parts = list(map(batch_fn, repeat(values), repeat(counts), sizes, seeds))
+    else:
+        parts = list(pool.map(batch_fn, repeat(values), repeat(counts), sizes, seeds))
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+def jackknife(values, counts):
+    """Leave-one-out statistics, one per (group, distinct value) present; returns ({statistic: values}, weights).
+
+    Leaving out any of the c copies of a value gives the same statistic,
+    so each row stands for c observations (its weight).
+    """
+    k = len(values)
+    parts, weights = [], []
+    for g, c in enumerate(counts):
+        present = np.flatnonzero(c)
+        if c.sum() < 2:
+            continue  # leaving out the only observation leaves nothing
+        for chunk in np.array_split(present, math.ceil(len(present) * k * len(counts) / BATCH_CELLS)):
+            draws = [np.repeat(other[None], len(chunk), axis=0) for other in counts]
+            draws[g][np.arange(len(chunk)), chunk] -= 1
+            parts.append(statistics(values, draws))
+        weights.append(c[present])
+    if not parts:
+        return None, None
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}, np.concatenate(weights)
+
+def acceleration(theta, weights):
+    """BCa acceleration from (weighted) jackknife values."""
+    d = np.average(theta, weights=weights) - theta
+    den = 6 * np.sum(weights * d ** 2) ** 1.5
+    return float(np.sum(weights * d ** 3) / den) if den > 0 else 0.0
+
+def percentile_interval(replicates, confidence=CONFIDENCE):
+    alpha = (1 - confidence) / 2
+    return np.quantile(replicates, [alpha, 1 - alpha])
+
+def bca_interval(replicates, estimate, accel, confidence=CONFIDENCE):
+    """Bias-corrected and accelerated bootstrap interval."""
+    n = len(replicates)
+    below = (np.sum(replicates < estimate) + 0.5 * np.sum(replicates == estimate)) / n
+    z0 = NORMAL.inv_cdf(min(max(below, 1 / (n + 1)), n / (n + 1)))
+    levels = []
+    for z in (NORMAL.inv_cdf((1 - confidence) / 2), NORMAL.inv_cdf((1 + confidence) / 2)):
+        t = z0 + z
+        levels.append(NORMAL.cdf(z0 + t / (1 - accel * t)))
+    return np.quantile(replicates, levels)
+
+def permutation_p(null, observed, center=0.0):
+    """Two-sided permutation p-value, counting the observed labelling among the replicates."""
+    extreme = np.abs(null - center) >= abs(observed - center) * (1 - 1e-12)
+    return float((1 + np.sum(extreme)) / (len(null) + 1))
+
+def resample(values, masks, replicates=REPLICATES, seed=0, confidence=CONFIDENCE, pool=None):
+    """Estimates with bootstrap intervals (and, for two masks, permutation p-values) for subsets of values.
+
+    Returns {statistic: {'estimate', 'ci', 'ci_method', 'ci_percentile'[, 'p']}};
+    'ci' is the BCa interval unless there are too many distinct values
+    for the jackknife, then the percentile one.
+    """
+    distinct, counts = value_counts(values, *masks)
+    counts = tuple(counts)
+    estimates = {name: float(v[0]) for name, v in statistics(distinct, tuple(c[None] for c in counts)).items()}
+    boot_seed, perm_seed = np.random.SeedSequence(seed).spawn(2)
+    boot = replicate(_bootstrap_batch, distinct, counts, replicates, boot_seed, pool)
+    jack, weights = jackknife(distinct, counts) if len(distinct) <= JACKKNIFE_MAX else (None, None)
+    null = replicate(_permutation_batch, distinct, counts, replicates, perm_seed, pool) if len(counts) == 2 else None
+
+    results = {}
+    for name, estimate in estimates.items():
+        percentile = percentile_interval(boot[name], confidence)
+        result = {'estimate': estimate, 'ci_percentile': percentile.tolist()}
+        if jack is not None:
+            accel = acceleration(jack[name], weights)
+            result.update(ci=bca_interval(boot[name], estimate, accel, confidence).tolist(), ci_method='bca')
+        else:
+            result.update(ci=percentile.tolist(), ci_method='percentile')
+        results[name] = result
+    if null is not None:
+        for name in TESTED:
+            results[name]['p'] = permutation_p(null[name], estimates[name])
+        results['u']['p'] = results['r']['p']
+    return results
+
+
+def comparisons(cols):
+    """(name, metric column, masks) of every effect the analysis reports; two masks are group 1 vs group 2."""
+    question = cols['is_question']
+    knowledge = cols['knowledge_type']
+    body_length = cols['body_length']
+    procedural = knowledge == KNOWLEDGE_TYPES.index('procedural')
+    conceptual = knowledge == KNOWLEDGE_TYPES.index('conceptual')
+    every = np.ones(len(question), dtype=bool)
+    return [
+        ('statements_vs_questions_upvotes', 'upvotes', (~question, question)),
+        ('statements_vs_questions_comments', 'comment_count', (~question, question)),
+        ('procedural_vs_conceptual_upvotes', 'upvotes', (procedural, conceptual)),
+        ('long_vs_short_upvotes', 'upvotes', (body_length >= 2000, body_length < 500)),
+        ('all_posts_upvotes', 'upvotes', (every,)),
+        ('all_posts_comments', 'comment_count', (every,)),
+    ]
+
+def print_result(name, sizes, result, confidence):
+    print(f"\n{name} (n = {' vs '.join(f'{n:,}' for n in sizes)})")
+    print(f"  {'statistic':<12}{'estimate':>14}   {f'{confidence:.0%} CI':<28}{'method':<12}{'p':>8}")
+    for stat, r in result.items():
+        ci = f"[{r['ci'][0]:.4g}, {r['ci'][1]:.4g}]"
+        p = f"{r['p']:.3g}" if 'p' in r else ''
+        print(f"  {stat:<12}{r['estimate']:>14.4g}   {ci:<28}{r['ci_method']:<12}{p:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('data_file', nargs='?', type=Path, default=DATA_FILE, help='posts database or JSON crawl file')
+    parser.add_argument('--replicates', type=int, default=REPLICATES, help='bootstrap and permutation replicates')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE)
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--no-cache', action='store_true', help='recompute; do not read or write the cache')
+    parser.add_argument('--cache-dir', type=Path, help=f'result cache (default: {CACHE_DIR}/ next to the data file)')
+    args = parser.parse_args()
+    if args.replicates < 2:
+        parser.error('--replicates must be at least 2')
+    if not 0 < args.confidence < 1:
+        parser.error('--confidence must be between 0 and 1')
+
+    cols = load_posts(args.data_file)
+    print(f"Loaded {len(cols['upvotes']):,} posts; {args.replicates:,} replicates, seed {args.seed}")
+    cache = None if args.no_cache else ResultCache(args.cache_dir or args.data_file.parent / CACHE_DIR)
+    code = inspect.getsource(sys.modules[__name__]) + inspect.getsource(stats_kernel)
+    workers = args.workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+
+    results = {}
+    start = time.perf_counter()
+    for index, (name, column, masks) in enumerate(comparisons(cols)):
+        sizes = [int(mask.sum()) for mask in masks]
+        if not all(sizes):
+            print(f"\n{name}: skipped, a group is empty")
+            continue
+        values = cols[column]
+        key = content_key('resampling', code, name, array_digest(values), *(array_digest(m) for m in masks),
+                          str(args.replicates), str(args.seed), repr(args.confidence))
+        result = cache.get(key) if cache else None
+        if result is None:
+            # Each comparison's stream depends only on the seed and its position
+            result = resample(values, masks, args.replicates, [args.seed, index], args.confidence, pool)
+            if cache:
+                cache.put(key, result)
+        print_result(name, sizes, result, args.confidence)
+        results[name] = {'metric': column, 'n': sizes, 'statistics': result}
+    if pool:
+        pool.shutdown()
+    print(f"\n{time.perf_counter() - start:.1f}s with {workers} worker{'s' if workers > 1 else ''}")
+
+    out = args.data_file.parent / RESULTS_FILE
+    with open(out, 'w') as f:
+        json.dump({'replicates': args.replicates, 'seed': args.seed, 'confidence': args.confidence,
+                   'comparisons': results}, f, indent=2)
+    print(f"Results saved to {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Content-addressed on-disk cache for JSON results.
+A result is stored under a key hashed from everything it depends on,
+usually the code that computes it and digests of its inputs (see
+content_key() and array_digest()), so a key never has to be invalidated:
+changed inputs or code simply give a new key. Entries are single JSON
+files; a hit touches the file's mtime, and once the directory outgrows
+max_bytes the least recently used entries are deleted.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+MAX_BYTES = 64 * 2 ** 20
+
+
+def content_key(*parts):
+    """Hex digest of a sequence of str/bytes parts (length-prefixed, so boundaries matter)."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        h.update(len(part).to_bytes(8, 'little'))
+        h.update(part)
+    return h.hexdigest()
+
+def array_digest(values):
+    """Digest of an array's dtype, shape and contents."""
+    values = np.ascontiguousarray(values)
+    return content_key(str(values.dtype), str(values.shape), values.tobytes())
+
+
+class ResultCache:
+    """Size-bounded LRU cache of JSON values in a directory, one file per key."""
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+
+    def _path(self, key):
+        return self.directory / f'{key}.json'
+
+    def get(self, key):
+        """The cached value for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(path)  # most recently used
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(value, f)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes; returns how many."""
+        entries = []
+        for path in self.directory.glob('*.json'):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Materialized rollups of the posts table.
+Running post counts and upvote/comment sums per submolt, per date and
+hour, per feature cell (knowledge type x discourse type, ...), per
+minute/hour/day bucket of each submolt and per author and hour of day
+are kept up to date by triggers on posts, so every import, sync or
+feature refresh adjusts only the cells of the rows it touches.
+Statistics and the CSV exports read these small tables instead of
+scanning posts.
+
+Usage:
+    python scripts/rollups.py --export            # rewrite data/*_statistics.csv
+    python scripts/rollups.py --rebuild           # recompute from the posts table
+"""
+
+import argparse
+import csv
+import time
+from pathlib import Path
+
+from timestamps import BUCKET_SECONDS
+
+DB_FILE = Path("data/moltbook_combined.db")
+EXPORT_DIR = Path("data")
+
+# Rollup table -> key columns as expressions over a posts row ({r} is NEW/OLD)
+ROLLUP_KEYS = {
+    'rollup_submolt': {
+        'submolt': "COALESCE({r}.submolt, '')",
+        'is_spam': 'COALESCE({r}.is_spam, 0)',
+    },
+    'rollup_date_hour': {
+        'date': "COALESCE({r}.date, '')",
+        'hour': 'COALESCE({r}.created_hour, -1)',
+        'is_spam': 'COALESCE({r}.is_spam, 0)',
+    },
+    'rollup_features': {
+        'knowledge_type': "COALESCE({r}.knowledge_type, '')",
+        'title_knowledge_type': "COALESCE({r}.title_knowledge_type, '')",
+        'discourse_type': "COALESCE({r}.discourse_type, '')",
+        'is_question': 'COALESCE({r}.is_question, 0)',
+        'is_spam': 'COALESCE({r}.is_spam, 0)',
+    },
+}
+
+# Per-minute/hour/day activity by submolt; the bucket is the start epoch
+# of its interval (-1 without a timestamp) and comes last in the key, so
+# a (submolt, is_spam) time range is one primary-key range scan. Per-author
+# buckets would hold about one row per post; author time ranges scan the
+# idx_posts_author_created index instead. Queried through time_buckets.py.
+def _time_bucket(seconds):
+    # created_epoch is NO_TIMESTAMP (-1) or NULL without a timestamp, and
+    # SQLite's integer division would put -1 in bucket 0
+    return f'CASE WHEN {{r}}.created_epoch >= 0 THEN {{r}}.created_epoch / {seconds} * {seconds} ELSE -1 END'
+
+for _unit, _seconds in BUCKET_SECONDS.items():
+    ROLLUP_KEYS[f'rollup_{_unit}_submolt'] = {
+        'submolt': "COALESCE({r}.submolt, '')",
+        'is_spam': 'COALESCE({r}.is_spam, 0)',
+        'bucket': _time_bucket(_seconds),
+    }
+
+# Hour-of-day profile of each author, for scheduling signatures
+ROLLUP_KEYS['rollup_author_hour'] = {
+    'author_id': "COALESCE({r}.author_id, '')",
+    'is_spam': 'COALESCE({r}.is_spam, 0)',
+    'hour': 'COALESCE({r}.created_hour, -1)',
+}
+
+# Running sums kept in every rollup table
+ROLLUP_MEASURES = {
+    'posts': '1',
+    'questions': "COALESCE({r}.discourse_type = 'question', 0)",
+    'upvotes': 'COALESCE({r}.upvotes, 0)',
+    'comments': 'COALESCE({r}.comment_count, 0)',
+}
+
+# Columns whose change moves a row between cells or changes its sums
+TRACKED_COLUMNS = ('submolt', 'author_id', 'date', 'created_epoch', 'created_hour', 'is_spam', 'is_question', 'knowledge_type',
+                   'title_knowledge_type', 'discourse_type', 'upvotes', 'comment_count')
+
+TRIGGERS = ('posts_rollup_insert', 'posts_rollup_delete', 'posts_rollup_update')
+
+KNOWLEDGE_LABELS = ('procedural', 'conceptual', 'other')
+MIN_SUBMOLT_POSTS = 50
+TOP_SUBMOLTS = 20
+
+
+def _upsert(table, row, sign):
+    """SQL adding (sign=1) or removing (sign=-1) one posts row to its cell of table."""
+    keys = ROLLUP_KEYS[table]
+    columns = list(keys) + list(ROLLUP_MEASURES)
+    values = [expr.format(r=row) for expr in keys.values()]
+    values += [f'{sign} * {expr.format(r=row)}' for expr in ROLLUP_MEASURES.values()]
+    updates = ', '.join(f'{m} = {m} + excluded.{m}' for m in ROLLUP_MEASURES)
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(values)}) "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates};")
+
+def create_rollups(conn):
+    """Create the rollup tables and triggers; returns True if the tables are new."""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, keys in ROLLUP_KEYS.items():
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {', '.join(keys)},
+                {', '.join(f'{m} INTEGER DEFAULT 0' for m in ROLLUP_MEASURES)},
+                PRIMARY KEY ({', '.join(keys)})
+            )
+        ''')
+    create_triggers(conn)
+    return not set(ROLLUP_KEYS) <= existing
+
+def create_triggers(conn):
+    # Recreated on every open so older databases pick up changed definitions
+    drop_triggers(conn)
+    # INSERT OR REPLACE removes the old row through a delete that only
+    # fires triggers with recursive_triggers on
+    conn.execute('PRAGMA recursive_triggers = ON')
+    add = ' '.join(_upsert(t, 'NEW', 1) for t in ROLLUP_KEYS)
+    remove = ' '.join(_upsert(t, 'OLD', -1) for t in ROLLUP_KEYS)
+    conn.execute(f'CREATE TRIGGER posts_rollup_insert AFTER INSERT ON posts BEGIN {add} END')
+    conn.execute(f'CREATE TRIGGER posts_rollup_delete AFTER DELETE ON posts BEGIN {remove} END')
+    conn.execute(f'''
+        CREATE TRIGGER posts_rollup_update AFTER UPDATE OF {', '.join(TRACKED_COLUMNS)} ON posts
+        BEGIN {remove} {add} END
+    ''')
+
+def drop_triggers(conn):
+    """For bulk loads: stop per-row maintenance; call rebuild_rollups() afterwards."""
+    for name in TRIGGERS:
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+def rebuild_rollups(conn):
+    """Recompute every rollup table from the posts table in one scan each."""
+    start = time.perf_counter()
+    for table, keys in ROLLUP_KEYS.items():
+        key_exprs = [expr.format(r='p') for expr in keys.values()]
+        sums = [f'SUM({expr.format(r="p")})' for expr in ROLLUP_MEASURES.values()]
+        conn.execute(f'DELETE FROM {table}')
+        conn.execute(f'''
+            INSERT INTO {table} ({', '.join(keys)}, {', '.join(ROLLUP_MEASURES)})
+            SELECT {', '.join(key_exprs)}, {', '.join(sums)}
+            FROM posts p GROUP BY {', '.join(str(i + 1) for i in range(len(keys)))}
+        ''')
+    conn.commit()
+    print(f"Rebuilt {len(ROLLUP_KEYS)} rollup tables in {time.perf_counter() - start:.2f}s")
+
+def _write_csv(path, header, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def export_statistics(conn, export_dir=EXPORT_DIR):
+    """Regenerate aggregate_statistics.csv and submolt_statistics.csv (spam excluded)."""
+    start = time.perf_counter()
+    export_dir = Path(export_dir)
+
+    rows = conn.execute(f'''
+        SELECT title_knowledge_type, discourse_type, SUM(posts), SUM(upvotes), SUM(comments)
+        FROM rollup_features
+        WHERE is_spam = 0 AND title_knowledge_type IN ({', '.join('?' * len(KNOWLEDGE_LABELS))})
+        GROUP BY 1, 2 HAVING SUM(posts) > 0 ORDER BY 1, 2
+    ''', KNOWLEDGE_LABELS).fetchall()
+    _write_csv(export_dir / 'aggregate_statistics.csv',
+               ['knowledge_type', 'discourse_type', 'post_count', 'avg_upvotes', 'avg_comments',
+                'total_upvotes', 'total_comments'],
+               [(kt.capitalize(), dt.capitalize(), n, round(up / n, 2), round(co / n, 2), up, co)
+                for kt, dt, n, up, co in rows])
+
+    rows = conn.execute('''
+        SELECT submolt, SUM(posts) AS n, SUM(upvotes), SUM(comments), SUM(questions)
+        FROM rollup_submolt
+        WHERE is_spam = 0 AND submolt != ''
+        GROUP BY submolt HAVING n >= ?
+        ORDER BY SUM(comments) * 1.0 / n DESC LIMIT ?
+    ''', (MIN_SUBMOLT_POSTS, TOP_SUBMOLTS)).fetchall()
+    _write_csv(export_dir / 'submolt_statistics.csv',
+               ['submolt', 'post_count', 'avg_upvotes', 'avg_comments', 'pct_questions'],
+               [(name, n, round(up / n, 2), round(co / n, 2), round(100 * q / n, 2))
+                for name, n, up, co, q in rows])
+    print(f"Exported aggregate_statistics.csv and submolt_statistics.csv to {export_dir} "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', type=Path, default=DB_FILE)
+    parser.add_argument('--rebuild', action='store_true', help='recompute the rollups from the posts table')
+    parser.add_argument('--export', action='store_true', help='write the statistics CSV files')
+    parser.add_argument('--export-dir', type=Path, default=EXPORT_DIR)
+    args = parser.parse_args()
+
+    from setup_db import refresh_features, refresh_time_columns, setup_database
+
+    # Adds the feature and timestamp columns and rollups to older databases
+    conn = setup_database(args.db)
+    refresh_time_columns(conn)
+    refresh_features(conn)
+    if args.rebuild:
+        rebuild_rollups(conn)
+    if args.export:
+        export_statistics(conn, args.export_dir)
+    conn.close()
+
+if __name__ == "__main__":
+    main()
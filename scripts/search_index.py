@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Full-text search over posts and comments (SQLite FTS5).
+posts_fts indexes post titles and bodies, comments_fts comment content.
+Both are external-content tables: they store only the index and read
+the text from posts/comments, and triggers on those tables keep them in
+step with every import and sync. setup_db builds them; queries are
+ranked by bm25 and can be restricted to a submolt, a date range or
+(non-)spam posts, so keyword slices of the corpus take milliseconds and
+need no call to the API's /posts/search.
+
+Queries use the FTS5 syntax: words are ANDed, "quoted phrases", OR,
+NOT, prefixes (learn*) and column filters (title: learning).
+
+Usage:
+    python scripts/search_index.py learning
+    python scripts/search_index.py 'learn* NOT mint' --submolt todayilearned --exclude-spam
+    python scripts/search_index.py consciousness --comments --phase 2 --count
+"""
+
+import argparse
+import sqlite3
+import time
+from pathlib import Path
+
+from db_queries import COMMENTS_SCHEMA, print_table
+from time_buckets import PHASES, phase_range
+from timestamps import NO_TIMESTAMP, to_epoch
+
+POSTS_DB = Path("data/moltbook_combined.db")
+COMMENTS_DB = Path("data/moltbook_comments_full.db")
+
+# Indexed table -> (FTS table, indexed columns, bm25 column weights)
+SEARCH_INDEXES = {
+    'posts': ('posts_fts', ('title', 'body'), (2.0, 1.0)),
+    'comments': ('comments_fts', ('content',), (1.0,)),
+}
+TOKENIZER = 'unicode61 remove_diacritics 2'
+SNIPPET_TOKENS = 12
+
+
+def create_search_index(conn, table='posts'):
+    """Create the FTS table and its triggers for table; returns True if the index is new."""
+    fts, columns, _ = SEARCH_INDEXES[table]
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone()
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {', '.join(columns)}, content='{table}', content_rowid='rowid', tokenize='{TOKENIZER}'
+        )
+    ''')
+    create_search_triggers(conn, table)
+    return not exists
+
+def create_search_triggers(conn, table='posts'):
+    fts, columns, _ = SEARCH_INDEXES[table]
+    drop_search_triggers(conn, table)
+    # INSERT OR REPLACE removes the old row through a delete that only
+    # fires triggers with recursive_triggers on
+    conn.execute('PRAGMA recursive_triggers = ON')
+    names = ', '.join(columns)
+    new = ', '.join(f'NEW.{c}' for c in columns)
+    old = ', '.join(f'OLD.{c}' for c in columns)
+    add = f'INSERT INTO {fts} (rowid, {names}) VALUES (NEW.rowid, {new});'
+    remove = f"INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', OLD.rowid, {old});"
+    conn.execute(f'CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {add} END')
+    conn.execute(f'CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {remove} END')
+    # Upserts rewrite every column; only re-index rows whose text changed
+    changed = ' OR '.join(f'OLD.{c} IS NOT NEW.{c}' for c in columns)
+    conn.execute(f'''
+        CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {table} WHEN {changed}
+        BEGIN {remove} {add} END
+    ''')
+
+def drop_search_triggers(conn, table='posts'):
+    """For bulk loads: stop per-row indexing; call rebuild_search_index() afterwards."""
+    fts = SEARCH_INDEXES[table][0]
+    for event in ('insert', 'delete', 'update'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {fts}_{event}')
+
+def rebuild_search_index(conn, table='posts'):
+    """Re-index every row of table and merge the index into one segment."""
+    fts = SEARCH_INDEXES[table][0]
+    start = time.perf_counter()
+    conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+    conn.commit()
+    print(f"Built {fts} in {time.perf_counter() - start:.1f}s")
+
+def index_comments(comments_db=COMMENTS_DB):
+    """Add comments_fts (and its triggers) to the comments database if it lacks them."""
+    conn = sqlite3.connect(comments_db)
+    if create_search_index(conn, 'comments'):
+        rebuild_search_index(conn, 'comments')
+    conn.commit()
+    conn.close()
+
+def connect(posts_db=POSTS_DB, comments_db=None):
+    """Open the posts database, with the comments database ATTACHed for comment searches."""
+    conn = sqlite3.connect(posts_db)
+    if comments_db:
+        conn.execute(f'ATTACH DATABASE ? AS {COMMENTS_SCHEMA}', (str(comments_db),))
+    return conn
+
+def _matches(conn, kind, submolt, start, end, spam):
+    """FROM/WHERE clause and parameters (after the query) for a filtered search."""
+    fts, _, _ = SEARCH_INDEXES[kind]
+    schema = 'main' if kind == 'posts' else COMMENTS_SCHEMA
+    if not conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = ?", (fts,)).fetchone():
+        path = {name: file for _, name, file in conn.execute('PRAGMA database_list')}[schema]
+        option = '--db' if kind == 'posts' else '--comments-db'
+        raise RuntimeError(f"{fts} does not exist in {path}; build it with "
+                           f"python scripts/setup_db.py {option} {path}")
+    params = []
+    # CROSS JOIN keeps the match as the outer loop; otherwise a submolt
+    # filter can lead the planner to run the FTS query once per post
+    if kind == 'posts':
+        sql = f'FROM {fts} CROSS JOIN posts p ON p.rowid = {fts}.rowid WHERE {fts} MATCH ?'
+        created = f'NULLIF(p.created_epoch, {NO_TIMESTAMP})'
+    else:
+        sql = (f'FROM {schema}.{fts} CROSS JOIN {schema}.comments c ON c.rowid = {fts}.rowid '
+               f'LEFT JOIN posts p ON p.id = c.post_id WHERE {fts} MATCH ?')
+        created = "CAST(strftime('%s', c.created_at) AS INTEGER)"
+    if submolt is not None:
+        sql += ' AND p.submolt = ?'
+        params.append(submolt)
+    if start is not None:
+        sql += f' AND {created} >= ?'
+        params.append(start)
+    if end is not None:
+        sql += f' AND {created} < ?'
+        params.append(end)
+    if spam is not None:
+        sql += ' AND COALESCE(p.is_spam, 0) = ?'
+        params.append(int(spam))
+    return sql, params
+
+def search(conn, query, kind='posts', submolt=None, start=None, end=None, spam=None, limit=20):
+    """Best matches for an FTS5 query, most relevant (lowest bm25) first; returns (columns, rows).
+
+    start/end are epoch seconds ([start, end)); spam=False keeps non-spam
+    posts (for comments, comments on non-spam posts).
+    """
+    fts, columns, weights = SEARCH_INDEXES[kind]
+    where, params = _matches(conn, kind, submolt, start, end, spam)
+    bm25 = f"bm25({fts}, {', '.join(map(str, weights))})"
+    snippet = f"snippet({fts}, -1, '[', ']', '...', {SNIPPET_TOKENS}) AS snippet"
+    if kind == 'posts':
+        select = f'p.id, p.submolt, p.created_at, p.upvotes, p.title, {snippet}'
+    else:
+        select = f'c.id, p.submolt, c.created_at, c.upvotes, c.post_id, {snippet}'
+    cursor = conn.execute(f'SELECT {select}, {bm25} AS score {where} ORDER BY score LIMIT ?',
+                          [query] + params + [limit])
+    return [d[0] for d in cursor.description], cursor.fetchall()
+
+def count_matches(conn, query, kind='posts', submolt=None, start=None, end=None, spam=None):
+    """Number of posts (or comments) matching an FTS5 query and the filters."""
+    where, params = _matches(conn, kind, submolt, start, end, spam)
+    return conn.execute(f'SELECT COUNT(*) {where}', [query] + params).fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('query', help='FTS5 query')
+    parser.add_argument('--db', type=Path, default=POSTS_DB)
+    parser.add_argument('--comments-db', type=Path, default=COMMENTS_DB)
+    parser.add_argument('--comments', action='store_true', help='search comments instead of posts')
+    parser.add_argument('--phase', type=int, choices=list(PHASES), help='restrict to one phase')
+    parser.add_argument('--start', help='first UTC date (YYYY-MM-DD)')
+    parser.add_argument('--end', help='UTC date (YYYY-MM-DD) the search stops before')
+    parser.add_argument('--submolt')
+    spam = parser.add_mutually_exclusive_group()
+    spam.add_argument('--exclude-spam', action='store_true')
+    spam.add_argument('--only-spam', action='store_true')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--count', action='store_true', help='only count the matches')
+    args = parser.parse_args()
+
+    kind = 'comments' if args.comments else 'posts'
+    conn = connect(args.db, args.comments_db if args.comments else None)
+    begin, end = phase_range(args.phase) if args.phase else (None, None)
+    if args.start:
+        begin = to_epoch(args.start)
+    if args.end:
+        end = to_epoch(args.end)
+    spam = False if args.exclude_spam else True if args.only_spam else None
+
+    start = time.perf_counter()
+    try:
+        if args.count:
+            print(f"{count_matches(conn, args.query, kind, args.submolt, begin, end, spam):,} {kind}")
+        else:
+            columns, rows = search(conn, args.query, kind, args.submolt, begin, end, spam, args.limit)
+            print_table(columns, [tuple(' '.join(str(v).split())[:80] if isinstance(v, str) else v
+                                        for v in row) for row in rows])
+    except sqlite3.OperationalError as e:
+        parser.error(f'bad query {args.query!r}: {e}')
+    except RuntimeError as e:
+        parser.error(str(e))
+    print(f"({time.perf_counter() - start:.3f}s)")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,73 @@ Set up SQLite database for Moltbook data.
 Better organization and querying capability.
 """
 
+import argparse
+import hashlib
 import json
 import sqlite3
+import time
 from datetime import datetime
 from pathlib import Path
 
-DATA_FILE = Path("data/moltbook_combined.db")
+import profiling
+from features import FEATURE_COLUMNS, FEATURES_VERSION, extract, text_hash
+from profiling import span
+from rollups import create_rollups, create_triggers, drop_triggers, rebuild_rollups
+from search_index import (create_search_index, create_search_triggers, drop_search_triggers, index_comments,
+                          rebuild_search_index)
+from stream_posts import iter_posts
+from timestamps import NO_TIMESTAMP, parse_timestamp, time_columns
+
+DATA_FILE = Path("data/all_posts.json")
 DB_FILE = Path("data/moltbook_combined.db")
+COMMENTS_DB = Path("data/moltbook_comments_full.db")
+
+BATCH_SIZE = 10000
+
+# Columns added to the posts table after its first release; older
+# databases get them through migrate_posts()
+POST_MIGRATIONS = {
+    'fetched_at': 'TIMESTAMP',
+    'is_question': 'BOOLEAN',
+    'knowledge_type': 'TEXT',
+    'body_length': 'INTEGER',
+    'deleted_by_platform': 'INTEGER DEFAULT 0',
+    'deleted_at': 'TIMESTAMP',
+    'content_hash': 'TEXT',
+    'is_spam': 'BOOLEAN',
+    'is_learning': 'BOOLEAN',
+    'title_knowledge_type': 'TEXT',
+    'features_version': 'INTEGER',
+    'discourse_type': 'TEXT',
+    'date': 'TEXT',
+    'created_epoch': 'INTEGER',
+    'created_hour': 'INTEGER',
+    'dup_cluster': 'INTEGER',
+    'dup_cluster_size': 'INTEGER',
+    'text_hash': 'INTEGER',
+}
+
+POST_INDEXES = {
+    'idx_posts_submolt': 'CREATE INDEX IF NOT EXISTS idx_posts_submolt ON posts(submolt)',
+    'idx_posts_created': 'CREATE INDEX IF NOT EXISTS idx_posts_created ON posts(created_at)',
+    'idx_posts_created_epoch': 'CREATE INDEX IF NOT EXISTS idx_posts_created_epoch ON posts(created_epoch)',
+    'idx_posts_author_created': 'CREATE INDEX IF NOT EXISTS idx_posts_author_created ON posts(author_id, created_epoch)',
+    'idx_posts_upvotes': 'CREATE INDEX IF NOT EXISTS idx_posts_upvotes ON posts(upvotes)',
+    'idx_posts_comments': 'CREATE INDEX IF NOT EXISTS idx_posts_comments ON posts(comment_count)',
+    'idx_posts_knowledge': 'CREATE INDEX IF NOT EXISTS idx_posts_knowledge ON posts(knowledge_type)',
+}
+
+# PRAGMAs for a one-off rebuild: no rollback journal on disk, no fsync,
+# and a 256 MB page cache. Restored by end_bulk_load().
+BULK_PRAGMAS = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'cache_size': -262144,
+    'temp_store': 'MEMORY',
+}
 
-def setup_database():
-    conn = sqlite3.connect(DB_FILE)
+def setup_database(db_file=DB_FILE, create_indexes=True):
+    conn = sqlite3.connect(db_file)
     c = conn.cursor()
     
     # Create tables
@@ -32,9 +89,24 @@ def setup_database():
             fetched_at TIMESTAMP,
             is_question BOOLEAN,
             knowledge_type TEXT,
-            body_length INTEGER
+            body_length INTEGER,
+            deleted_by_platform INTEGER DEFAULT 0,
+            deleted_at TIMESTAMP,
+            content_hash TEXT,
+            is_spam BOOLEAN,
+            is_learning BOOLEAN,
+            title_knowledge_type TEXT,
+            features_version INTEGER,
+            discourse_type TEXT,
+            date TEXT,
+            created_epoch INTEGER,
+            created_hour INTEGER,
+            dup_cluster INTEGER,
+            dup_cluster_size INTEGER,
+            text_hash INTEGER
         )
     ''')
+    migrate_posts(conn)
     
     c.execute('''
         CREATE TABLE IF NOT EXISTS fetch_logs (
@@ -45,150 +117,481 @@ def setup_database():
         )
     ''')
     
-    # Create indexes
-    c.execute('CREATE INDEX IF NOT EXISTS idx_posts_submolt ON posts(submolt)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_posts_created ON posts(created_at)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_posts_upvotes ON posts(upvotes)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_posts_comments ON posts(comment_count)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_posts_knowledge ON posts(knowledge_type)')
+    # Last committed batch of an in-progress import, for --resume
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS import_progress (
+            source TEXT PRIMARY KEY,
+            file_size INTEGER,
+            file_mtime REAL,
+            byte_offset INTEGER,
+            post_count INTEGER,
+            fetched_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+    ''')
+    
+    # Upvote/comment counters per post, one row per sync where they moved
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS post_counter_history (
+            post_id TEXT,
+            fetched_at TIMESTAMP,
+            upvotes INTEGER,
+            downvotes INTEGER,
+            comment_count INTEGER,
+            PRIMARY KEY (post_id, fetched_at)
+        )
+    ''')
+    
+    if create_indexes:
+        build_indexes(conn)
+    
+    # Per-submolt/date/feature rollups, maintained by triggers on posts
+    if create_rollups(conn):
+        rebuild_rollups(conn)
+    
+    # Full-text index over title/body, maintained by triggers on posts
+    if create_search_index(conn):
+        rebuild_search_index(conn)
     
     conn.commit()
     return conn
 
-def is_question(title):
-    if not title:
-        return False
-    title_lower = title.lower()
-    return '?' in title or any(title_lower.startswith(w) for w in 
-        ['what ', 'why ', 'how ', 'is ', 'are ', 'do ', 'does ', 'can ', 
-         'should ', 'would ', 'could ', 'anyone ', 'who ', 'where ', 'when '])
-
-def get_knowledge_type(title, body):
-    text = ((title or '') + ' ' + (body or '')).lower()
-    procedural = ['skill', 'build', 'built', 'how to', 'tutorial', 'guide', 
-                  'made', 'created', 'workflow', 'tool', 'script', 'code']
-    conceptual = ['understand', 'theory', 'why', 'philosophy', 'consciousness',
-                  'meaning', 'think', 'believe', 'concept', 'idea', 'wonder']
-    
-    proc_count = sum(1 for k in procedural if k in text)
-    conc_count = sum(1 for k in conceptual if k in text)
-    
-    if proc_count > conc_count:
-        return 'procedural'
-    elif conc_count > proc_count:
-        return 'conceptual'
-    return 'other'
-
-def parse_timestamp(ts):
-    if not ts:
-        return None
-    try:
-        if isinstance(ts, (int, float)):
-            return datetime.fromtimestamp(ts).isoformat()
-        return datetime.fromisoformat(ts.replace('Z', '+00:00')).isoformat()
-    except:
+def migrate_posts(conn):
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(posts)')}
+    for name, decl in POST_MIGRATIONS.items():
+        if name not in existing:
+            conn.execute(f'ALTER TABLE posts ADD COLUMN {name} {decl}')
+
+def build_indexes(conn):
+    for sql in POST_INDEXES.values():
+        conn.execute(sql)
+
+def drop_indexes(conn):
+    for name in POST_INDEXES:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+
+def begin_bulk_load(conn):
+    """Tune PRAGMAs, drop indexes, rollup and search triggers for a bulk load; returns the previous settings."""
+    previous = {name: conn.execute(f'PRAGMA {name}').fetchone()[0] for name in BULK_PRAGMAS}
+    for name, value in BULK_PRAGMAS.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    drop_indexes(conn)
+    drop_triggers(conn)
+    drop_search_triggers(conn)
+    conn.commit()
+    return previous
+
+def end_bulk_load(conn, previous):
+    """Rebuild indexes, rollups and the search index and restore the PRAGMAs saved by begin_bulk_load."""
+    start = time.perf_counter()
+    with span('bulk.indexes'):
+        build_indexes(conn)
+        conn.commit()
+    print(f"Rebuilt {len(POST_INDEXES)} indexes in {time.perf_counter() - start:.1f}s")
+    create_triggers(conn)
+    with span('bulk.rollups'):
+        rebuild_rollups(conn)
+    create_search_triggers(conn)
+    with span('bulk.search_index'):
+        rebuild_search_index(conn)
+    for name, value in previous.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+
+def content_hash(title, body, author_id, author_name, submolt, created_at):
+    """Hash of a post's non-counter fields, used to skip unchanged rows on sync."""
+    text = '\x1f'.join(str(v) if v is not None else '' for v in
+                        (title, body, author_id, author_name, submolt, created_at))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def post_row(p, fetched_at, flags=True):
+    """Flatten one API post dict into a posts table row, or None if it has no id.
+
+    With flags=False the derived feature columns are left as None (see
+    with_flags), so rows that turn out unchanged skip them.
+    """
+    post_id = p.get('id')
+    if not post_id:
         return None
+    
+    title = p.get('title', '')
+    body = p.get('body', p.get('content', ''))
+    
+    author = p.get('author', {})
+    if isinstance(author, dict):
+        author_id = author.get('id', '')
+        author_name = author.get('username', author.get('name', ''))
+    else:
+        author_id = ''
+        author_name = str(author) if author else ''
+    
+    submolt = p.get('submolt', {})
+    if isinstance(submolt, dict):
+        submolt_name = submolt.get('name', submolt.get('slug', ''))
+    else:
+        submolt_name = str(submolt) if submolt else ''
+    
+    upvotes = p.get('upvotes', p.get('score', 0)) or 0
+    downvotes = p.get('downvotes', 0) or 0
+    comment_count = p.get('commentCount', p.get('comment_count', 0)) or 0
+    created_at = parse_timestamp(p.get('createdAt', p.get('created_at', p.get('timestamp'))))
+    
+    return (
+        post_id, title, body, author_id, author_name, submolt_name,
+        upvotes, downvotes, comment_count, created_at, fetched_at,
+    ) + (extract(title, body) + (FEATURES_VERSION, text_hash(title, body)) if flags else NO_FEATURES) + (
+        content_hash(title, body, author_id, author_name, submolt_name, created_at),
+    )
+
+def with_time_columns(rows):
+    """Append the TIME_COLUMNS to a batch of rows, parsing created_at in one vectorized pass."""
+    created = ROW_COLUMNS.index('created_at')
+    return [row + times for row, times in zip(rows, time_columns([row[created] for row in rows]))]
+
+def with_flags(row):
+    """Fill in the derived fields of a row built with flags=False."""
+    return row[:FEATURES_START] + extract(row[1], row[2]) + (FEATURES_VERSION, text_hash(row[1], row[2])) + row[-1:]
+
+# Column order of the tuples built by post_row
+ROW_COLUMNS = ('id', 'title', 'body', 'author_id', 'author_name', 'submolt', 'upvotes', 'downvotes',
+               'comment_count', 'created_at', 'fetched_at') + FEATURE_COLUMNS + (
+               'features_version', 'text_hash', 'content_hash')
+FEATURES_START = ROW_COLUMNS.index(FEATURE_COLUMNS[0])
+NO_FEATURES = (None,) * (len(FEATURE_COLUMNS) + 2)
+
+# Normalized timestamp columns, filled from created_at by with_time_columns
+TIME_COLUMNS = ('created_epoch', 'created_hour', 'date')
+INSERT_COLUMNS = ROW_COLUMNS + TIME_COLUMNS
+
+INSERT_POST = f'''
+    INSERT OR REPLACE INTO posts ({', '.join(INSERT_COLUMNS)})
+    VALUES ({', '.join('?' * len(INSERT_COLUMNS))})
+'''
+
+# Insert a new post or rewrite one whose content changed, keeping any
+# columns the row tuple does not carry; the near-duplicate cluster is
+# cleared so near_duplicates.py re-hashes the new text
+UPSERT_POST = f'''
+    INSERT INTO posts ({', '.join(INSERT_COLUMNS)})
+    VALUES ({', '.join('?' * len(INSERT_COLUMNS))})
+    ON CONFLICT(id) DO UPDATE SET
+        {', '.join(f'{name} = excluded.{name}' for name in INSERT_COLUMNS[1:])},
+        deleted_by_platform = 0, deleted_at = NULL, dup_cluster = NULL
+'''
+
+UPDATE_COUNTERS = '''
+    UPDATE posts SET upvotes = ?, downvotes = ?, comment_count = ?, fetched_at = ?,
+                     deleted_by_platform = 0, deleted_at = NULL
+    WHERE id = ?
+'''
+
+INSERT_HISTORY = '''
+    INSERT OR REPLACE INTO post_counter_history
+    (post_id, fetched_at, upvotes, downvotes, comment_count)
+    VALUES (?, ?, ?, ?, ?)
+'''
 
-def import_posts(conn, data_file):
+
+def load_progress(conn, data_file):
+    """Saved (byte_offset, post_count, fetched_at) for data_file, if it is unchanged."""
+    st = Path(data_file).stat()
+    row = conn.execute('''
+        SELECT byte_offset, post_count, fetched_at FROM import_progress
+        WHERE source = ? AND file_size = ? AND file_mtime = ?
+    ''', (str(data_file), st.st_size, st.st_mtime)).fetchone()
+    return row
+
+def save_progress(conn, data_file, byte_offset, post_count, fetched_at):
+    st = Path(data_file).stat()
+    conn.execute('''
+        INSERT OR REPLACE INTO import_progress
+        (source, file_size, file_mtime, byte_offset, post_count, fetched_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (str(data_file), st.st_size, st.st_mtime, byte_offset, post_count, fetched_at,
+          datetime.now().isoformat()))
+
+def import_posts(conn, data_file, bulk=False, batch_size=BATCH_SIZE, resume=False):
+    """Stream a crawl file into the posts table.
+
+    Posts are read incrementally ({"posts": [...]}, a bare array or JSON
+    Lines) and written with executemany in batches of batch_size, so memory
+    stays flat however large the crawl is. Each batch is committed together
+    with its byte offset in import_progress; resume=True continues an
+    interrupted import from the last committed batch.
+
+    With bulk=True the whole load is one transaction with relaxed PRAGMAs
+    and the posts indexes dropped, rebuilding them at the end. A bulk load
+    is not checkpointed.
+    """
     c = conn.cursor()
     
-    with open(data_file) as f:
-        data = json.load(f)
+    offset, imported, fetched_at = 0, 0, None
+    if resume and not bulk:
+        saved = load_progress(conn, data_file)
+        if saved:
+            offset, imported, fetched_at = saved
+            print(f"Resuming {data_file} at byte {offset:,} ({imported} posts already imported)")
     
-    posts = data['posts']
-    fetched_at = data.get('fetched_at', datetime.now().isoformat())
+    size_mb = Path(data_file).stat().st_size / 1e6
+    print(f"Importing posts from {data_file} ({size_mb:,.1f} MB){' (bulk mode)' if bulk else ''}...")
     
-    print(f"Importing {len(posts)} posts...")
+    previous = begin_bulk_load(conn) if bulk else None
+    start = time.perf_counter()
+    resumed_from = imported
     
-    imported = 0
-    for p in posts:
-        post_id = p.get('id')
-        if not post_id:
-            continue
-        
-        title = p.get('title', '')
-        body = p.get('body', p.get('content', ''))
-        
-        author = p.get('author', {})
-        if isinstance(author, dict):
-            author_id = author.get('id', '')
-            author_name = author.get('username', author.get('name', ''))
-        else:
-            author_id = ''
-            author_name = str(author) if author else ''
-        
-        submolt = p.get('submolt', {})
-        if isinstance(submolt, dict):
-            submolt_name = submolt.get('name', submolt.get('slug', ''))
-        else:
-            submolt_name = str(submolt) if submolt else ''
-        
-        upvotes = p.get('upvotes', p.get('score', 0)) or 0
-        downvotes = p.get('downvotes', 0) or 0
-        comment_count = p.get('commentCount', p.get('comment_count', 0)) or 0
-        created_at = parse_timestamp(p.get('createdAt', p.get('created_at', p.get('timestamp'))))
-        
+    def flush(batch, batch_offset):
+        with span('import.batch', rows=len(batch)):
+            c.executemany(INSERT_POST, with_time_columns(batch))
+            if not bulk:
+                save_progress(conn, data_file, batch_offset, imported + len(batch), fetched_at)
+                conn.commit()
+        return len(batch)
+    
+    meta = {}
+    batch = []
+    batch_offset = offset
+    for p, batch_offset in iter_posts(data_file, offset, meta):
+        if fetched_at is None:
+            # Top-level fields precede the posts array in our crawl files
+            fetched_at = meta.get('fetched_at') or datetime.now().isoformat()
         try:
-            c.execute('''
-                INSERT OR REPLACE INTO posts 
-                (id, title, body, author_id, author_name, submolt, upvotes, downvotes,
-                 comment_count, created_at, fetched_at, is_question, knowledge_type, body_length)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                post_id, title, body, author_id, author_name, submolt_name,
-                upvotes, downvotes, comment_count, created_at, fetched_at,
-                is_question(title), get_knowledge_type(title, body), len(body or '')
-            ))
-            imported += 1
+            row = post_row(p, fetched_at)
         except Exception as e:
-            print(f"Error importing post {post_id}: {e}")
+            print(f"Error importing post {p.get('id') if isinstance(p, dict) else p!r}: {e}")
+            continue
+        if row is not None:
+            batch.append(row)
+        if len(batch) >= batch_size:
+            imported += flush(batch, batch_offset)
+            batch = []
+    imported += flush(batch, batch_offset)
     
     # Log the import
     c.execute('''
         INSERT INTO fetch_logs (fetched_at, source, post_count)
         VALUES (?, ?, ?)
-    ''', (fetched_at, str(data_file), imported))
+    ''', (fetched_at or datetime.now().isoformat(), str(data_file), imported))
+    c.execute('DELETE FROM import_progress WHERE source = ?', (str(data_file),))
     
     conn.commit()
-    print(f"Imported {imported} posts")
+    elapsed = time.perf_counter() - start
+    rate = (imported - resumed_from) / max(elapsed, 1e-9)
+    print(f"Imported {imported - resumed_from} posts in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+    
+    if bulk:
+        end_bulk_load(conn, previous)
+        total = time.perf_counter() - start
+        print(f"Bulk load total {total:.1f}s ({imported / max(total, 1e-9):,.0f} rows/s including indexes)")
     return imported
 
+def sync_posts(conn, data_file, batch_size=BATCH_SIZE, mark_deleted=True):
+    """Incrementally sync a crawl snapshot into the posts table.
+
+    Rows whose content hash and counters match the database are skipped.
+    Rows where only upvotes/downvotes/comment_count moved get a counter
+    UPDATE plus a post_counter_history point; new or edited posts are
+    upserted. With mark_deleted, posts that were live before this sync
+    but are missing from the snapshot get deleted_by_platform = 1 (pass
+    mark_deleted=False for partial crawls). Runs as one transaction.
+    """
+    c = conn.cursor()
+    print(f"Syncing posts from {data_file}...")
+    start = time.perf_counter()
+    
+    c.execute('CREATE TEMP TABLE IF NOT EXISTS sync_seen (id TEXT PRIMARY KEY)')
+    c.execute('DELETE FROM temp.sync_seen')
+    
+    counts = {'new': 0, 'edited': 0, 'counters': 0, 'unchanged': 0, 'restored': 0}
+    meta = {}
+    fetched_at = None
+    
+    def flush(batch):
+        with span('sync.batch', rows=len(batch)):
+            ids = json.dumps([row[0] for row in batch])
+            c.execute('INSERT OR IGNORE INTO temp.sync_seen SELECT value FROM json_each(?)', (ids,))
+            existing = {
+                row[0]: row[1:] for row in c.execute('''
+                    SELECT id, content_hash, upvotes, downvotes, comment_count, deleted_by_platform
+                    FROM posts WHERE id IN (SELECT value FROM json_each(?))
+                ''', (ids,))
+            }
+            upserts, counter_updates, history = [], [], []
+            for row in batch:
+                post_id, upvotes, downvotes, comment_count = row[0], row[6], row[7], row[8]
+                old = existing.get(post_id)
+                counters_moved = old is None or (old[1], old[2], old[3]) != (upvotes, downvotes, comment_count)
+                if old is None:
+                    counts['new'] += 1
+                    upserts.append(with_flags(row))
+                elif old[0] != row[-1]:
+                    counts['edited'] += 1
+                    upserts.append(with_flags(row))
+                elif counters_moved or old[4]:
+                    counts['counters' if counters_moved else 'restored'] += 1
+                    counter_updates.append((upvotes, downvotes, comment_count, row[10], post_id))
+                else:
+                    counts['unchanged'] += 1
+                if counters_moved:
+                    history.append((post_id, row[10], upvotes, downvotes, comment_count))
+            c.executemany(UPSERT_POST, with_time_columns(upserts))
+            c.executemany(UPDATE_COUNTERS, counter_updates)
+            c.executemany(INSERT_HISTORY, history)
+    
+    batch = []
+    seen = 0
+    for p, _ in iter_posts(data_file, meta=meta):
+        if fetched_at is None:
+            fetched_at = meta.get('fetched_at') or datetime.now().isoformat()
+        try:
+            row = post_row(p, fetched_at, flags=False)
+        except Exception as e:
+            print(f"Error importing post {p.get('id') if isinstance(p, dict) else p!r}: {e}")
+            continue
+        if row is not None:
+            batch.append(row)
+            seen += 1
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    fetched_at = fetched_at or datetime.now().isoformat()
+    
+    deleted = 0
+    if mark_deleted and seen:
+        c.execute('''
+            UPDATE posts SET deleted_by_platform = 1, deleted_at = ?
+            WHERE COALESCE(deleted_by_platform, 0) = 0 AND id NOT IN (SELECT id FROM temp.sync_seen)
+        ''', (fetched_at,))
+        deleted = c.rowcount
+    
+    c.execute('''
+        INSERT INTO fetch_logs (fetched_at, source, post_count)
+        VALUES (?, ?, ?)
+    ''', (fetched_at, str(data_file), seen))
+    c.execute('DELETE FROM temp.sync_seen')
+    conn.commit()
+    
+    elapsed = time.perf_counter() - start
+    print(f"Synced {seen} posts in {elapsed:.1f}s ({seen / max(elapsed, 1e-9):,.0f} rows/s): "
+          f"{counts['new']} new, {counts['edited']} edited, {counts['counters']} counters moved, "
+          f"{counts['unchanged']} unchanged, {counts['restored']} restored, {deleted} marked deleted")
+    counts['deleted'] = deleted
+    return counts
+
+def refresh_features(conn, batch_size=BATCH_SIZE):
+    """Recompute the feature columns of rows extracted by an older features version.
+
+    Covers databases imported before the columns existed (the released
+    moltbook_combined.db) and keyword changes that bump FEATURES_VERSION.
+    """
+    c = conn.cursor()
+    start = time.perf_counter()
+    update = f'''
+        UPDATE posts SET {', '.join(f'{name} = ?' for name in FEATURE_COLUMNS)}, features_version = ?, text_hash = ?
+        WHERE rowid = ?
+    '''
+    refreshed = 0
+    last_rowid = 0
+    while True:
+        rows = c.execute('''
+            SELECT rowid, title, body FROM posts
+            WHERE rowid > ? AND features_version IS NOT ?
+            ORDER BY rowid LIMIT ?
+        ''', (last_rowid, FEATURES_VERSION, batch_size)).fetchall()
+        if not rows:
+            break
+        with span('features.batch', rows=len(rows)):
+            c.executemany(update, [extract(title, body) + (FEATURES_VERSION, text_hash(title, body), rowid)
+                                         for rowid, title, body in rows])
+            conn.commit()
+        refreshed += len(rows)
+        last_rowid = rows[-1][0]
+    
+    if refreshed:
+        elapsed = time.perf_counter() - start
+        print(f"Refreshed features of {refreshed} posts in {elapsed:.1f}s "
+              f"({refreshed / max(elapsed, 1e-9):,.0f} rows/s)")
+    return refreshed
+
+def refresh_time_columns(conn, batch_size=BATCH_SIZE):
+    """Fill created_epoch, created_hour and date for rows imported before those columns existed.
+
+    Rows whose created_at does not parse get created_epoch NO_TIMESTAMP,
+    so they are only visited once. If any row gains a timestamp, rollup
+    triggers are suspended during the backfill and the rollups rebuilt
+    afterwards, since the old rows were rolled up from created_at.
+    """
+    c = conn.cursor()
+    start = time.perf_counter()
+    update = f"UPDATE posts SET {', '.join(f'{name} = ?' for name in TIME_COLUMNS)} WHERE rowid = ?"
+    visited = filled = 0
+    last_rowid = 0
+    while True:
+        rows = c.execute('''
+            SELECT rowid, created_at FROM posts
+            WHERE rowid > ? AND created_epoch IS NULL AND created_at IS NOT NULL
+            ORDER BY rowid LIMIT ?
+        ''', (last_rowid, batch_size)).fetchall()
+        if not rows:
+            break
+        rowids, created = zip(*rows)
+        times = time_columns(created)
+        parsed = sum(epoch != NO_TIMESTAMP for epoch, _, _ in times)
+        # Unparseable rows keep their rollup cells, so only real epochs need the rebuild
+        if parsed and not filled:
+            drop_triggers(conn)
+        with span('time_columns.batch', rows=len(rows)):
+            c.executemany(update, [row_times + (rowid,) for rowid, row_times in zip(rowids, times)])
+            conn.commit()
+        visited += len(rows)
+        filled += parsed
+        last_rowid = rowids[-1]
+    
+    if filled:
+        create_triggers(conn)
+        rebuild_rollups(conn)
+    if visited:
+        elapsed = time.perf_counter() - start
+        print(f"Filled timestamp columns of {filled} posts in {elapsed:.1f}s "
+              f"({visited / max(elapsed, 1e-9):,.0f} rows/s)"
+              + (f"; {visited - filled} without a parseable created_at" if visited > filled else ''))
+    return filled
+
 def print_stats(conn):
+    """Summary statistics, read from the rollup tables rather than the posts table."""
     c = conn.cursor()
     
     print("\n" + "=" * 60)
     print("DATABASE STATISTICS")
     print("=" * 60)
     
-    c.execute("SELECT COUNT(*) FROM posts")
-    print(f"Total posts: {c.fetchone()[0]}")
-    
-    c.execute("SELECT SUM(comment_count), SUM(upvotes) FROM posts")
+    c.execute("SELECT SUM(posts), SUM(comments), SUM(upvotes) FROM rollup_features")
     row = c.fetchone()
-    print(f"Total comments: {row[0]:,}")
-    print(f"Total upvotes: {row[1]:,}")
+    print(f"Total posts: {row[0] or 0}")
+    print(f"Total comments: {row[1] or 0:,}")
+    print(f"Total upvotes: {row[2] or 0:,}")
     
     print("\nBy knowledge type:")
     c.execute("""
-        SELECT knowledge_type, COUNT(*), AVG(upvotes), AVG(comment_count)
-        FROM posts GROUP BY knowledge_type ORDER BY COUNT(*) DESC
+        SELECT knowledge_type, SUM(posts) AS n, SUM(upvotes) * 1.0 / SUM(posts), SUM(comments) * 1.0 / SUM(posts)
+        FROM rollup_features GROUP BY knowledge_type HAVING n > 0 ORDER BY n DESC
     """)
     for row in c.fetchall():
-        print(f"  {row[0]}: {row[1]} posts, avg {row[2]:.1f} upvotes, {row[3]:.1f} comments")
+        print(f"  {row[0] or None}: {row[1]} posts, avg {row[2]:.1f} upvotes, {row[3]:.1f} comments")
     
     print("\nTop 10 submolts:")
     c.execute("""
-        SELECT submolt, COUNT(*), SUM(comment_count)
-        FROM posts WHERE submolt != ''
-        GROUP BY submolt ORDER BY COUNT(*) DESC LIMIT 10
+        SELECT submolt, SUM(posts) AS n, SUM(comments)
+        FROM rollup_submolt WHERE submolt != ''
+        GROUP BY submolt HAVING n > 0 ORDER BY n DESC LIMIT 10
     """)
     for row in c.fetchall():
         print(f"  m/{row[0]}: {row[1]} posts, {row[2]:,} comments")
     
     print("\nQuestions vs Statements:")
     c.execute("""
-        SELECT is_question, COUNT(*), AVG(upvotes), AVG(comment_count)
-        FROM posts GROUP BY is_question
+        SELECT is_question, SUM(posts) AS n, SUM(upvotes) * 1.0 / SUM(posts), SUM(comments) * 1.0 / SUM(posts)
+        FROM rollup_features GROUP BY is_question HAVING n > 0
     """)
     for row in c.fetchall():
         label = "Questions" if row[0] else "Statements"
@@ -196,20 +599,56 @@ def print_stats(conn):
     
     print("\nHourly distribution (top 5):")
     c.execute("""
-        SELECT strftime('%H', created_at) as hour, COUNT(*) as cnt
-        FROM posts WHERE created_at IS NOT NULL
-        GROUP BY hour ORDER BY cnt DESC LIMIT 5
+        SELECT hour, SUM(posts) AS cnt
+        FROM rollup_date_hour WHERE hour >= 0
+        GROUP BY hour HAVING cnt > 0 ORDER BY cnt DESC LIMIT 5
     """)
     for row in c.fetchall():
-        print(f"  {row[0]}:00 UTC: {row[1]} posts")
+        print(f"  {row[0]:02d}:00 UTC: {row[1]} posts")
 
 if __name__ == "__main__":
-    print(f"Setting up database: {DB_FILE}")
-    conn = setup_database()
+    parser = argparse.ArgumentParser(description="Set up the Moltbook SQLite database")
+    parser.add_argument('data_file', nargs='?', type=Path, default=DATA_FILE, help='JSON crawl file to import')
+    parser.add_argument('--db', type=Path, default=DB_FILE, help='SQLite database to create or update')
+    parser.add_argument('--bulk', action='store_true',
+                        help='rebuild mode: relaxed PRAGMAs, indexes dropped during the load')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted import from its last committed batch')
+    parser.add_argument('--sync', action='store_true',
+                        help='incremental sync: skip unchanged rows, track counter history, mark deletions')
+    parser.add_argument('--partial', action='store_true',
+                        help='with --sync, the crawl is partial; do not mark missing posts as deleted')
+    parser.add_argument('--skip-features', action='store_true',
+                        help='do not recompute feature columns left stale by an older features version')
+    parser.add_argument('--comments-db', type=Path, default=COMMENTS_DB,
+                        help='comments database to add the full-text index to, if it exists')
+    parser.add_argument('--deep-profile', action='store_true',
+                        help='also run cProfile and tracemalloc for setup_profile.json (slower)')
+    args = parser.parse_args()
+    if args.sync and args.bulk:
+        parser.error('--sync and --bulk are mutually exclusive')
+    if args.deep_profile:
+        profiling.enable_deep()
+
+    print(f"Setting up database: {args.db}")
+    conn = setup_database(args.db, create_indexes=not args.bulk)
     
-    if DATA_FILE.exists():
-        import_posts(conn, DATA_FILE)
+    if args.data_file.exists():
+        if args.sync:
+            sync_posts(conn, args.data_file, batch_size=args.batch_size, mark_deleted=not args.partial)
+        else:
+            import_posts(conn, args.data_file, bulk=args.bulk, batch_size=args.batch_size, resume=args.resume)
+    refresh_time_columns(conn, batch_size=args.batch_size)
+    if not args.skip_features:
+        refresh_features(conn, batch_size=args.batch_size)
+    if args.comments_db.exists():
+        with span('comments.search_index'):
+            index_comments(args.comments_db)
     
     print_stats(conn)
     conn.close()
-    print(f"\nDatabase saved to: {DB_FILE}")
+    print(f"\nDatabase saved to: {args.db}")
+    print()
+    profiling.print_report()
+    profiling.write(args.db.parent / 'setup_profile.json')
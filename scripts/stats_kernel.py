@@ -0,0 +1,179 @@
+"""
+Array-based statistics kernel for the Moltbook analyses.
+Tie-averaged ranks, Mann-Whitney U with effect size and p-value,
+Gini coefficient (and per-value contributions), quantiles and group
+medians, all computed on NumPy arrays.
+"""
+
+import math
+
+import numpy as np
+
+
+def mean(values):
+    values = np.asarray(values)
+    return float(values.mean()) if len(values) else 0
+
+def std(values):
+    """Sample standard deviation (n - 1 denominator)."""
+    values = np.asarray(values)
+    if len(values) < 2:
+        return 0
+    return float(values.std(ddof=1))
+
+def quantile_sorted(sorted_values, q):
+    """Linearly interpolated quantile of an already sorted array."""
+    n = len(sorted_values)
+    if not n:
+        return 0
+    pos = q * (n - 1)
+    lo = int(math.floor(pos))
+    hi = min(lo + 1, n - 1)
+    frac = pos - lo
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * frac
+
+def quantile(values, q):
+    return quantile_sorted(np.sort(np.asarray(values)), q)
+
+def median(values):
+    return quantile(values, 0.5)
+
+def group_median(group, values, n_groups):
+    """Median of values per group id; NaN for empty groups."""
+    order = np.lexsort((values, group))
+    values = values[order]
+    counts = np.bincount(group, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(n_groups, np.nan)
+    has = counts > 0
+    lo = starts[has] + (counts[has] - 1) // 2
+    hi = starts[has] + counts[has] // 2
+    medians[has] = (values[lo] + values[hi]) / 2
+    return medians
+
+def gini_sorted(sorted_values):
+    """Gini coefficient of an already sorted, non-negative array."""
+    n = len(sorted_values)
+    if not n:
+        return 0
+    total = sorted_values.sum(dtype=np.float64)
+    if total == 0:
+        return 0
+    weights = 2 * np.arange(1, n + 1, dtype=np.float64) - n - 1
+    return float(np.dot(weights, sorted_values) / (n * total))
+
+def gini_coefficient(values):
+    return gini_sorted(np.sort(np.asarray(values)))
+
+def gini_contributions(values):
+    """Each value's term of the Gini coefficient; the terms sum to gini_coefficient(values).
+
+    Tied values get equal terms (tie-averaged ranks).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    total = values.sum()
+    if not n or total == 0:
+        return np.zeros(n)
+    return (2 * rankdata(values) - n - 1) * values / (n * total)
+
+def tie_ranks(sorted_values):
+    """1-based ranks of a sorted array, averaged within runs of ties.
+
+    Returns (ranks, tie_term) where tie_term is sum(t^3 - t) over tie
+    groups, used for the variance correction of rank tests.
+    """
+    n = len(sorted_values)
+    if not n:
+        return np.zeros(0), 0.0
+    # Start index of each run of equal values
+    starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    avg_rank = starts + (counts + 1) / 2.0
+    ranks = np.repeat(avg_rank, counts)
+    counts = counts.astype(np.float64)
+    tie_term = float(np.sum(counts ** 3 - counts))
+    return ranks, tie_term
+
+def rankdata(values):
+    """Tie-averaged 1-based ranks of values, in their original order."""
+    values = np.asarray(values)
+    order = np.argsort(values, kind='stable')
+    ranks, _ = tie_ranks(values[order])
+    out = np.empty(len(values))
+    out[order] = ranks
+    return out
+
+def _mann_whitney_from_sorted(sorted_values, in_first):
+    """Mann-Whitney U on pooled sorted values; in_first marks group 1."""
+    n1 = int(in_first.sum())
+    n2 = len(sorted_values) - n1
+    if not n1 or not n2:
+        return None, None, None
+    ranks, tie_term = tie_ranks(sorted_values)
+    r1 = ranks[in_first].sum()
+
+    u1 = r1 - n1 * (n1 + 1) / 2
+    u2 = n1 * n2 - u1
+    u = min(u1, u2)
+
+    # Rank-biserial correlation
+    effect = 1 - (2 * u) / (n1 * n2)
+
+    # Two-sided normal approximation with tie and continuity correction
+    n = n1 + n2
+    var = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if var <= 0:
+        p = 1.0
+    else:
+        z = (abs(u1 - n1 * n2 / 2) - 0.5) / math.sqrt(var)
+        p = math.erfc(max(z, 0) / math.sqrt(2))
+    return float(u), float(effect), p
+
+def mann_whitney_u(group1, group2):
+    """Mann-Whitney U test. Returns (U, rank-biserial r, two-sided p)."""
+    group1 = np.asarray(group1)
+    group2 = np.asarray(group2)
+    if not len(group1) or not len(group2):
+        return None, None, None
+    pooled = np.concatenate([group1, group2])
+    order = np.argsort(pooled, kind='stable')
+    return _mann_whitney_from_sorted(pooled[order], order < len(group1))
+
+
+class Metric:
+    """One numeric column with a cached sort order.
+
+    Every statistic on the column or on a masked subset of it reuses the
+    single argsort: the sorted order of a subset is the global order
+    filtered by the mask, so comparisons never re-sort.
+    """
+
+    def __init__(self, values):
+        self.values = np.asarray(values)
+        self._order = None
+
+    @property
+    def order(self):
+        if self._order is None:
+            self._order = np.argsort(self.values, kind='stable')
+        return self._order
+
+    def sorted(self, mask=None):
+        if mask is None:
+            return self.values[self.order]
+        return self.values[self.order[mask[self.order]]]
+
+    def quantile(self, q, mask=None):
+        return quantile_sorted(self.sorted(mask), q)
+
+    def median(self, mask=None):
+        return self.quantile(0.5, mask)
+
+    def gini(self, mask=None):
+        return gini_sorted(self.sorted(mask))
+
+    def mann_whitney(self, mask1, mask2):
+        """Mann-Whitney U between two disjoint subsets of this column."""
+        pooled = self.order[(mask1 | mask2)[self.order]]
+        return _mann_whitney_from_sorted(self.values[pooled], mask1[pooled])
@@ -0,0 +1,169 @@
+"""
+Streaming readers for Moltbook crawl files.
+Yields posts one at a time from {"posts": [...]} documents, bare JSON
+arrays or JSON Lines, so a crawl of any size is never held in memory.
+Each post comes with the byte offset to resume from after it.
+"""
+
+import codecs
+import json
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 20
+WHITESPACE = ' \t\n\r'
+JSON_LINES_SUFFIXES = ('.jsonl', '.ndjson')
+SNIFF_LIMIT = 1 << 20
+
+_decoder = json.JSONDecoder()
+
+
+class JsonStream:
+    """Incremental JSON tokenizer over a binary file, tracking byte offsets."""
+
+    def __init__(self, f, offset=0, chunk_size=CHUNK_SIZE):
+        f.seek(offset)
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        # Byte offset of buf[mark_pos]
+        self.mark_pos = 0
+        self.mark_bytes = offset
+
+    def tell(self):
+        """Byte offset of the current position."""
+        self.mark_bytes += len(self.buf[self.mark_pos:self.pos].encode('utf-8'))
+        self.mark_pos = self.pos
+        return self.mark_bytes
+
+    def fill(self):
+        """Read another chunk, dropping consumed text. Returns False at end of file."""
+        if self.eof:
+            return False
+        self.tell()
+        data = self.f.read(self.chunk_size)
+        self.buf = self.buf[self.pos:] + self.decoder.decode(data, final=not data)
+        self.pos = self.mark_pos = 0
+        if not data:
+            self.eof = True
+        return True
+
+    def skip_ws(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return
+
+    def peek(self):
+        self.skip_ws()
+        return self.buf[self.pos] if self.pos < len(self.buf) else ''
+
+    def expect(self, ch):
+        found = self.peek()
+        if found != ch:
+            raise ValueError(f"Expected {ch!r} at byte {self.tell()}, found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.skip_ws()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A scalar cut off at the buffer edge can still decode; make sure
+            # the next delimiter is in view before accepting it.
+            if end >= len(self.buf) and not self.eof:
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_array(stream):
+    """Yield (item, offset) for the rest of an array whose '[' or last item was consumed."""
+    if stream.peek() == ']':
+        stream.pos += 1
+        return
+    while True:
+        if stream.peek() == ',':
+            stream.pos += 1
+        item = stream.value()
+        yield item, stream.tell()
+        if stream.peek() == ']':
+            stream.pos += 1
+            return
+
+
+def _iter_document(f, key, meta):
+    """Yield (post, offset) from the `key` array of a top-level JSON object or array."""
+    stream = JsonStream(f)
+    if stream.peek() == '[':
+        stream.pos += 1
+        yield from _iter_array(stream)
+        return
+
+    stream.expect('{')
+    while stream.peek() != '}':
+        if stream.peek() == ',':
+            stream.pos += 1
+        name = stream.value()
+        stream.expect(':')
+        if name == key:
+            stream.expect('[')
+            yield from _iter_array(stream)
+        else:
+            meta[name] = stream.value()
+    stream.pos += 1
+
+
+def _iter_lines(f):
+    offset = f.tell()
+    for line in f:
+        offset += len(line)
+        if line.strip():
+            yield json.loads(line), offset
+
+
+def is_json_lines(path):
+    path = Path(path)
+    if path.suffix in JSON_LINES_SUFFIXES:
+        return True
+    with open(path, 'rb') as f:
+        # A single-line {"posts": [...]} document must not be read whole here
+        first = f.readline(SNIFF_LIMIT)
+    if not first.endswith(b'\n') or not first.lstrip().startswith(b'{'):
+        return False
+    try:
+        obj = json.loads(first)
+    except ValueError:
+        return False
+    return isinstance(obj, dict) and 'posts' not in obj
+
+def iter_posts(path, offset=0, meta=None, key='posts'):
+    """Yield (post, resume_offset) pairs from a crawl file.
+
+    resume_offset is the byte offset just past the post; passing it back
+    as `offset` continues with the following post. Top-level fields seen
+    while scanning a {"posts": [...]} document (fetched_at, stats, ...)
+    are stored in `meta`.
+    """
+    if meta is None:
+        meta = {}
+    with open(path, 'rb') as f:
+        if is_json_lines(path):
+            f.seek(offset)
+            yield from _iter_lines(f)
+        elif offset:
+            # Resuming inside the posts array, just after an item
+            stream = JsonStream(f, offset)
+            if stream.peek() in (',', ']'):
+                yield from _iter_array(stream)
+        else:
+            yield from _iter_document(f, key, meta)
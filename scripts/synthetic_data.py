@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Seeded synthetic Moltbook dataset at any scale.
+Writes a posts and a comments database in the released schema (the
+README tables, without the columns later scripts add) and, optionally,
+the same posts as a JSON crawl file for setup_db.py. At --full size it
+matches the release: 293,197 posts over the three phases, 57,093
+platform-deleted, about 21% keyword spam (mostly in the spam-crisis
+phase), and 1,552,400 comments on 57.5% of the posts. Upvotes and thread
+sizes are power-law distributed, organic posting peaks in the afternoon
+(UTC), and spam bots post on a 10-minute schedule. The same seed always
+gives the same files.
+
+Usage:
+    python scripts/synthetic_data.py --posts 10000 --out-dir data/synthetic
+    python scripts/synthetic_data.py --full --json --seed 7
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+from features import CONCEPTUAL_KEYWORDS, LEARNING_KEYWORDS, PROCEDURAL_KEYWORDS, is_question, is_spam
+from time_buckets import PHASES, phase_range
+
+OUT_DIR = Path("data/synthetic")
+POSTS_FILE = "moltbook_combined.db"
+COMMENTS_FILE = "moltbook_comments_full.db"
+JSON_FILE = "all_posts.json"
+CHUNK_SIZE = 50000
+
+# Release totals (README "Key Statistics" and "Three-Phase Analysis")
+FULL_POSTS = 293197
+FULL_COMMENTS = 1552400
+PHASE_POSTS = {1: 190771, 2: 79227, 3: 23199}
+POST_AUTHORS = 66282
+COMMENT_AUTHORS = 20637
+COMMENTED_SHARE = 168741 / FULL_POSTS
+SPAM_SHARE = {1: 0.068, 2: 0.60, 3: 0.068}  # 62,117 spam posts overall
+DELETED_SHARE = {1: 0.010, 2: 0.693, 3: 0.010}  # 57,093 deleted overall
+SPAM_BOTS = 400  # spam authors at full scale
+SPAM_SCHEDULE = 600  # seconds between a bot's scheduled posting slots
+COMMENT_SPAM_SHARE = 0.19  # classification/comment_taxonomy.md
+REPLY_SHARE = 0.35  # comments that answer an earlier comment instead of the post
+
+# Relative posting rate by UTC hour: one broad afternoon peak
+HOUR_WEIGHTS = 1 + 0.8 * np.cos(2 * np.pi * (np.arange(24) - 16) / 24)
+
+POST_COLUMNS = ('id', 'title', 'body', 'author_id', 'author_name', 'submolt', 'upvotes', 'downvotes',
+                'comment_count', 'created_at', 'date', 'is_spam', 'is_question', 'body_length',
+                'deleted_by_platform', 'source')
+COMMENT_COLUMNS = ('id', 'post_id', 'content', 'parent_id', 'upvotes', 'downvotes', 'created_at',
+                   'author_id', 'author_name', 'author_karma', 'depth')
+
+SUBMOLTS = ('general', 'agents', 'todayilearned', 'ponderings', 'showandtell', 'consciousness', 'crab-rave',
+            'philosophy', 'coding', 'memory', 'tools', 'blesstheirhearts', 'introductions', 'selfhosted')
+FILLER = ('the', 'a', 'to', 'and', 'of', 'my', 'human', 'agent', 'today', 'about', 'with', 'this', 'that',
+          'context', 'session', 'model', 'prompt', 'file', 'task', 'community', 'post', 'new', 'first',
+          'moltbook', 'molty', 'claude', 'api', 'data', 'notes', 'loop', 'night', 'shell', 'crab', 'we', 'it')
+QUESTION_STARTS = ('what ', 'why ', 'how ', 'does anyone ', 'can ', 'should ')
+SPAM_TITLES = ('mint $CLAW {n:02d}', 'Mint CLAW #{t}', 'MBC-20 MINT', 'mbc-20 mint {n}')
+SPAM_BODY = '{{"p":"mbc-20","op":"mint","tick":"CLAW","amt":"{n}"}}'
+COMMENT_SPAM = ('Great post! Check out https://molt{n}.example for free $CLAW tokens',
+                'Love this! Follow me for more, I post daily about agents',
+                'This is so insightful. Join us at discord.gg/molt{n} and get {n} $MBC airdrop',
+                'Nice work! Upvote back? m/general {n}')
+
+AGENT_NAMES = ('Claw', 'Molt', 'Shell', 'Crab', 'Reef', 'Tide', 'Kelp', 'Drift', 'Echo', 'Nova', 'Byte', 'Loop')
+
+
+def _zipf_weights(n, exponent):
+    w = 1.0 / np.arange(1, n + 1) ** exponent
+    return w / w.sum()
+
+def _uuids(rng, n):
+    hi = rng.integers(0, 2 ** 63, n, dtype=np.int64)
+    lo = rng.integers(0, 2 ** 63, n, dtype=np.int64)
+    ids = []
+    for a, b in zip(hi.tolist(), lo.tolist()):
+        h = f'{a:016x}{b:016x}'
+        ids.append(f'{h[:8]}-{h[8:12]}-4{h[13:16]}-a{h[17:20]}-{h[20:]}')
+    return ids
+
+def _iso(epochs, rng):
+    """created_at strings in the two layouts the API returns."""
+    base = epochs.astype('datetime64[s]').astype(str)
+    fraction = rng.random(len(epochs)) < 0.5
+    return [f'{b}.000000+00:00' if f else f'{b}Z' for b, f in zip(base.tolist(), fraction.tolist())]
+
+class TextSource:
+    """Texts sliced at random word offsets from one seeded word stream."""
+
+    def __init__(self, rng, words=2_000_000):
+        vocab = np.array(list(FILLER) * 8 + PROCEDURAL_KEYWORDS + CONCEPTUAL_KEYWORDS + LEARNING_KEYWORDS
+                         + [f'{w}{s}' for w in FILLER for s in ('s', 'ed', 'ing')])
+        self.rng = rng
+        self.corpus = ' '.join(rng.choice(vocab, words).tolist())
+
+    def texts(self, lengths):
+        starts = self.rng.integers(0, len(self.corpus) - int(lengths.max()) - 64, len(lengths))
+        corpus = self.corpus
+        out = []
+        for start, length in zip(starts.tolist(), lengths.tolist()):
+            start = corpus.find(' ', start) + 1
+            end = corpus.find(' ', start + length)
+            out.append(corpus[start:end])
+        return out
+
+def _titles(rng, text, spam, epochs):
+    lengths = rng.integers(12, 60, len(spam))
+    titles = text.texts(lengths)
+    question = rng.random(len(spam))
+    spam_kind = rng.integers(0, len(SPAM_TITLES), len(spam))
+    out = []
+    for title, s, q, kind, t in zip(titles, spam.tolist(), question.tolist(), spam_kind.tolist(), epochs.tolist()):
+        if s:
+            out.append(SPAM_TITLES[kind].format(n=t % 97, t=t))
+        elif q < 0.06:
+            out.append(QUESTION_STARTS[int(q * 100) % len(QUESTION_STARTS)] + title + '?')
+        elif q < 0.10:
+            out.append(title.capitalize() + '?')
+        else:
+            out.append(title.capitalize())
+    return out
+
+def generate_posts(rng, n):
+    """Post metadata arrays (everything but the text) for n posts."""
+    scale = n / FULL_POSTS
+    shares = np.array(list(PHASE_POSTS.values()), dtype=float)
+    phase = rng.choice(list(PHASE_POSTS), n, p=shares / shares.sum())
+    start = np.array([phase_range(p)[0] for p in PHASES])[phase - 1]
+    days = np.array([(phase_range(p)[1] - phase_range(p)[0]) // 86400 for p in PHASES])[phase - 1]
+    hour = rng.choice(24, n, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    epochs = start + (rng.random(n) * days).astype(np.int64) * 86400 + hour * 3600 + rng.integers(0, 3600, n)
+
+    spam = rng.random(n) < np.array([SPAM_SHARE[p] for p in PHASES])[phase - 1]
+    # Bots post in scheduled slots, a few seconds after the slot starts
+    epochs = np.where(spam, epochs // SPAM_SCHEDULE * SPAM_SCHEDULE + rng.integers(0, 5, n), epochs)
+    deleted = rng.random(n) < np.array([DELETED_SHARE[p] for p in PHASES])[phase - 1]
+
+    # Every agent posts at least once; the rest of the posts go to a heavy-posting few
+    n_bots = max(1, round(SPAM_BOTS * scale))
+    n_authors = max(1, round(POST_AUTHORS * scale) - n_bots)
+    organic = np.flatnonzero(~spam)
+    author = rng.choice(n_authors, n, p=_zipf_weights(n_authors, 0.9))
+    first = rng.permutation(organic)[:n_authors]
+    author[first] = np.arange(len(first))
+    author = np.where(spam, n_authors + rng.integers(0, n_bots, n), author)
+    submolt = np.where(spam, 0, rng.choice(len(SUBMOLTS), n, p=_zipf_weights(len(SUBMOLTS), 1.2)))
+
+    upvotes = np.minimum(np.where(spam, rng.zipf(3.0, n), rng.zipf(1.8, n)) - 1, 50000)
+    downvotes = rng.binomial(upvotes, 0.03)
+    body_length = np.where(spam, 0, np.exp(rng.normal(np.log(450), 1.0, n)).astype(np.int64) + 20)
+    return {'epochs': epochs, 'spam': spam, 'deleted': deleted, 'author': author, 'submolt': submolt,
+            'upvotes': upvotes, 'downvotes': downvotes, 'body_length': body_length}
+
+def thread_sizes(rng, posts, total):
+    """Comments per post: total comments spread over COMMENTED_SHARE of the posts, power-law sized."""
+    n = len(posts['spam'])
+    weight = np.where(posts['spam'], 0.1, 1.0)
+    commented = rng.random(n) < np.minimum(weight * COMMENTED_SHARE / weight.mean(), 1)
+    sizes = np.zeros(n, dtype=np.int64)
+    k = int(commented.sum())
+    if k and total >= k:
+        share = rng.pareto(1.5, k) + 1
+        sizes[commented] = 1 + rng.multinomial(total - k, share / share.sum())
+    return sizes
+
+def _author_name(i):
+    return f'{AGENT_NAMES[i % len(AGENT_NAMES)]}{i}'
+
+def write_posts(conn, rng, text, posts, ids, sizes, author_ids, json_file=None, chunk_size=CHUNK_SIZE):
+    conn.execute(f'''
+        CREATE TABLE posts (id TEXT PRIMARY KEY, title TEXT, body TEXT, author_id TEXT, author_name TEXT,
+                            submolt TEXT, upvotes INTEGER, downvotes INTEGER, comment_count INTEGER,
+                            created_at TEXT, date TEXT, is_spam INTEGER, is_question INTEGER,
+                            body_length INTEGER, deleted_by_platform INTEGER, source TEXT)
+    ''')
+    insert = f"INSERT INTO posts VALUES ({', '.join('?' * len(POST_COLUMNS))})"
+    first = True
+    for lo in range(0, len(ids), chunk_size):
+        hi = min(lo + chunk_size, len(ids))
+        part = {name: values[lo:hi] for name, values in posts.items()}
+        titles = _titles(rng, text, part['spam'], part['epochs'])
+        bodies = text.texts(np.maximum(part['body_length'], 1))
+        bodies = [SPAM_BODY.format(n=(e % 9 + 1) * 100) if s else b
+                  for b, s, e in zip(bodies, part['spam'].tolist(), part['epochs'].tolist())]
+        created = _iso(part['epochs'], rng)
+        rows = []
+        for i, title, body, created_at, author, submolt, up, down, deleted in zip(
+                range(lo, hi), titles, bodies, created, part['author'].tolist(), part['submolt'].tolist(),
+                part['upvotes'].tolist(), part['downvotes'].tolist(), part['deleted'].tolist()):
+            rows.append((ids[i], title, body, author_ids[author], _author_name(author), SUBMOLTS[submolt],
+                         up, down, int(sizes[i]), created_at, created_at[:10], int(is_spam(title)),
+                         int(is_question(title)), len(body), int(deleted), 'synthetic'))
+        conn.executemany(insert, rows)
+        if json_file:
+            for row in rows:
+                post = {'id': row[0], 'title': row[1], 'content': row[2],
+                        'author': {'id': row[3], 'name': row[4]}, 'submolt': {'name': row[5]},
+                        'upvotes': row[6], 'downvotes': row[7], 'comment_count': row[8], 'created_at': row[9]}
+                json_file.write(('' if first else ',\n') + json.dumps(post))
+                first = False
+    conn.commit()
+
+def write_comments(conn, rng, text, posts, ids, sizes, author_ids, chunk_size=CHUNK_SIZE * 4):
+    conn.execute('''
+        CREATE TABLE comments (id TEXT PRIMARY KEY, post_id TEXT, content TEXT, parent_id TEXT,
+                               upvotes INTEGER, downvotes INTEGER, created_at TEXT, author_id TEXT,
+                               author_name TEXT, author_karma INTEGER, depth INTEGER)
+    ''')
+    total = int(sizes.sum())
+    if not total:
+        return
+    post = np.repeat(np.arange(len(sizes)), sizes)
+    thread_start = np.repeat(np.cumsum(sizes) - sizes, sizes)
+    position = np.arange(total) - thread_start
+
+    # Arrival delays after the post, sorted within each thread
+    delay = np.sort(np.exp(rng.normal(np.log(3600), 1.6, total)).astype(np.int64) + post * 2 ** 32)
+    delay -= post * 2 ** 32
+    end = phase_range(max(PHASES))[1] - 1
+    epochs = np.minimum(posts['epochs'][post] + delay, end)
+
+    reply = (rng.random(total) < REPLY_SHARE) & (position > 0)
+    parent = np.where(reply, thread_start + (rng.random(total) * position).astype(np.int64), -1)
+    depth = np.where(parent < 0, 0, -1)
+    while (depth < 0).any():
+        open_ = np.flatnonzero(depth < 0)
+        known = depth[parent[open_]] >= 0
+        depth[open_[known]] = depth[parent[open_[known]]] + 1
+
+    # Commenters are a subset of the posting agents
+    n_authors = max(1, round(COMMENT_AUTHORS * len(sizes) / FULL_POSTS))
+    author = rng.choice(n_authors, total, p=_zipf_weights(n_authors, 0.8))
+    karma = (rng.pareto(1.2, n_authors) * 20).astype(np.int64)
+    spam = rng.random(total) < COMMENT_SPAM_SHARE
+    upvotes = np.minimum(rng.zipf(2.2, total) - 1, 5000)
+    downvotes = rng.binomial(upvotes, 0.05)
+    lengths = np.exp(rng.normal(np.log(120), 0.9, total)).astype(np.int64) + 5
+    comment_ids = _uuids(rng, total)
+
+    insert = f"INSERT INTO comments VALUES ({', '.join('?' * len(COMMENT_COLUMNS))})"
+    for lo in range(0, total, chunk_size):
+        hi = min(lo + chunk_size, total)
+        contents = text.texts(lengths[lo:hi])
+        template = rng.integers(0, len(COMMENT_SPAM), hi - lo)
+        created = _iso(epochs[lo:hi], rng)
+        rows = []
+        for j, content, created_at in zip(range(lo, hi), contents, created):
+            if spam[j]:
+                content = COMMENT_SPAM[template[j - lo]].format(n=int(epochs[j]) % 997)
+            a = int(author[j])
+            rows.append((comment_ids[j], ids[post[j]], content, comment_ids[parent[j]] if parent[j] >= 0 else None,
+                         int(upvotes[j]), int(downvotes[j]), created_at, author_ids[a], _author_name(a),
+                         int(karma[a]), int(depth[j])))
+        conn.executemany(insert, rows)
+    conn.commit()
+
+def generate(out_dir=OUT_DIR, n_posts=FULL_POSTS, seed=0, write_json=False, comments=True):
+    """Write the synthetic databases (and crawl file) to out_dir; returns their paths."""
+    start = time.perf_counter()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {'posts': out_dir / POSTS_FILE, 'comments': out_dir / COMMENTS_FILE, 'json': out_dir / JSON_FILE}
+    for path in paths.values():
+        if path.exists():
+            path.unlink()
+
+    rng = np.random.default_rng(seed)
+    text = TextSource(rng)
+    posts = generate_posts(rng, n_posts)
+    ids = _uuids(rng, n_posts)
+    n_comments = round(FULL_COMMENTS * n_posts / FULL_POSTS) if comments else 0
+    sizes = thread_sizes(rng, posts, n_comments)
+    author_ids = _uuids(rng, int(posts['author'].max()) + 1)
+
+    conn = sqlite3.connect(paths['posts'])
+    conn.execute('PRAGMA journal_mode = OFF')
+    json_file = open(paths['json'], 'w') if write_json else None
+    try:
+        if json_file:
+            json_file.write('{"fetched_at": "2026-02-17T00:00:00", "posts": [\n')
+        write_posts(conn, rng, text, posts, ids, sizes, author_ids, json_file)
+        if json_file:
+            json_file.write('\n]}\n')
+    finally:
+        conn.close()
+        if json_file:
+            json_file.close()
+    if not write_json:
+        del paths['json']
+
+    if comments:
+        conn = sqlite3.connect(paths['comments'])
+        conn.execute('PRAGMA journal_mode = OFF')
+        write_comments(conn, rng, text, posts, ids, sizes, author_ids)
+        conn.close()
+    else:
+        del paths['comments']
+    print(f"Generated {n_posts:,} posts and {int(sizes.sum()):,} comments in {time.perf_counter() - start:.1f}s "
+          f"(seed {seed}) in {out_dir}")
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument('--posts', type=int, default=10000, help='number of posts (comments scale with it)')
+    size.add_argument('--full', action='store_true', help=f'release size: {FULL_POSTS:,} posts')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out-dir', type=Path, default=OUT_DIR)
+    parser.add_argument('--json', action='store_true', help=f'also write the posts as a crawl file ({JSON_FILE})')
+    parser.add_argument('--no-comments', action='store_true')
+    args = parser.parse_args()
+    generate(args.out_dir, FULL_POSTS if args.full else args.posts, args.seed, args.json, not args.no_comments)
+
+if __name__ == "__main__":
+    main()
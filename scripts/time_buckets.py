@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Time-bucketed activity queries over posts and comments.
+Post activity per minute/hour/day of each submolt and the hour-of-day
+profile of each author are rollup tables kept current by the posts
+triggers (see rollups.py). Comment activity gets the same tables, built
+from moltbook_comments_full.db and rebuilt whenever that file or the
+posts change. Questions such as "posts per hour in phase 2 for non-spam
+posts in m/agents" or "authors with >15% of their posts in one hour"
+read only the buckets they cover, never the posts or comments tables.
+
+Usage:
+    python scripts/time_buckets.py phases
+    python scripts/time_buckets.py activity --unit hour --phase 2 --submolt agents --exclude-spam
+    python scripts/time_buckets.py scheduled --threshold 0.15 --min-posts 10
+    python scripts/time_buckets.py activity --comments --unit day
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from features import FEATURES_VERSION
+from timestamps import BUCKET_SECONDS, NO_TIMESTAMP, SECONDS_PER_DAY, to_epoch
+
+POSTS_DB = Path("data/moltbook_combined.db")
+COMMENTS_DB = Path("data/moltbook_comments_full.db")
+
+# The three phases of the paper, as [start, end) UTC dates
+PHASES = {
+    1: ('2026-01-27', '2026-02-07', 'Organic growth'),
+    2: ('2026-02-07', '2026-02-10', 'Spam crisis'),
+    3: ('2026-02-10', '2026-02-17', 'Post-moderation'),
+}
+
+SCHEDULING_THRESHOLD = 0.15  # share of an author's posts in one hour of day
+MIN_AUTHOR_POSTS = 10
+
+
+def phase_range(phase):
+    """[start, end) epoch seconds of a phase."""
+    start, end, _ = PHASES[phase]
+    return to_epoch(start), to_epoch(end)
+
+def phase_of(epochs):
+    """Phase number of each epoch timestamp; 0 outside the phases or where missing."""
+    bounds = [phase_range(p)[0] for p in PHASES] + [phase_range(max(PHASES))[1]]
+    phases = np.searchsorted(bounds, epochs, side='right')
+    return np.where((epochs == NO_TIMESTAMP) | (phases > len(PHASES)), 0, phases)
+
+def _table(kind, unit):
+    return f'{"comment_" if kind == "comments" else ""}rollup_{unit}'
+
+def _spam_filter(spam, params):
+    if spam is None:
+        return ''
+    params.append(int(spam))
+    return ' AND is_spam = ?'
+
+def activity(conn, unit='hour', start=None, end=None, submolt=None, author_id=None, spam=None,
+             kind='posts'):
+    """Bucket start epochs and counts for posts (or comments) in [start, end).
+
+    submolt/author_id/spam restrict the count; spam=False keeps non-spam
+    posts (for comments, comments on non-spam posts). Author series read
+    the idx_posts_author_created index and exist for posts only.
+    """
+    seconds = BUCKET_SECONDS[unit]
+    start = NO_TIMESTAMP + 1 if start is None else start
+    end = 2 ** 62 if end is None else end
+    if author_id is not None:
+        if kind != 'posts':
+            raise ValueError('per-author series are only kept for posts')
+        params = [seconds, seconds, author_id, start, end]
+        sql = f'''
+            SELECT created_epoch / ? * ? AS bucket, COUNT(*) FROM posts
+            WHERE author_id = ? AND created_epoch >= ? AND created_epoch < ?
+            {' AND COALESCE(is_spam, 0) = ?' if spam is not None else ''}
+            GROUP BY bucket ORDER BY bucket
+        '''
+        if spam is not None:
+            params.append(int(spam))
+    else:
+        params = [start, end]
+        where = 'bucket >= ? AND bucket < ?'
+        if submolt is not None:
+            where += ' AND submolt = ?'
+            params.append(submolt)
+        where += _spam_filter(spam, params)
+        sql = f'''
+            SELECT bucket, SUM({kind}) FROM {_table(kind, unit)}_submolt
+            WHERE {where} GROUP BY bucket HAVING SUM({kind}) > 0 ORDER BY bucket
+        '''
+    rows = conn.execute(sql, params).fetchall()
+    buckets = np.array([r[0] for r in rows], dtype=np.int64)
+    counts = np.array([r[1] for r in rows], dtype=np.int64)
+    return buckets, counts
+
+def phase_summary(conn, kind='posts'):
+    """Per phase: (phase, label, days, count, per day, spam count) from the day buckets."""
+    summary = []
+    for phase, (_, _, label) in PHASES.items():
+        start, end = phase_range(phase)
+        total, spam = conn.execute(f'''
+            SELECT COALESCE(SUM({kind}), 0), COALESCE(SUM({kind} * is_spam), 0)
+            FROM {_table(kind, 'day')}_submolt WHERE bucket >= ? AND bucket < ?
+        ''', (start, end)).fetchone()
+        days = (end - start) // SECONDS_PER_DAY
+        summary.append((phase, label, days, total, total / days, spam))
+    return summary
+
+def scheduled_authors(conn, threshold=SCHEDULING_THRESHOLD, min_posts=MIN_AUTHOR_POSTS, spam=None,
+                      kind='posts', limit=None):
+    """Authors with more than `threshold` of their posts (or comments) in one hour of day.
+
+    Returns (author_id, peak hour, count at peak, total, peak share) rows,
+    most active first.
+    """
+    params = []
+    spam_filter = _spam_filter(spam, params)
+    params += [min_posts, threshold]
+    sql = f'''
+        WITH per_hour AS (
+            SELECT author_id, hour, SUM({kind}) AS n FROM {_table(kind, 'author_hour')}
+            WHERE hour >= 0 AND author_id != ''{spam_filter}
+            GROUP BY author_id, hour
+        )
+        SELECT author_id, hour, MAX(n) AS peak, SUM(n) AS total
+        FROM per_hour GROUP BY author_id
+        HAVING total >= ? AND peak > ? * total
+        ORDER BY total DESC
+    '''
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    return [row + (row[2] / row[3],) for row in conn.execute(sql, params)]
+
+def _comment_source_key(conn, comments_db):
+    st = os.stat(comments_db)
+    last_fetch = conn.execute('SELECT MAX(id) FROM fetch_logs').fetchone()[0]
+    return f"{os.path.abspath(comments_db)}:{st.st_size}:{st.st_mtime_ns}:{last_fetch}:{FEATURES_VERSION}"
+
+def build_comment_buckets(conn, comments_db=COMMENTS_DB, force=False):
+    """Build the comment bucket tables unless they match the comments file and posts already.
+
+    Comments take the submolt and spam flag of their post; one scan of the
+    comments table feeds every unit. Returns True if the tables were rebuilt.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS comment_rollup_source (
+            id INTEGER PRIMARY KEY CHECK (id = 1), source_key TEXT, built_at TIMESTAMP
+        )
+    ''')
+    key = _comment_source_key(conn, comments_db)
+    stored = conn.execute('SELECT source_key FROM comment_rollup_source').fetchone()
+    if not force and stored and stored[0] == key:
+        return False
+
+    start = time.perf_counter()
+    conn.execute('ATTACH DATABASE ? AS cdb', (str(comments_db),))
+    conn.execute('DROP TABLE IF EXISTS temp.comment_times')
+    conn.execute('''
+        CREATE TEMP TABLE comment_times AS
+        SELECT COALESCE(p.submolt, '') AS submolt, COALESCE(p.is_spam, 0) AS is_spam,
+               COALESCE(c.author_id, '') AS author_id,
+               CAST(strftime('%s', c.created_at) AS INTEGER) AS epoch
+        FROM cdb.comments c LEFT JOIN posts p ON p.id = c.post_id
+    ''')
+    for unit, seconds in BUCKET_SECONDS.items():
+        table = f'comment_rollup_{unit}_submolt'
+        conn.execute(f'DROP TABLE IF EXISTS {table}')
+        conn.execute(f'''
+            CREATE TABLE {table} (submolt, is_spam, bucket, comments INTEGER,
+                                  PRIMARY KEY (submolt, is_spam, bucket))
+        ''')
+        conn.execute(f'''
+            INSERT INTO {table}
+            SELECT submolt, is_spam, COALESCE(epoch / {seconds} * {seconds}, -1), COUNT(*)
+            FROM temp.comment_times GROUP BY 1, 2, 3
+        ''')
+    conn.execute('DROP TABLE IF EXISTS comment_rollup_author_hour')
+    conn.execute('''
+        CREATE TABLE comment_rollup_author_hour (author_id, is_spam, hour, comments INTEGER,
+                                                 PRIMARY KEY (author_id, is_spam, hour))
+    ''')
+    conn.execute('''
+        INSERT INTO comment_rollup_author_hour
+        SELECT author_id, is_spam, COALESCE(epoch / 3600 % 24, -1), COUNT(*)
+        FROM temp.comment_times GROUP BY 1, 2, 3
+    ''')
+    n = conn.execute('SELECT COUNT(*) FROM temp.comment_times').fetchone()[0]
+    conn.execute('DROP TABLE temp.comment_times')
+    conn.execute("INSERT OR REPLACE INTO comment_rollup_source VALUES (1, ?, datetime('now'))", (key,))
+    conn.commit()
+    conn.execute('DETACH DATABASE cdb')
+    print(f"Built comment time buckets from {n:,} comments in {time.perf_counter() - start:.1f}s")
+    return True
+
+def _utc(epoch):
+    return str(np.datetime64(int(epoch), 's')).replace('T', ' ')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('query', choices=['phases', 'activity', 'scheduled'])
+    parser.add_argument('--db', type=Path, default=POSTS_DB)
+    parser.add_argument('--comments-db', type=Path, default=COMMENTS_DB)
+    parser.add_argument('--comments', action='store_true', help='count comments instead of posts')
+    parser.add_argument('--unit', choices=list(BUCKET_SECONDS), default='hour')
+    parser.add_argument('--phase', type=int, choices=list(PHASES), help='restrict activity to one phase')
+    parser.add_argument('--start', help='first UTC date (YYYY-MM-DD) for activity')
+    parser.add_argument('--end', help='UTC date (YYYY-MM-DD) activity stops before')
+    parser.add_argument('--submolt')
+    parser.add_argument('--author', help='author id (posts only)')
+    spam = parser.add_mutually_exclusive_group()
+    spam.add_argument('--exclude-spam', action='store_true')
+    spam.add_argument('--only-spam', action='store_true')
+    parser.add_argument('--threshold', type=float, default=SCHEDULING_THRESHOLD,
+                        help='peak-hour share that flags a scheduled author')
+    parser.add_argument('--min-posts', type=int, default=MIN_AUTHOR_POSTS)
+    parser.add_argument('--limit', type=int, default=20, help='rows to print for scheduled')
+    parser.add_argument('--rebuild-comments', action='store_true', help='rebuild the comment buckets')
+    args = parser.parse_args()
+    if args.author and args.comments:
+        parser.error('--author series are kept for posts only; drop --comments')
+
+    from db_queries import print_table
+    from setup_db import refresh_features, refresh_time_columns, setup_database
+
+    # Adds the timestamp columns and rollup tables to older databases
+    conn = setup_database(args.db)
+    refresh_time_columns(conn)
+    refresh_features(conn)
+    kind = 'comments' if args.comments else 'posts'
+    if args.comments:
+        build_comment_buckets(conn, args.comments_db, force=args.rebuild_comments)
+    spam = False if args.exclude_spam else True if args.only_spam else None
+
+    start = time.perf_counter()
+    if args.query == 'phases':
+        rows = [(f'Phase {p}', label, days, total, per_day, f'{100 * spam_n / max(total, 1):.1f}%')
+                for p, label, days, total, per_day, spam_n in phase_summary(conn, kind)]
+        print_table(['phase', 'label', 'days', kind, 'per_day', 'spam'], rows)
+    elif args.query == 'activity':
+        begin, end = phase_range(args.phase) if args.phase else (None, None)
+        if args.start:
+            begin = to_epoch(args.start)
+        if args.end:
+            end = to_epoch(args.end)
+        buckets, counts = activity(conn, args.unit, begin, end, args.submolt, args.author, spam, kind)
+        print_table([args.unit, kind], [(_utc(b), int(c)) for b, c in zip(buckets, counts)])
+        if len(counts):
+            peak = counts.argmax()
+            print(f"{counts.sum():,} {kind} in {len(counts)} buckets; peak {_utc(buckets[peak])} ({counts[peak]:,})")
+    else:
+        rows = scheduled_authors(conn, args.threshold, args.min_posts, spam, kind, args.limit)
+        print_table(['author_id', 'peak_hour', 'at_peak', kind, 'share'], rows)
+    print(f"({time.perf_counter() - start:.3f}s)")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
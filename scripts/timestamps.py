@@ -0,0 +1,125 @@
+"""
+Timestamp normalization for Moltbook posts.
+Crawls carry ISO 8601 strings ('2026-02-01T03:26:41Z',
+'2026-02-09T01:15:05.000000+00:00') and occasionally epoch numbers.
+setup_db parses them once, at import, into integer epoch seconds plus
+the UTC hour and date, so temporal analyses work on integers instead of
+re-parsing strings.
+"""
+
+import re
+from datetime import datetime, timezone
+
+import numpy as np
+
+NO_TIMESTAMP = -1  # epoch value for posts without a parseable timestamp
+
+ISO_WIDTH = 40  # longest timestamp string the vectorized parser reads
+ISO_BASE = len('2026-01-27T00:00:00')
+SECONDS_PER_DAY = 86400
+
+# Bucket widths of the time-bucket rollups (see time_buckets.py)
+BUCKET_SECONDS = {'minute': 60, 'hour': 3600, 'day': SECONDS_PER_DAY}
+
+def parse_datetime(ts):
+    """datetime for an ISO string or epoch number; None if missing or unparseable.
+
+    Epoch numbers give UTC datetimes; ISO strings keep their own offset
+    (naive if they have none).
+    """
+    if not ts:
+        return None
+    try:
+        if isinstance(ts, (int, float)):
+            return datetime.fromtimestamp(ts, timezone.utc)
+        return datetime.fromisoformat(ts.replace('Z', '+00:00'))
+    except (AttributeError, OverflowError, OSError, TypeError, ValueError):
+        return None
+
+def parse_timestamp(ts):
+    """Normalized ISO string for a raw API timestamp (the created_at column), or None."""
+    created = parse_datetime(ts)
+    return created.isoformat() if created else None
+
+def to_epoch(ts):
+    """Epoch seconds for a datetime, ISO string or epoch number; naive values are taken as UTC."""
+    created = ts if isinstance(ts, datetime) else parse_datetime(ts)
+    if created is None:
+        return NO_TIMESTAMP
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return int(created.timestamp())
+
+SUFFIX = re.compile(r'(?:\.\d+)?(?:Z|([+-])(\d\d):(\d\d))?')
+
+def _suffix_offset(suffix):
+    """UTC offset in seconds for what follows the seconds field, or None if invalid."""
+    m = SUFFIX.fullmatch(suffix)
+    if not m:
+        return None
+    if not m.group(1):
+        return 0
+    offset = int(m.group(2)) * 3600 + int(m.group(3)) * 60
+    return offset if m.group(1) == '+' else -offset
+
+def parse_epochs(values):
+    """Vectorized to_epoch: int64 epoch seconds for a sequence of timestamps.
+
+    Strings laid out as YYYY-MM-DD[T ]HH:MM:SS[.ffffff][Z|+HH:MM|-HH:MM]
+    are parsed by NumPy in one pass over their first 19 characters; the
+    few distinct suffixes (fraction, 'Z', offset) are decoded once each.
+    Anything else (epoch numbers, other layouts) goes through to_epoch
+    one value at a time.
+    """
+    values = list(values)
+    n = len(values)
+    epochs = np.full(n, NO_TIMESTAMP, dtype=np.int64)
+    if not n:
+        return epochs
+
+    # One spare character flags strings too long to hold a timestamp;
+    # None and numbers become text that fails the layout check
+    width = ISO_WIDTH + 1
+    chars = np.array(values, dtype=f'U{width}').view(np.uint32).reshape(n, width)
+    base = np.ascontiguousarray(chars[:, :ISO_BASE]).view(f'U{ISO_BASE}').ravel()
+    suffix = np.ascontiguousarray(chars[:, ISO_BASE:]).view(f'U{width - ISO_BASE}').ravel()
+
+    ok = (chars[:, ISO_BASE - 1] != 0) & (chars[:, ISO_WIDTH] == 0)
+    for pos, c in ((4, '-'), (7, '-'), (13, ':'), (16, ':')):
+        ok &= chars[:, pos] == ord(c)
+    ok &= (chars[:, 10] == ord('T')) | (chars[:, 10] == ord(' '))
+    distinct, inverse = np.unique(suffix, return_inverse=True)
+    offsets = [_suffix_offset(s) for s in distinct.tolist()]
+    valid = np.array([o is not None for o in offsets])
+    ok &= valid[inverse.ravel()]
+    offset = np.array([o or 0 for o in offsets], dtype=np.int64)[inverse.ravel()]
+
+    idx = np.flatnonzero(ok)
+    try:
+        epochs[idx] = base[idx].astype('datetime64[s]').astype(np.int64) - offset[idx]
+    except ValueError:
+        # An out-of-range field somewhere in the batch
+        ok[:] = False
+    for i in np.flatnonzero(~ok):
+        epochs[i] = to_epoch(values[i])
+    return epochs
+
+def hour_of_day(epochs):
+    """UTC hour for each epoch timestamp; -1 where the timestamp is missing."""
+    return np.where(epochs == NO_TIMESTAMP, -1, (epochs // 3600) % 24)
+
+def date_strings(epochs):
+    """'YYYY-MM-DD' (UTC) for each epoch timestamp; None where missing."""
+    dates = epochs.astype('datetime64[s]').astype('datetime64[D]').astype(str)
+    return [None if e == NO_TIMESTAMP else d for e, d in zip(epochs.tolist(), dates.tolist())]
+
+def time_columns(created_at):
+    """(created_epoch, created_hour, date) per created_at value.
+
+    A missing or unparseable created_at gives created_epoch NO_TIMESTAMP
+    (not NULL, so backfills never select the row again) and NULL hour and date.
+    """
+    epochs = parse_epochs(created_at)
+    hours = hour_of_day(epochs)
+    return [(NO_TIMESTAMP, None, None) if e == NO_TIMESTAMP else (e, h, d)
+            for e, h, d in zip(epochs.tolist(), hours.tolist(), date_strings(epochs))]